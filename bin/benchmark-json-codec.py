@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""Compare the JSON backends of cirrus.lib.utils on large FeatureCollections.
+
+Each backend encodes and decodes a synthetic process payload with the given
+numbers of features, and the per-payload times are reported along with the
+speedup relative to the standard library.
+
+Requires orjson to be installed to measure anything but the stdlib backend:
+
+    pip install orjson
+    python bin/benchmark-json-codec.py --features 100 1000 5000
+"""
+
+import argparse
+import timeit
+
+from functools import partial
+from typing import Any
+
+from cirrus.lib import utils
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the cirrus JSON codec backends",
+    )
+    parser.add_argument(
+        "--features",
+        type=int,
+        nargs="+",
+        default=[100, 1000, 5000],
+        help="numbers of features in the benchmark payloads",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        help="number of timing repetitions; the best is reported",
+    )
+    return parser
+
+
+def make_feature(index: int) -> dict[str, Any]:
+    ring = [[-105.0 + i * 0.001, 40.0 + (i % 7) * 0.001] for i in range(64)]
+    ring.append(ring[0])
+    return {
+        "type": "Feature",
+        "stac_version": "1.0.0",
+        "id": f"item-{index:06d}",
+        "collection": "benchmark-collection",
+        "geometry": {"type": "Polygon", "coordinates": [ring]},
+        "bbox": [-105.0, 40.0, -104.936, 40.006],
+        "properties": {
+            "datetime": "2024-01-01T00:00:00Z",
+            "eo:cloud_cover": 12.5,
+            "platform": "benchmark-sat",
+            "proj:epsg": 32613,
+            "description": 'quotes " and backslashes \\ and ünïcödé',
+        },
+        "assets": {
+            f"B{band:02d}": {
+                "href": f"s3://bucket/path/item-{index:06d}/B{band:02d}.tif",
+                "type": "image/tiff; application=geotiff",
+                "roles": ["data"],
+            }
+            for band in range(12)
+        },
+        "links": [],
+    }
+
+
+def make_payload(features: int) -> dict[str, Any]:
+    return {
+        "type": "FeatureCollection",
+        "id": f"benchmark-collection/workflow-benchmark/{features}",
+        "features": [make_feature(i) for i in range(features)],
+        "process": [{"workflow": "benchmark", "upload_options": {}, "tasks": {}}],
+    }
+
+
+def best_time(func, repeat: int) -> float:
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def main() -> None:
+    args = build_parser().parse_args()
+    backends = ["json"]
+    if utils.orjson is not None:
+        backends.append("orjson")
+    else:
+        print("orjson is not installed; only the stdlib backend is measured")
+
+    header = f"{'features':>9} {'size (MB)':>10} {'backend':>8}"
+    header += f" {'dumps (ms)':>11} {'loads (ms)':>11} {'speedup':>8}"
+    print(header)
+    for features in args.features:
+        payload = make_payload(features)
+        encoded = utils.json_dumpb(payload)
+        baseline = None
+        for backend in backends:
+            utils.JSON_BACKEND = backend
+            dumps = best_time(partial(utils.json_dumpb, payload), args.repeat)
+            loads = best_time(partial(utils.json_loads, encoded), args.repeat)
+            total = dumps + loads
+            baseline = baseline or total
+            print(
+                f"{features:>9} {len(encoded) / 1e6:>10.2f} {backend:>8}"
+                f" {dumps * 1e3:>11.2f} {loads * 1e3:>11.2f}"
+                f" {baseline / total:>7.1f}x",
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""Measure the import time and first-invocation latency of the lambda handlers.
+
+Each handler module is imported in a fresh interpreter run with `-X importtime`,
+so the report shows where the import time goes (boto3, stactask, jsonpath_ng,
+the module-level logging configuration, ...), along with the time `cold_start()`
+spent creating boto3 clients. A second fresh interpreter provisions the AWS
+resources the handler needs under moto, imports the handler, and times its
+first and second invocations.
+
+Runs are repeated and the fastest is kept. The results can be saved as a
+baseline, and later runs compared against it, failing (exit status 1) when a
+timing regresses by more than the threshold:
+
+    python bin/benchmark-lambda-imports.py --save-baseline lambda-baseline.json
+    python bin/benchmark-lambda-imports.py --baseline lambda-baseline.json
+"""
+
+import argparse
+import importlib
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+from collections import defaultdict
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
+
+HANDLERS = ("process", "update_state", "api", "pre_batch", "post_batch")
+RESULT_MARKER = "BENCHMARK-RESULT "
+IMPORTTIME_REGEX = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s+)(\S+)$")
+# timings checked against the baseline
+CHECKED_METRICS = ("import_ms", "first_invocation_ms")
+
+REGION = "us-east-1"
+ACCOUNT_ID = "123456789012"
+PAYLOAD_BUCKET = "payloads"
+DATA_BUCKET = "data"
+WORKFLOW = "test-workflow1"
+STATEDB_SCHEMA = Path(__file__).parents[1] / "tests/fixtures/statedb-schema.json"
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Benchmark lambda handler imports and first invocations",
+    )
+    parser.add_argument(
+        "--handlers",
+        nargs="+",
+        choices=HANDLERS,
+        default=list(HANDLERS),
+        help="lambda handlers to benchmark",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="number of runs per handler; the fastest is reported",
+    )
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=8,
+        help="number of the slowest imported packages to report",
+    )
+    parser.add_argument(
+        "--baseline",
+        type=Path,
+        help="JSON results of a previous run to check for regressions against",
+    )
+    parser.add_argument(
+        "--save-baseline",
+        type=Path,
+        help="write the results to this file for later comparisons",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="fractional slowdown relative to the baseline that fails the run",
+    )
+    parser.add_argument(
+        "--min-delta-ms",
+        type=float,
+        default=10.0,
+        help="slowdowns smaller than this are never failures, to ignore noise",
+    )
+    parser.add_argument("--child-import", choices=HANDLERS, help=argparse.SUPPRESS)
+    parser.add_argument("--child-invoke", choices=HANDLERS, help=argparse.SUPPRESS)
+    return parser
+
+
+def child_env() -> dict[str, str]:
+    env = {
+        k: v
+        for k, v in os.environ.items()
+        if k not in ("AWS_ENDPOINT_URL", "AWS_PROFILE") and not k.startswith("CIRRUS_")
+    }
+    env.update(
+        {
+            "AWS_ACCESS_KEY_ID": "testing",
+            "AWS_SECRET_ACCESS_KEY": "testing",
+            "AWS_SESSION_TOKEN": "testing",
+            "AWS_DEFAULT_REGION": REGION,
+            "AWS_REGION": REGION,
+            "CIRRUS_LOG_LEVEL": "WARNING",
+            "CIRRUS_PAYLOAD_BUCKET": PAYLOAD_BUCKET,
+            "CIRRUS_DATA_BUCKET": DATA_BUCKET,
+            "CIRRUS_STATE_DB": json.loads(STATEDB_SCHEMA.read_text())["TableName"],
+            "CIRRUS_BASE_WORKFLOW_ARN": (
+                f"arn:aws:states:{REGION}:{ACCOUNT_ID}:stateMachine:"
+            ),
+        },
+    )
+    return env
+
+
+def emit(result: dict[str, Any]) -> None:
+    # handlers may log to stdout, so the result line is marked
+    sys.stdout.write(RESULT_MARKER + json.dumps(result) + "\n")
+
+
+def child_import(handler: str) -> None:
+    start = time.perf_counter()
+    from cirrus.lib import utils
+
+    cold_start_timings: dict[str, float] = {}
+    cold_start = utils.cold_start
+
+    def timed_cold_start(*args, **kwargs):
+        cold_start_start = time.perf_counter()
+        cold_start_timings.update(cold_start(*args, **kwargs))
+        cold_start_timings["total"] = time.perf_counter() - cold_start_start
+        return cold_start_timings
+
+    utils.cold_start = timed_cold_start
+    importlib.import_module(f"cirrus.lambda_functions.{handler}")
+    emit(
+        {
+            "import_ms": (time.perf_counter() - start) * 1e3,
+            "cold_start_ms": {k: v * 1e3 for k, v in cold_start_timings.items()},
+        },
+    )
+
+
+def make_payload(index: int) -> dict[str, Any]:
+    item_id = f"benchmark-item-{index}"
+    return {
+        "id": f"benchmark-collection/workflow-{WORKFLOW}/{item_id}",
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "id": item_id,
+                "collection": "benchmark-collection",
+                "properties": {},
+                "assets": {},
+                "links": [],
+            },
+        ],
+        "process": [
+            {
+                "workflow": WORKFLOW,
+                "upload_options": {
+                    "path_template": "/${collection}/${id}",
+                    "collections": {"benchmark-collection": ".*"},
+                },
+                "tasks": {},
+            },
+        ],
+    }
+
+
+def make_event(handler: str, index: int) -> dict[str, Any]:
+    if handler in ("process", "pre_batch", "post_batch"):
+        return make_payload(index)
+    if handler == "update_state":
+        name = f"benchmark-execution-{index}"
+        return {
+            "detail-type": "Step Functions Execution Status Change",
+            "source": "aws.states",
+            "detail": {
+                "executionArn": (
+                    f"arn:aws:states:{REGION}:{ACCOUNT_ID}:execution:{WORKFLOW}:{name}"
+                ),
+                "name": name,
+                "status": "FAILED",
+                "input": json.dumps(make_payload(index)),
+                "inputDetails": {"included": True},
+                "output": None,
+                "outputDetails": None,
+                "error": "BenchmarkError",
+                "cause": "benchmark failure",
+            },
+        }
+    return {
+        "requestContext": {"domainName": "example.com", "path": "", "stage": ""},
+        "path": "/",
+    }
+
+
+def provision() -> None:
+    """Create the resources every handler may need in the moto backend"""
+    import boto3
+
+    s3 = boto3.client("s3")
+    s3.create_bucket(Bucket=PAYLOAD_BUCKET)
+    s3.create_bucket(Bucket=DATA_BUCKET)
+    s3.put_object(
+        Bucket=DATA_BUCKET,
+        Key="catalog.json",
+        Body=json.dumps({"id": "benchmark", "description": "Benchmark catalog"}),
+    )
+
+    boto3.client("dynamodb").create_table(**json.loads(STATEDB_SCHEMA.read_text()))
+
+    role = boto3.client("iam").create_role(
+        RoleName="benchmark-step-function-role",
+        AssumeRolePolicyDocument=json.dumps(
+            {
+                "Version": "2012-10-17",
+                "Statement": [
+                    {
+                        "Effect": "Allow",
+                        "Principal": {"Service": f"states.{REGION}.amazonaws.com"},
+                        "Action": "sts:AssumeRole",
+                    },
+                ],
+            },
+        ),
+    )["Role"]
+    boto3.client("stepfunctions").create_state_machine(
+        name=WORKFLOW,
+        definition=json.dumps(
+            {"StartAt": "Pass", "States": {"Pass": {"Type": "Pass", "End": True}}},
+        ),
+        roleArn=role["Arn"],
+    )
+
+
+def child_invoke(handler: str) -> None:
+    import moto
+
+    with moto.mock_aws():
+        provision()
+        module = importlib.import_module(f"cirrus.lambda_functions.{handler}")
+        context = SimpleNamespace(aws_request_id="benchmark-request")
+
+        timings = []
+        for index in range(2):
+            event = make_event(handler, index)
+            start = time.perf_counter()
+            module.lambda_handler(event, context)
+            timings.append((time.perf_counter() - start) * 1e3)
+
+    emit({"first_invocation_ms": timings[0], "second_invocation_ms": timings[1]})
+
+
+def parse_importtime(stderr: str) -> dict[str, float]:
+    """Sum the self import times by package, in ms, keeping cirrus modules
+    separate so the module-level work of each is visible"""
+    packages: dict[str, float] = defaultdict(float)
+    for line in stderr.splitlines():
+        if match := IMPORTTIME_REGEX.match(line):
+            name = match.group(4)
+            package = name if name.startswith("cirrus") else name.split(".")[0]
+            packages[package] += int(match.group(1)) / 1e3
+    return dict(packages)
+
+
+def run_child(mode: str, handler: str, *options: str) -> tuple[dict[str, Any], str]:
+    proc = subprocess.run(  # noqa: S603
+        [sys.executable, *options, __file__, f"--child-{mode}", handler],
+        capture_output=True,
+        text=True,
+        env=child_env(),
+        check=False,
+    )
+    for line in proc.stdout.splitlines():
+        if line.startswith(RESULT_MARKER):
+            return json.loads(line[len(RESULT_MARKER) :]), proc.stderr
+    raise RuntimeError(
+        f"{mode} benchmark of {handler} failed:\n{proc.stderr[-4000:]}",
+    )
+
+
+def benchmark(handler: str, repeat: int) -> dict[str, Any]:
+    result: dict[str, Any] = {}
+    for _ in range(repeat):
+        imported, stderr = run_child("import", handler, "-X", "importtime")
+        if imported["import_ms"] < result.get("import_ms", float("inf")):
+            result.update(imported)
+            result["packages_ms"] = parse_importtime(stderr)
+
+        invoked, _ = run_child("invoke", handler)
+        for metric, value in invoked.items():
+            result[metric] = min(value, result.get(metric, value))
+    return result
+
+
+def report(handler: str, result: dict[str, Any], top: int) -> None:
+    cold_start = result.get("cold_start_ms", {})
+    print(
+        f"{handler}: import {result['import_ms']:.1f} ms"
+        f" (cold start {cold_start.get('total', 0.0):.1f} ms),"
+        f" first invocation {result['first_invocation_ms']:.1f} ms,"
+        f" second invocation {result['second_invocation_ms']:.1f} ms",
+    )
+    packages = sorted(result["packages_ms"].items(), key=lambda p: -p[1])
+    for package, ms in packages[:top]:
+        print(f"    {package:<40} {ms:>8.1f} ms")
+    clients = [f"{k}={v:.1f}" for k, v in cold_start.items() if k != "total"]
+    if clients:
+        print(f"    cold start clients (ms): {', '.join(clients)}")
+
+
+def regressions(
+    results: dict[str, dict[str, Any]],
+    baseline: dict[str, dict[str, Any]],
+    threshold: float,
+    min_delta_ms: float,
+) -> list[str]:
+    failures = []
+    for handler, result in results.items():
+        for metric in CHECKED_METRICS:
+            if (previous := baseline.get(handler, {}).get(metric)) is None:
+                continue
+            delta = result[metric] - previous
+            if delta > min_delta_ms and delta > previous * threshold:
+                failures.append(
+                    f"{handler} {metric}: {result[metric]:.1f} ms vs baseline"
+                    f" {previous:.1f} ms (+{delta / previous:.0%})",
+                )
+    return failures
+
+
+def main() -> None:
+    args = build_parser().parse_args()
+    if args.child_import:
+        child_import(args.child_import)
+        return
+    if args.child_invoke:
+        child_invoke(args.child_invoke)
+        return
+
+    results = {}
+    for handler in args.handlers:
+        results[handler] = benchmark(handler, args.repeat)
+        report(handler, results[handler], args.top)
+
+    if args.save_baseline:
+        args.save_baseline.write_text(json.dumps(results, indent=2, sort_keys=True))
+        print(f"Saved baseline to {args.save_baseline}")
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        if failures := regressions(
+            results,
+            baseline,
+            args.threshold,
+            args.min_delta_ms,
+        ):
+            print("Regressions beyond the threshold:")
+            for failure in failures:
+                print(f"    {failure}")
+            sys.exit(1)
+        print("No regressions beyond the threshold")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""Measure the throughput of the process lambda against moto-mocked AWS services.
+
+Synthetic SQS records are generated for each of the given numbers of features
+per payload, with a fraction of them duplicating an earlier payload and a
+fraction of the payloads already in the state database in one of the given
+states. The records are passed to `process.lambda_handler` in SQS-sized
+batches against moto's DynamoDB, S3, Step Functions, SNS, and SQS, and the
+payloads per second and AWS API calls per payload are reported, so changes to
+the claim/upload/start pipeline can be compared:
+
+    python bin/benchmark-process-throughput.py --records 500 --features 1 100
+    python bin/benchmark-process-throughput.py --duplicate-rate 0.2 \\
+        --existing-rate 0.5 --existing-states SUCCEEDED FAILED --max-workers 8
+
+moto is much slower than AWS and has no network latency, so the absolute rates
+are only meaningful relative to each other; the call counts are exact.
+"""
+
+import argparse
+import importlib
+import json
+import os
+import random
+import time
+import uuid
+
+from collections import Counter
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
+
+REGION = "us-east-1"
+PAYLOAD_BUCKET = "payloads"
+WORKFLOW = "benchmark-workflow"
+STATEDB_SCHEMA = Path(__file__).parents[1] / "tests/fixtures/statedb-schema.json"
+EXISTING_STATES = ("PROCESSING", "SUCCEEDED", "FAILED", "ABORTED", "INVALID")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the process lambda against moto",
+    )
+    parser.add_argument(
+        "--records",
+        type=int,
+        default=200,
+        help="number of SQS records per scenario",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=10,
+        help="number of SQS records per lambda invocation",
+    )
+    parser.add_argument(
+        "--features",
+        type=int,
+        nargs="+",
+        default=[1, 10, 100],
+        help="numbers of features per payload; each is a scenario",
+    )
+    parser.add_argument(
+        "--duplicate-rate",
+        type=float,
+        default=0.0,
+        help="fraction of records repeating an earlier payload of their batch",
+    )
+    parser.add_argument(
+        "--existing-rate",
+        type=float,
+        default=0.0,
+        help="fraction of payloads already in the state database",
+    )
+    parser.add_argument(
+        "--existing-states",
+        nargs="+",
+        choices=EXISTING_STATES,
+        default=["SUCCEEDED"],
+        help="states of the existing payloads, used in turn",
+    )
+    parser.add_argument(
+        "--max-workers",
+        type=int,
+        default=1,
+        help="CIRRUS_PROCESS_MAX_WORKERS for the process lambda",
+    )
+    parser.add_argument(
+        "--optimistic",
+        action="store_true",
+        help="set CIRRUS_PROCESS_OPTIMISTIC_CLAIM for the process lambda",
+    )
+    parser.add_argument(
+        "--no-workflow-events",
+        action="store_true",
+        help="don't publish workflow events to SNS",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="random seed for the duplicate and existing payload selection",
+    )
+    return parser
+
+
+def set_environment(args: argparse.Namespace) -> None:
+    os.environ.pop("AWS_ENDPOINT_URL", None)
+    os.environ.pop("AWS_PROFILE", None)
+    os.environ.update(
+        {
+            "AWS_ACCESS_KEY_ID": "testing",
+            "AWS_SECRET_ACCESS_KEY": "testing",
+            "AWS_SESSION_TOKEN": "testing",
+            "AWS_DEFAULT_REGION": REGION,
+            "AWS_REGION": REGION,
+            "CIRRUS_LOG_LEVEL": "ERROR",
+            "CIRRUS_PAYLOAD_BUCKET": PAYLOAD_BUCKET,
+            "CIRRUS_STATE_DB": json.loads(STATEDB_SCHEMA.read_text())["TableName"],
+            "CIRRUS_PROCESS_MAX_WORKERS": str(args.max_workers),
+            "CIRRUS_PROCESS_OPTIMISTIC_CLAIM": str(args.optimistic).lower(),
+        },
+    )
+
+
+def provision(workflow_events: bool) -> str:
+    """Create the resources used by the process lambda, and return the ARN of
+    the queue the records come from"""
+    import boto3
+
+    boto3.client("s3").create_bucket(Bucket=PAYLOAD_BUCKET)
+    boto3.client("dynamodb").create_table(**json.loads(STATEDB_SCHEMA.read_text()))
+
+    role = boto3.client("iam").create_role(
+        RoleName="benchmark-step-function-role",
+        AssumeRolePolicyDocument=json.dumps(
+            {
+                "Version": "2012-10-17",
+                "Statement": [
+                    {
+                        "Effect": "Allow",
+                        "Principal": {"Service": f"states.{REGION}.amazonaws.com"},
+                        "Action": "sts:AssumeRole",
+                    },
+                ],
+            },
+        ),
+    )["Role"]
+    state_machine = boto3.client("stepfunctions").create_state_machine(
+        name=WORKFLOW,
+        definition=json.dumps(
+            {"StartAt": "Pass", "States": {"Pass": {"Type": "Pass", "End": True}}},
+        ),
+        roleArn=role["Arn"],
+    )
+    os.environ["CIRRUS_BASE_WORKFLOW_ARN"] = (
+        state_machine["stateMachineArn"].rsplit(":", 1)[0] + ":"
+    )
+
+    if workflow_events:
+        topic = boto3.client("sns").create_topic(Name="benchmark-workflow-event")
+        os.environ["CIRRUS_WORKFLOW_EVENT_TOPIC_ARN"] = topic["TopicArn"]
+
+    sqs = boto3.client("sqs")
+    queue_url = sqs.create_queue(QueueName="benchmark-process")["QueueUrl"]
+    os.environ["CIRRUS_PROCESS_QUEUE_URL"] = queue_url
+    return sqs.get_queue_attributes(
+        QueueUrl=queue_url,
+        AttributeNames=["QueueArn"],
+    )["Attributes"]["QueueArn"]
+
+
+def make_payload(scenario: str, index: int, features: int) -> dict[str, Any]:
+    item_id = f"item-{index:06d}"
+    return {
+        "id": f"{scenario}/workflow-{WORKFLOW}/{item_id}",
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "stac_version": "1.0.0",
+                "id": f"{item_id}-{feature}",
+                "collection": scenario,
+                "geometry": {
+                    "type": "Point",
+                    "coordinates": [-105.0 + feature * 1e-3, 40.0],
+                },
+                "properties": {"datetime": "2024-01-01T00:00:00Z"},
+                "assets": {
+                    "data": {"href": f"s3://bucket/{item_id}/{feature}/data.tif"},
+                },
+                "links": [],
+            }
+            for feature in range(features)
+        ],
+        "process": [
+            {
+                "workflow": WORKFLOW,
+                "upload_options": {
+                    "path_template": "/${collection}/${id}",
+                    "collections": {scenario: ".*"},
+                },
+                "tasks": {},
+            },
+        ],
+    }
+
+
+def make_batches(
+    args: argparse.Namespace,
+    scenario: str,
+    features: int,
+    queue_arn: str,
+    rng: random.Random,
+) -> tuple[list[list[dict[str, Any]]], list[str]]:
+    """Build the SQS record batches of a scenario, and return them with the
+    unique payload IDs they contain"""
+    batches: list[list[dict[str, Any]]] = []
+    payload_ids: list[str] = []
+    for index in range(args.records):
+        if index % args.batch_size == 0:
+            batches.append([])
+        batch = batches[-1]
+        if batch and rng.random() < args.duplicate_rate:
+            body = rng.choice(batch)["body"]
+        else:
+            payload = make_payload(scenario, index, features)
+            payload_ids.append(payload["id"])
+            body = json.dumps(payload)
+        batch.append(
+            {
+                "messageId": str(uuid.uuid4()),
+                "receiptHandle": str(uuid.uuid4()),
+                "body": body,
+                "attributes": {},
+                "messageAttributes": {},
+                "eventSource": "aws:sqs",
+                "eventSourceARN": queue_arn,
+                "awsRegion": REGION,
+            },
+        )
+    return batches, payload_ids
+
+
+def seed_states(
+    args: argparse.Namespace,
+    payload_ids: list[str],
+    rng: random.Random,
+) -> Counter:
+    from cirrus.lib import runtime
+
+    statedb = runtime.get_statedb()
+    seeded: Counter = Counter()
+    for payload_id in payload_ids:
+        if rng.random() >= args.existing_rate:
+            continue
+        state = args.existing_states[sum(seeded.values()) % len(args.existing_states)]
+        if state == "PROCESSING":
+            statedb.claim_processing(payload_id, execution_arn=f"{payload_id}-seed")
+            statedb.set_processing(payload_id)
+        elif state == "SUCCEEDED":
+            statedb.set_succeeded(payload_id, outputs=[])
+        elif state == "FAILED":
+            statedb.set_failed(payload_id, "seeded failure")
+        elif state == "ABORTED":
+            statedb.set_aborted(payload_id)
+        else:
+            statedb.set_invalid(payload_id, "seeded invalid")
+        seeded[state] += 1
+    return seeded
+
+
+def count_api_calls() -> Counter:
+    """Count every botocore API call, by service and operation"""
+    from botocore.client import BaseClient
+
+    calls: Counter = Counter()
+    make_api_call = BaseClient._make_api_call
+
+    def counting_make_api_call(self, operation_name, api_params):
+        calls[f"{self.meta.service_model.service_name}.{operation_name}"] += 1
+        return make_api_call(self, operation_name, api_params)
+
+    BaseClient._make_api_call = counting_make_api_call
+    return calls
+
+
+def run_scenario(
+    args: argparse.Namespace,
+    process: Any,
+    features: int,
+    queue_arn: str,
+    calls: Counter,
+) -> None:
+    scenario = f"benchmark-{features}"
+    rng = random.Random(args.seed)  # noqa: S311
+    batches, payload_ids = make_batches(args, scenario, features, queue_arn, rng)
+    seeded = seed_states(args, payload_ids, rng)
+    context = SimpleNamespace(aws_request_id="benchmark-request")
+
+    calls.clear()
+    started = failed_batches = 0
+    start = time.perf_counter()
+    for batch in batches:
+        try:
+            started += process.lambda_handler({"Records": batch}, context)
+        except Exception:  # noqa: BLE001
+            failed_batches += 1
+    elapsed = time.perf_counter() - start
+
+    total_calls = sum(calls.values())
+    print(
+        f"{features} features/payload: {args.records} records,"
+        f" {len(payload_ids)} unique payloads"
+        f" ({', '.join(f'{n} {s}' for s, n in seeded.items()) or 'none'} existing),"
+        f" {started} started, {failed_batches} failed batches",
+    )
+    print(
+        f"    {args.records / elapsed:.1f} records/s,"
+        f" {len(payload_ids) / elapsed:.1f} payloads/s,"
+        f" {total_calls / len(payload_ids):.2f} AWS calls/payload",
+    )
+    for call, count in calls.most_common():
+        print(f"    {call:<40} {count / len(payload_ids):>6.2f}/payload")
+
+
+def main() -> None:
+    args = build_parser().parse_args()
+    set_environment(args)
+
+    import moto
+
+    with moto.mock_aws():
+        queue_arn = provision(workflow_events=not args.no_workflow_events)
+        process = importlib.import_module("cirrus.lambda_functions.process")
+        calls = count_api_calls()
+        for features in args.features:
+            run_scenario(args, process, features, queue_arn, calls)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,8 +6,7 @@ from datetime import UTC, datetime, timedelta
 from typing import Any
 from urllib.parse import urljoin
 
-from boto3utils import s3
-
+from cirrus.lib import instrumentation, runtime
 from cirrus.lib.enums import StateEnum
 from cirrus.lib.errors import EventsDisabledError
 from cirrus.lib.eventdb import EventDB, daily, hourly
@@ -18,8 +17,8 @@ from cirrus.lib.events import (
     date_formatter,
 )
 from cirrus.lib.logging import CirrusLoggerAdapter
-from cirrus.lib.statedb import StateDB, to_current
-from cirrus.lib.utils import parse_since
+from cirrus.lib.statedb import to_current
+from cirrus.lib.utils import parse_since, payload_from_s3
 
 logger = CirrusLoggerAdapter("function.api")
 
@@ -134,7 +133,7 @@ def create_link(url, title, rel, media_type="application/json"):
 def get_root(root_url, data_bucket):
     cat_url = f"s3://{data_bucket}/catalog.json"
     logger.debug("Root catalog: %s", cat_url)
-    cat = s3().read_json(cat_url)
+    cat = payload_from_s3({"url": cat_url})
 
     links = []
     workflows = cat.get("cirrus", {}).get("workflows", {})
@@ -250,25 +249,37 @@ def get_stats(
 def summary(collections_workflow, since, limit, statedb):
     parts = collections_workflow.rsplit("_", maxsplit=1)
     logger.debug("Getting summary for %s", collections_workflow)
-    counts = {}
-    for s in StateEnum:
-        counts[s] = statedb.get_counts(
-            collections_workflow,
-            state=s,
-            since=since,
-            limit=limit,
-        )
+    counts = statedb.get_state_histogram(
+        collections_workflow,
+        since=since,
+        limit=limit,
+    )
     return {"collections": parts[0], "workflow": parts[1], "counts": counts}
 
 
+def items_page(collections_workflow, statedb, fields=None, **kwargs):
+    page = statedb.get_items_page(collections_workflow, fields=fields, **kwargs)
+    result = {
+        "items": (
+            page["items"]
+            if fields is not None
+            else [to_current(item) for item in page["items"]]
+        ),
+    }
+    if "nextkey" in page:
+        result["nextkey"] = page["nextkey"]
+    return result
+
+
+@instrumentation.with_aws_call_summary(logger=logger)
 def lambda_handler(event, _context):
     logger.debug("Event: %s", json.dumps(event))
     data_bucket = os.getenv("CIRRUS_DATA_BUCKET", None)
 
     # Cirrus state database
-    statedb = StateDB()
-    eventdb = EventDB()
-    metric_reader = WorkflowMetricReader()
+    statedb = runtime.get_statedb()
+    eventdb = runtime.get_eventdb()
+    metric_reader = runtime.get_metric_reader()
 
     # get request URL
     domain = event.get("requestContext", {}).get("domainName", "")
@@ -300,6 +311,8 @@ def lambda_handler(event, _context):
     limit = int(qparams.get("limit", 100000))
     sort_ascending = bool(int(qparams.get("sort_ascending", 0)))
     sort_index = qparams.get("sort_index", "updated")
+    fields_str = qparams.get("fields", None)
+    fields = fields_str.split(",") if fields_str else None
 
     # root endpoint
     if payload_id == "":
@@ -342,18 +355,22 @@ def lambda_handler(event, _context):
             state,
             since_str,
         )
-        items = statedb.get_items_page(
-            key["collections_workflow"],
-            state=state,
-            since=since,
-            limit=limit,
-            nextkey=nextkey,
-            sort_ascending=sort_ascending,
-            sort_index=sort_index,
-        )
-        return response(
-            {"items": [to_current(item) for item in items["items"]]},
-        )
+        try:
+            return response(
+                items_page(
+                    key["collections_workflow"],
+                    statedb,
+                    state=state,
+                    since=since,
+                    limit=limit,
+                    nextkey=nextkey,
+                    sort_ascending=sort_ascending,
+                    sort_index=sort_index,
+                    fields=fields,
+                ),
+            )
+        except ValueError as e:
+            return response(str(e), status_code=400)
 
     # get individual item
     item = statedb.dbitem_to_item(statedb.get_dbitem(payload_id))
@@ -3,20 +3,20 @@ import re
 
 from typing import Any
 
-import boto3
-
+from cirrus.lib import instrumentation
 from cirrus.lib.cirrus_payload import CirrusPayload
 from cirrus.lib.logging import CirrusLoggerAdapter
 from cirrus.lib.payload_manager import PayloadManager
+from cirrus.lib.utils import get_client
 
 BATCH_LOG_GROUP = "/aws/batch/job"
-LOG_CLIENT = boto3.client("logs")
 DEFAULT_ERROR = "UnknownError"
 ERROR_REGEX = re.compile(r"^(?:([\.\w]+):)?\s*(.*)")
 
 logger = CirrusLoggerAdapter("function.post-batch")
 
 
+@instrumentation.with_aws_call_summary(logger=logger)
 def lambda_handler(event: dict[str, Any], context: Any) -> dict[str, Any]:
     logger.reset_extra(aws_request_id=context.aws_request_id)
 
@@ -84,7 +84,7 @@ def lambda_handler(event: dict[str, Any], context: Any) -> dict[str, Any]:
 
 def get_error_from_batch(logger, logname: str) -> tuple[str, str] | None:
     logger.info("Getting error from %s/%s", BATCH_LOG_GROUP, logname)
-    logs = LOG_CLIENT.get_log_events(
+    logs = get_client("logs").get_log_events(
         logGroupName=BATCH_LOG_GROUP,
         logStreamName=logname,
     )
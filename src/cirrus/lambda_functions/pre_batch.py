@@ -1,3 +1,4 @@
+from cirrus.lib import instrumentation
 from cirrus.lib.cirrus_payload import CirrusPayload
 from cirrus.lib.logging import CirrusLoggerAdapter
 from cirrus.lib.payload_bucket import PayloadBucket
@@ -5,6 +6,7 @@ from cirrus.lib.payload_bucket import PayloadBucket
 logger = CirrusLoggerAdapter("function.pre-batch")
 
 
+@instrumentation.with_aws_call_summary(logger=logger)
 def lambda_handler(event, context):
     payload_bucket = PayloadBucket.from_env()
     payload = CirrusPayload.from_event(event)
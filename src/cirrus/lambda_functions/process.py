@@ -1,18 +1,20 @@
 import contextlib
 import json
+import os
 
 from typing import Any
 
-from cirrus.lib import utils
+from cirrus.lib import instrumentation, runtime, utils
 from cirrus.lib.enums import WFEventType
 from cirrus.lib.errors import NoUrlError
 from cirrus.lib.events import WorkflowEvent, WorkflowEventManager
 from cirrus.lib.logging import CirrusLoggerAdapter, defer
-from cirrus.lib.payload_bucket import PayloadBucket
 from cirrus.lib.payload_manager import PayloadManager, PayloadManagers
-from cirrus.lib.statedb import StateDB
 
-utils.cold_start()
+utils.cold_start(
+    clients=("s3", "sqs", "stepfunctions", *utils.workflow_event_clients()),
+    resources=("dynamodb",),
+)
 
 logger = CirrusLoggerAdapter("function.process")
 
@@ -21,9 +23,32 @@ def is_sqs_message(message):
     return message.get("eventSource") == "aws:sqs"
 
 
-@WorkflowEventManager.with_wfem(logger=logger)
-def lambda_handler(event, context, *, wfem: WorkflowEventManager) -> int:
-    payload_bucket = PayloadBucket.from_env()
+def batch_item_failures(messages: list[dict[str, Any]]) -> dict[str, Any]:
+    """Build an SQS partial batch response reporting the given messages as failed"""
+    return {
+        "batchItemFailures": [
+            {"itemIdentifier": message["messageId"]} for message in messages
+        ],
+    }
+
+
+@instrumentation.with_aws_call_summary(logger=logger)
+@runtime.with_workflow_event_manager(logger=logger)
+def lambda_handler(  # noqa: C901
+    event,
+    context,
+    *,
+    wfem: WorkflowEventManager,
+) -> int | dict[str, Any]:
+    payload_bucket = runtime.get_payload_bucket()
+    # number of payloads in a batch to start concurrently; 1 starts them serially
+    max_workers = int(os.getenv("CIRRUS_PROCESS_MAX_WORKERS", "1"))
+    # claim payloads without reading their state first, for mostly-new traffic
+    optimistic = utils.env_flag("CIRRUS_PROCESS_OPTIMISTIC_CLAIM")
+    # requires ReportBatchItemFailures in the event source mapping response types
+    report_batch_item_failures = utils.env_flag(
+        "CIRRUS_PROCESS_REPORT_BATCH_ITEM_FAILURES",
+    )
     logger.debug(json.dumps(event))
 
     payload_managers: list[PayloadManager] = []
@@ -68,7 +93,7 @@ def lambda_handler(event, context, *, wfem: WorkflowEventManager) -> int:
                     error=str(exc),
                 ),
             )
-            failures.append(payload)
+            failures.append(message)
             continue
 
         payload_managers.append(payload_manager)
@@ -83,15 +108,45 @@ def lambda_handler(event, context, *, wfem: WorkflowEventManager) -> int:
     processed_ids: set[str] = set()
     processed: dict[str, list[str]] = {"started": []}
     if len(payload_managers) > 0:
-        processed = PayloadManagers(payload_managers, StateDB()).process(wfem)
-        processed_ids = {pid for state in processed for pid in processed[state]}
+        processed = PayloadManagers(payload_managers, wfem.statedb).process(
+            wfem,
+            max_workers=max_workers,
+            optimistic=optimistic,
+        )
+        # throttled payloads are left for their messages to be redelivered
+        processed_ids = {
+            pid
+            for state, payload_ids in processed.items()
+            if state != "throttled"
+            for pid in payload_ids
+        }
 
     successful_sqs_messages = [
         message for _id in processed_ids for message in messages.pop(_id, [])
     ]
-    failures.extend(messages.values())
+    failures.extend(message for _messages in messages.values() for message in _messages)
+    # throttled payloads that didn't come from SQS have no message to redeliver
+    throttled_unqueued = [
+        pid for pid in processed.get("throttled", []) if pid not in messages
+    ]
+
+    if (
+        report_batch_item_failures
+        and any(is_sqs_message(m) for m in utils.normalize_event(event))
+        and all(is_sqs_message(m) for m in failures)
+        and not throttled_unqueued
+    ):
+        # SQS deletes everything not reported here, so there is no need to
+        # delete the successful messages ourselves or to fail the invocation
+        if failures:
+            logger.warning(
+                "Reporting %s of %s messages as failed",
+                len(failures),
+                len(failures) + len(successful_sqs_messages),
+            )
+        return batch_item_failures(failures)
 
-    if failures:
+    if failures or throttled_unqueued:
         # If we have partial failure, then we want to delete all
         # successfully processed messages from the queue, so they
         # won't be reprocessed again. We don't need to do this if
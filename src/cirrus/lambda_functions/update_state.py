@@ -7,15 +7,24 @@ from dataclasses import dataclass
 from os import getenv
 from typing import Any, Self
 
+from cirrus.lib import instrumentation, runtime
 from cirrus.lib.cirrus_payload import CirrusPayload
 from cirrus.lib.enums import SfnStatus
 from cirrus.lib.events import WorkflowEventManager
 from cirrus.lib.logging import CirrusLoggerAdapter
 from cirrus.lib.payload_bucket import PayloadBucket
 from cirrus.lib.payload_manager import PayloadManager
-from cirrus.lib.utils import SNSPublisher, SQSPublisher, cold_start
+from cirrus.lib.utils import (
+    cold_start,
+    json_dumps,
+    json_loads,
+    workflow_event_clients,
+)
 
-cold_start()
+cold_start(
+    clients=("s3", "sns", "sqs", *workflow_event_clients()),
+    resources=("dynamodb",),
+)
 
 INVALID_EXCEPTIONS = (
     "cirrus.lib.errors.InvalidInput",
@@ -50,18 +59,19 @@ def workflow_succeeded(
         output_payload_url=output_url,
     )
 
+    # messages too large to publish are uploaded and sent by reference
     publish_topic_arn = getenv("CIRRUS_PUBLISH_TOPIC_ARN")
     if execution.output and publish_topic_arn:
-        with SNSPublisher(publish_topic_arn, logger=logger) as publisher:
+        with runtime.get_offloading_sns_publisher(publish_topic_arn) as publisher:
             for message in execution.output.items_to_sns_messages():
                 publisher.add(message)
 
     process_queue_url = getenv("CIRRUS_PROCESS_QUEUE_URL")
     if execution.output and process_queue_url:
         # TODO: add test of workflow chaining
-        with SQSPublisher(process_queue_url, logger=logger) as publisher:
+        with runtime.get_offloading_sqs_publisher(process_queue_url) as publisher:
             for next_payload in execution.output.next_payloads():
-                publisher.add(json.dumps(next_payload))
+                publisher.add(json_dumps(next_payload))
 
 
 def workflow_aborted(
@@ -200,7 +210,7 @@ class Execution:
 
             _input = PayloadManager(
                 CirrusPayload.from_event(
-                    json.loads(event["detail"]["input"]),
+                    json_loads(event["detail"]["input"]),
                 ),
                 payload_bucket=payload_bucket,
             )
@@ -208,7 +218,7 @@ class Execution:
             eout = event["detail"].get("output", None)
             output = (
                 PayloadManager(
-                    CirrusPayload.from_event(json.loads(eout)),
+                    CirrusPayload.from_event(json_loads(eout)),
                     payload_bucket=payload_bucket,
                 )
                 if eout
@@ -245,7 +255,8 @@ class Execution:
             raise Exception(error_msg) from e
 
 
-@WorkflowEventManager.with_wfem(logger=logger)
+@instrumentation.with_aws_call_summary(logger=logger)
+@runtime.with_workflow_event_manager(logger=logger)
 def lambda_handler(
     event: dict[str, Any],
     context: Any,
@@ -255,5 +266,5 @@ def lambda_handler(
     logger.debug(event)
     Execution.from_event(
         event,
-        PayloadBucket.from_env(),
+        runtime.get_payload_bucket(),
     ).update_state(wfem)
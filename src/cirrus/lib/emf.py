@@ -0,0 +1,70 @@
+"""CloudWatch embedded metric format (EMF)
+
+Metrics written to stdout as EMF JSON documents by a lambda function are
+extracted from its logs by CloudWatch asynchronously, so publishing them costs
+no API calls. See https://docs.aws.amazon.com/AmazonCloudWatch/latest/monitoring/CloudWatch_Embedded_Metric_Format_Specification.html
+"""
+
+from __future__ import annotations
+
+import json
+import sys
+
+from time import time
+from typing import IO, Any
+
+
+def metric_document(
+    namespace: str,
+    dimensions: dict[str, str],
+    metrics: dict[str, Any],
+    units: dict[str, str] | None = None,
+    properties: dict[str, Any] | None = None,
+    timestamp: int | None = None,
+) -> dict[str, Any]:
+    """Build an EMF document
+
+    Args:
+        namespace (str): CloudWatch metric namespace
+        dimensions (dict[str, str]): dimension names and values, which form a
+            single dimension set
+        metrics (dict[str, Any]): metric names and values; a value may be a
+            number, a list of numbers, or a `{"Values": [...], "Counts": [...]}`
+            histogram
+        units (dict[str, str], optional): units of the metrics, by name.
+            Defaults to "Count".
+        properties (dict[str, Any], optional): additional fields to log, which
+            are not metrics
+        timestamp (int, optional): milliseconds since the epoch. Defaults to
+            now.
+
+    Returns:
+        dict[str, Any]: the EMF document
+    """
+    units = units or {}
+    return {
+        "_aws": {
+            "Timestamp": timestamp if timestamp is not None else int(time() * 1000),
+            "CloudWatchMetrics": [
+                {
+                    "Namespace": namespace,
+                    "Dimensions": [list(dimensions)],
+                    "Metrics": [
+                        {"Name": name, "Unit": units.get(name, "Count")}
+                        for name in metrics
+                    ],
+                },
+            ],
+        },
+        **(properties or {}),
+        **dimensions,
+        **metrics,
+    }
+
+
+def put_metrics(*documents: dict[str, Any], stream: IO[str] | None = None) -> None:
+    """Write EMF documents to stdout (or `stream`), one per line"""
+    stream = stream if stream is not None else sys.stdout
+    for document in documents:
+        stream.write(json.dumps(document, separators=(",", ":")) + "\n")
+    stream.flush()
@@ -14,3 +14,22 @@ class UndefinedPayloadBucketError(RuntimeError):
     """Exception class for when the payload bucket env var is not defined."""
 
     pass
+
+
+class PublishError(RuntimeError):
+    """Exception class for when SNS/SQS batch entries could not be published.
+
+    `messages` are the undelivered messages, as they were batched (an
+    offloaded message is its URL reference), so they can be published again,
+    and `failed` the batch request's failure entries for them, in the same
+    order.
+    """
+
+    def __init__(self, dest_name: str, messages: list, failed: list[dict]) -> None:
+        self.dest_name = dest_name
+        self.messages = messages
+        self.failed = failed
+        codes = sorted({failure.get("Code", "") for failure in failed})
+        super().__init__(
+            f"Failed to publish {len(failed)} messages to {dest_name}: {codes}",
+        )
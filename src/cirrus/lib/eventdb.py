@@ -18,9 +18,6 @@ class EventDB:
         self,
         event_db_and_table_names: str | None = None,
     ):
-        self.tsw_client = get_client("timestream-write")
-        self.tsq_client = get_client("timestream-query")
-
         if event_db_and_table_names is None:
             event_db_and_table_names = os.getenv("CIRRUS_EVENT_DB_AND_TABLE")
 
@@ -44,6 +41,15 @@ class EventDB:
     def enabled(self) -> bool:
         return bool(self.event_db_name and self.event_table_name)
 
+    # the clients are only created when needed, i.e., if the EventDB is enabled
+    @property
+    def tsw_client(self):
+        return get_client("timestream-write")
+
+    @property
+    def tsq_client(self):
+        return get_client("timestream-query")
+
     @classmethod
     def _payload_id_to_record_data(cls, payload_id: str) -> tuple[str, str, str]:
         if match := PAYLOAD_ID_REGEX.match(payload_id):
@@ -8,10 +8,11 @@ from collections.abc import Callable
 from dataclasses import dataclass
 from datetime import UTC, datetime
 from functools import wraps
-from logging import Logger, getLogger
+from logging import Logger, LoggerAdapter, getLogger
 from time import time
 from typing import Any, Self, TypedDict
 
+from .emf import metric_document, put_metrics
 from .enums import StateEnum, WFEventType
 from .eventdb import EventDB
 from .statedb import StateDB
@@ -19,9 +20,11 @@ from .utils import (
     PAYLOAD_ID_REGEX,
     BatchHandler,
     SNSMessage,
-    SNSPublisher,
     execution_url,
     get_client,
+    get_sns_publisher,
+    json_dumps,
+    json_loads,
 )
 
 
@@ -59,11 +62,11 @@ class WorkflowEvent:
         if self.execution_arn:
             response["execution"] = execution_url(self.execution_arn)
             del response["execution_arn"]
-        return json.dumps(response)
+        return json_dumps(response)
 
     @classmethod
     def from_message_str(cls: type[Self], message: str) -> Self:
-        args = json.loads(message)
+        args = json_loads(message)
         execution = args.pop("execution", None)
         if execution is not None:
             args["execution_arn"] = execution.split("/")[-1]
@@ -112,24 +115,69 @@ class WorkflowEvent:
         return attrs
 
 
+# workflow events sent per put_log_events call, and the longest an event waits
+# for its batch to fill
+WORKFLOW_METRIC_BATCH_SIZE = 100
+WORKFLOW_METRIC_LINGER_MS = 1000
+# `logs` sends workflow events to a CloudWatch log group with metric filters,
+# `emf` writes them to stdout in CloudWatch embedded metric format
+WORKFLOW_METRIC_OUTPUTS = ("logs", "emf")
+
+
 class WorkflowMetricLogger(BatchHandler[WorkflowEvent]):
     """A class for surfacing workflow state changes to Cloudwatch
     Logs, and retrieving metrics from Cloudwatch Metrics.
 
-    This defaults to a batch_size of 1, to make all logs immediate.  This is because we
-    can't guard against a lambda timing out an execution, and preventing us from
-    sending the last batch of messages on exit."""
+    Events are sent in batches of up to `batch_size`, and a batch is sent at the
+    latest `linger_ms` after its first event was added, so events are not held
+    for long by a warm container between invocations. To not lose the last
+    batch when a lambda invocation times out, set a deadline with `set_deadline`
+    (as `WorkflowEventManager.set_deadline` does).
+
+    With the `emf` output (`CIRRUS_WORKFLOW_METRIC_OUTPUT=emf`), events are
+    instead written to stdout as CloudWatch embedded metric format documents, in
+    the `CIRRUS_WORKFLOW_METRIC_NAMESPACE` namespace, with the metrics and
+    dimensions queried by WorkflowMetricReader. CloudWatch extracts them from
+    the lambda's own logs, so no log stream is created and no API calls are
+    made."""
 
     def __init__(
         self: Self,
-        logger: Logger | None = None,
+        logger: Logger | LoggerAdapter | None = None,
         log_group_name: str = "",
-        batch_size: int = 1,
+        batch_size: int = WORKFLOW_METRIC_BATCH_SIZE,
+        linger_ms: float | None = WORKFLOW_METRIC_LINGER_MS,
+        output: str = "",
+        metric_namespace: str = "",
     ):
-        # TODO: Reconsider the batch_size if we get to making our
-        #       event-emitting lambda handlers async, so we don't lose messages.
-        super().__init__(batchable=self._send, batch_size=batch_size)
+        super().__init__(
+            batchable=self._send,
+            batch_size=batch_size,
+            linger_ms=linger_ms,
+        )
         self.logger = logger if logger is not None else getLogger(__name__)
+        self.output = (
+            output or os.getenv("CIRRUS_WORKFLOW_METRIC_OUTPUT", "logs")
+        ).lower()
+        if self.output not in WORKFLOW_METRIC_OUTPUTS:
+            raise ValueError(
+                f"Unsupported workflow metric output '{self.output}', "
+                f"expected one of {WORKFLOW_METRIC_OUTPUTS}",
+            )
+        if self.output == "emf":
+            self.log_group_name = ""
+            self.metric_namespace = metric_namespace or os.getenv(
+                "CIRRUS_WORKFLOW_METRIC_NAMESPACE",
+                "",
+            )
+            if self.metric_namespace == "":
+                self.logger.info(
+                    "WorkflowMetricLogger namespace not configured, "
+                    "workflow state changes will not be logged",
+                )
+            return
+
+        self.metric_namespace = ""
         self.log_group_name = (
             log_group_name
             if len(log_group_name) > 0
@@ -163,7 +211,7 @@ class WorkflowMetricLogger(BatchHandler[WorkflowEvent]):
             ) from e
 
     def enabled(self: Self) -> bool:
-        return bool(self.log_group_name)
+        return bool(self.log_group_name or self.metric_namespace)
 
     def _send(self: Self, batch: list[WorkflowEvent]) -> dict[str, Any]:
         # build log events
@@ -176,8 +224,36 @@ class WorkflowMetricLogger(BatchHandler[WorkflowEvent]):
         return self.logs_client.put_log_events(**params)
 
     def add(self: Self, item: WorkflowEvent) -> None:
-        if self.enabled():
-            super().add(item)
+        if not self.enabled():
+            return
+        if self.output == "emf":
+            # writing to stdout is cheap, and nothing is lost on a timeout
+            put_metrics(*self.emf_documents(item))
+            return
+        super().add(item)
+
+    def emf_documents(self: Self, event: WorkflowEvent) -> list[dict[str, Any]]:
+        """EMF documents counting the event by event type and workflow, and by
+        event type alone"""
+        fields = event.log_metric_format()
+        properties = {
+            "source": fields["source"],
+            "execution_arn": fields["execution_arn"],
+        }
+        return [
+            metric_document(
+                self.metric_namespace,
+                {"event": fields["event"], "workflow": fields["workflow"]},
+                {WorkflowMetricReader.metric_some_workflows: 1},
+                properties=properties,
+            ),
+            metric_document(
+                self.metric_namespace,
+                {"event": fields["event"]},
+                {WorkflowMetricReader.metric_all_workflows: 1},
+                properties={"workflow": fields["workflow"], **properties},
+            ),
+        ]
 
     def prepare_batch(self: Self, batch: list[WorkflowEvent]) -> list[dict[str, Any]]:
         timestamp = int(time() * 1000)
@@ -464,7 +540,7 @@ class WorkflowEventManager:
 
     def __init__(
         self: Self,
-        logger: Logger | None = None,
+        logger: Logger | LoggerAdapter | None = None,
         statedb: StateDB | None = None,
         eventdb: EventDB | None = None,
         metric_logger: WorkflowMetricLogger | None = None,
@@ -473,11 +549,7 @@ class WorkflowEventManager:
         self.logger = logger if logger is not None else getLogger(__name__)
         wf_event_topic_arn = os.getenv("CIRRUS_WORKFLOW_EVENT_TOPIC_ARN")
         self.event_publisher = (
-            SNSPublisher(
-                wf_event_topic_arn,
-                logger=self.logger,
-                batch_size=batch_size,
-            )
+            get_sns_publisher(wf_event_topic_arn, batch_size=batch_size)
             if wf_event_topic_arn
             else None
         )
@@ -499,6 +571,20 @@ class WorkflowEventManager:
         """Ensure any messages remaining in the batch buffer are sent."""
         if self.event_publisher:
             self.event_publisher.execute()
+        if self.metric_logger.enabled():
+            self.metric_logger.execute()
+
+    def set_deadline(self: Self, context: Any) -> None:
+        """Send any batched messages before the lambda invocation of `context`
+        times out, even if the handler doesn't return (see
+        `BatchHandler.set_deadline`). Contexts without the remaining time (e.g.,
+        in tests) are ignored; the deadline holds until the next `flush`."""
+        if not hasattr(context, "get_remaining_time_in_millis"):
+            return
+        if self.event_publisher:
+            self.event_publisher.set_deadline(context)
+        if self.metric_logger.enabled():
+            self.metric_logger.set_deadline(context)
 
     def __enter__(self: Self) -> Self:
         return self
@@ -550,6 +636,7 @@ class WorkflowEventManager:
         payload_id: str,
         execution_arn: str,
         isotimestamp: str | None = None,
+        new_only: bool = False,
     ) -> str:
         if isotimestamp is None:
             isotimestamp = self.isotimestamp_now()
@@ -558,6 +645,7 @@ class WorkflowEventManager:
             payload_id=payload_id,
             execution_arn=execution_arn,
             isotimestamp=isotimestamp,
+            new_only=new_only,
         )
         self.announce(
             WorkflowEvent(
@@ -0,0 +1,252 @@
+"""Opt-in instrumentation of the AWS API calls made by a lambda invocation
+
+When `CIRRUS_AWS_CALL_METRICS` is `log` or `emf`, the clients and resources from
+`get_client` and `get_resource` are instrumented with botocore event hooks,
+which record for each service operation the number of calls, errors, and
+retries, a latency histogram, and the DynamoDB capacity consumed (requested
+with `ReturnConsumedCapacity=TOTAL` when the caller did not ask for it).
+
+Lambda handlers wrapped with `with_aws_call_summary` start each invocation with
+empty statistics, and end it by logging one summary of the calls made (`log`),
+or by writing it to stdout in CloudWatch embedded metric format (`emf`), with
+`service` and `operation` dimensions in the `CIRRUS_AWS_CALL_METRICS_NAMESPACE`
+namespace.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+
+from bisect import bisect_left
+from collections.abc import Callable
+from functools import wraps
+from logging import Logger, LoggerAdapter, getLogger
+from time import perf_counter
+from typing import Any
+
+from cirrus.lib.emf import metric_document, put_metrics
+
+OUTPUTS = ("log", "emf")
+DEFAULT_NAMESPACE = "cirrus/aws-calls"
+# upper bounds of the latency histogram buckets, in ms; slower calls are counted
+# in a final, unbounded bucket
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+# request context key holding the operation and start time of a call
+_CALL = "cirrus_call"
+
+
+def output() -> str | None:
+    """Get the configured summary output, or None when instrumentation is off"""
+    value = os.getenv("CIRRUS_AWS_CALL_METRICS", "").lower()
+    return value if value in OUTPUTS else None
+
+
+class OperationStats:
+    """Statistics of the calls made to one service operation"""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.latency_ms = 0.0
+        self.max_latency_ms = 0.0
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.consumed_capacity = 0.0
+
+    def record(
+        self,
+        latency_ms: float,
+        error: bool,
+        retries: int,
+        consumed_capacity: float,
+    ) -> None:
+        self.calls += 1
+        self.errors += error
+        self.retries += retries
+        self.latency_ms += latency_ms
+        self.max_latency_ms = max(self.max_latency_ms, latency_ms)
+        self.latency_buckets[bisect_left(LATENCY_BUCKETS_MS, latency_ms)] += 1
+        self.consumed_capacity += consumed_capacity
+
+    def histogram(self) -> dict[str, int]:
+        """Non-empty latency buckets, keyed by their upper bound in ms"""
+        bounds = [f"<={bound}" for bound in LATENCY_BUCKETS_MS]
+        bounds.append(f">{LATENCY_BUCKETS_MS[-1]}")
+        return {
+            bound: count
+            for bound, count in zip(bounds, self.latency_buckets, strict=True)
+            if count
+        }
+
+    def summary(self) -> dict[str, Any]:
+        summary = {
+            "calls": self.calls,
+            "errors": self.errors,
+            "retries": self.retries,
+            "latency_ms": round(self.latency_ms, 1),
+            "max_latency_ms": round(self.max_latency_ms, 1),
+            "latency_histogram_ms": self.histogram(),
+        }
+        if self.consumed_capacity:
+            summary["consumed_capacity"] = self.consumed_capacity
+        return summary
+
+    def emf_metrics(self) -> dict[str, Any]:
+        # histogram buckets are reported as their upper bounds, and the
+        # unbounded bucket as the slowest call
+        values = [*LATENCY_BUCKETS_MS, self.max_latency_ms]
+        metrics: dict[str, Any] = {
+            "Calls": self.calls,
+            "Errors": self.errors,
+            "Retries": self.retries,
+            "Latency": {
+                "Values": [
+                    value
+                    for value, count in zip(values, self.latency_buckets, strict=True)
+                    if count
+                ],
+                "Counts": [count for count in self.latency_buckets if count],
+            },
+        }
+        if self.consumed_capacity:
+            metrics["ConsumedCapacity"] = self.consumed_capacity
+        return metrics
+
+
+class CallRecorder:
+    """Collects OperationStats for the instrumented clients. It is safe to share
+    between threads."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.operations: dict[tuple[str, str], OperationStats] = {}
+
+    def record(
+        self,
+        service: str,
+        operation: str,
+        latency_ms: float,
+        error: bool = False,
+        retries: int = 0,
+        consumed_capacity: float = 0.0,
+    ) -> None:
+        with self._lock:
+            stats = self.operations.setdefault((service, operation), OperationStats())
+            stats.record(latency_ms, error, retries, consumed_capacity)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.operations = {}
+
+    def summary(self) -> dict[str, dict[str, Any]]:
+        """Statistics by `<service>.<operation>`"""
+        with self._lock:
+            return {
+                f"{service}.{operation}": stats.summary()
+                for (service, operation), stats in sorted(self.operations.items())
+            }
+
+    def emf_documents(self, namespace: str) -> list[dict[str, Any]]:
+        with self._lock:
+            return [
+                metric_document(
+                    namespace,
+                    {"service": service, "operation": operation},
+                    stats.emf_metrics(),
+                    units={"Latency": "Milliseconds"},
+                )
+                for (service, operation), stats in sorted(self.operations.items())
+            ]
+
+
+recorder = CallRecorder()
+
+
+def _consumed_capacity(parsed: dict[str, Any]) -> float:
+    consumed = parsed.get("ConsumedCapacity", [])
+    if isinstance(consumed, dict):
+        consumed = [consumed]
+    return sum(c.get("CapacityUnits", 0.0) for c in consumed)
+
+
+def _start_call(model: Any, context: dict[str, Any], **_: Any) -> None:
+    context[_CALL] = (model.service_model.service_name, model.name, perf_counter())
+
+
+def _request_consumed_capacity(params: dict[str, Any], model: Any, **_: Any) -> None:
+    if "ReturnConsumedCapacity" in model.input_shape.members:
+        params.setdefault("ReturnConsumedCapacity", "TOTAL")
+
+
+def _end_call(
+    context: dict[str, Any],
+    parsed: dict[str, Any] | None = None,
+    http_response: Any = None,
+    exception: Exception | None = None,
+    **_: Any,
+) -> None:
+    # after-call-error doesn't get the operation model, so it is taken from the
+    # request context, which also prevents recording a call twice
+    if (call := context.pop(_CALL, None)) is None:
+        return
+    service, operation, start = call
+    parsed = parsed or {}
+    recorder.record(
+        service,
+        operation,
+        latency_ms=(perf_counter() - start) * 1e3,
+        error=exception is not None or http_response.status_code >= 300,
+        retries=parsed.get("ResponseMetadata", {}).get("RetryAttempts", 0),
+        consumed_capacity=_consumed_capacity(parsed),
+    )
+
+
+def instrument(client: Any) -> Any:
+    """Register the call recording hooks on a botocore client (or a resource's
+    client), and return it"""
+    events = client.meta.events
+    events.register("provide-client-params", _start_call)
+    events.register("after-call", _end_call)
+    events.register("after-call-error", _end_call)
+    if client.meta.service_model.service_name == "dynamodb":
+        events.register("before-parameter-build", _request_consumed_capacity)
+    return client
+
+
+def emit_summary(logger: Logger | LoggerAdapter | None = None) -> None:
+    """Log (or write as EMF) the statistics recorded since the last reset"""
+    if (_output := output()) is None or not recorder.operations:
+        return
+    if _output == "emf":
+        put_metrics(
+            *recorder.emf_documents(
+                os.getenv("CIRRUS_AWS_CALL_METRICS_NAMESPACE", DEFAULT_NAMESPACE),
+            ),
+        )
+        return
+    summary = recorder.summary()
+    (logger or getLogger(__name__)).info(
+        "AWS calls: %s calls to %s operations",
+        sum(stats["calls"] for stats in summary.values()),
+        len(summary),
+        extra={"aws_calls": summary},
+    )
+
+
+def with_aws_call_summary(logger: Logger | LoggerAdapter | None = None):
+    """Decorate a lambda handler to record the AWS calls of each invocation
+    separately, and emit their summary when the invocation ends"""
+
+    def decorator(function: Callable):
+        @wraps(function)
+        def wrap_function(*args, **kwargs):
+            recorder.reset()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                emit_summary(logger)
+
+        return wrap_function
+
+    return decorator
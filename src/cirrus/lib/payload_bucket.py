@@ -9,7 +9,7 @@ from typing import Any, Self
 from boto3utils import s3
 
 from cirrus.lib.errors import NoUrlError, UndefinedPayloadBucketError
-from cirrus.lib.utils import payload_from_s3
+from cirrus.lib.utils import get_client, json_dumpb, payload_from_s3
 
 DEFAULT_ROOT_PREFIX = "cirrus"
 
@@ -51,29 +51,44 @@ class PayloadBucket:
 
     def _upload_payload(
         self,
-        payload: dict[str, Any],
+        payload: dict[str, Any] | bytes,
         key: str,
         prefix: str = "",
         copy_from_url: bool = True,
     ) -> str:
-        """Helper function to upload a dict (not necessarily a payload) to s3"""
-        if "url" in payload and not copy_from_url:
-            # payload is already uploaded and we're not supposed to copy it
-            return payload["url"]
+        """Helper function to upload a dict (not necessarily a payload) to s3
+
+        Already JSON-encoded payloads can be passed as bytes and are uploaded
+        as-is, to avoid serializing large payloads more than once.
+        """
+        if isinstance(payload, bytes):
+            body = payload
+        else:
+            if "url" in payload and not copy_from_url:
+                # payload is already uploaded and we're not supposed to copy it
+                return payload["url"]
 
-        # if the payload has a URL in it then we'll fetch it from S3
-        with contextlib.suppress(NoUrlError):
-            payload = payload_from_s3(payload)
+            # if the payload has a URL in it then we'll fetch it from S3
+            with contextlib.suppress(NoUrlError):
+                payload = payload_from_s3(payload)
+
+            body = json_dumpb(payload)
 
         prefix = prefix + "/" if prefix else prefix
 
-        url = f"s3://{self.bucket_name}/{prefix}{key}"
-        s3().upload_json(payload, url)
-        return url
+        # we use the cached client rather than a new boto3utils s3 instance so
+        # uploads from worker threads don't race on the default boto3 session
+        get_client("s3").put_object(
+            Bucket=self.bucket_name,
+            Key=f"{prefix}{key}",
+            Body=body,
+            ContentType="application/json",
+        )
+        return f"s3://{self.bucket_name}/{prefix}{key}"
 
     def upload_oversize_payload(
         self,
-        payload: dict[str, Any],
+        payload: dict[str, Any] | bytes,
     ) -> str:
         return self._upload_payload(
             payload=payload,
@@ -130,7 +145,7 @@ class PayloadBucket:
 
     def upload_input_payload(
         self,
-        payload: dict[str, Any],
+        payload: dict[str, Any] | bytes,
         payload_id: str,
         execution_id: str,
     ) -> str:
@@ -142,7 +157,7 @@ class PayloadBucket:
 
     def upload_output_payload(
         self,
-        payload: dict[str, Any],
+        payload: dict[str, Any] | bytes,
         payload_id: str,
         execution_id: str,
     ) -> str:
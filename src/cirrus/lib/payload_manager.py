@@ -1,16 +1,20 @@
 from __future__ import annotations
 
-import json
 import logging
 import os
 import uuid
 
-from copy import deepcopy
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from copy import copy, deepcopy
+from functools import lru_cache, partial
 from typing import NoReturn, Self
 
 import jsonpath_ng.ext as jsonpath
 
+from boto3.dynamodb.types import TypeDeserializer
 from botocore.exceptions import ClientError
+from jsonpath_ng import JSONPath
 
 from cirrus.lib.cirrus_payload import CirrusPayload
 from cirrus.lib.enums import StateEnum
@@ -19,10 +23,13 @@ from cirrus.lib.events import WorkflowEventManager
 from cirrus.lib.logging import CirrusLoggerAdapter
 from cirrus.lib.payload_bucket import PayloadBucket
 from cirrus.lib.statedb import StateDB
+from cirrus.lib.throttle import get_rate_limiter, is_throttling_error
 from cirrus.lib.utils import (
     SNSMessage,
     build_item_sns_attributes,
     get_client,
+    json_dumpb,
+    json_dumps,
 )
 
 logger = logging.getLogger(__name__)
@@ -37,11 +44,57 @@ logger = logging.getLogger(__name__)
 # ensures we have some headroom.
 MAX_PAYLOAD_LENGTH = 120000
 
+# states in which a payload is (re)started without replace
+RESTARTABLE_STATES = (StateEnum.FAILED, StateEnum.ABORTED, StateEnum.CLAIMED, None)
+
+DESERIALIZER = TypeDeserializer()
+
+
+def escaped_length(encoded: bytes) -> int:
+    """Length of a JSON document once embedded as a string in another JSON document
+
+    JSON encoders always escape control characters, so once a document is
+    encoded the only characters needing escaping are quotes and backslashes.
+    This is equivalent to ``len(json.dumps(encoded.decode(),
+    ensure_ascii=False).encode())``, but without encoding the payload again.
+
+    Args:
+        encoded (bytes): the JSON-encoded document
+
+    Returns:
+        int: escaped length, including the surrounding quotes
+    """
+    return len(encoded) + 2 + encoded.count(b'"') + encoded.count(b"\\")
+
+
+@lru_cache(maxsize=128)
+def compile_chain_filter(chain_filter: str) -> JSONPath:
+    """Parse a chain_filter expression into a JSONPath selecting matching features
+
+    Parsing JSONPath is far more expensive than applying it, and a deployment
+    only has a handful of distinct filters, so compiled filters are cached.
+
+    Args:
+        chain_filter (str): filter expression from a process definition
+
+    Returns:
+        JSONPath: compiled expression to find matching features in a payload
+    """
+    return jsonpath.parse(f"$.features[?({chain_filter})]")
+
 
 class TerminalError(Exception):
     pass
 
 
+class ClaimConflictError(Exception):
+    """Raised by a new-only claim when the payload already has a state item"""
+
+    def __init__(self, item: dict) -> None:
+        super().__init__(item)
+        self.item = item
+
+
 class PayloadManager:
     def __init__(
         self,
@@ -93,6 +146,15 @@ class PayloadManager:
         return self._payload_bucket
 
     def next_payloads(self):
+        """Generate the payloads for the next step(s) in a workflow chain
+
+        Next payloads share everything but the process definitions and the
+        features list with this payload (and each other) rather than being deep
+        copies, so they must not be modified in place, only serialized.
+
+        Yields:
+            dict: payload for each next process definition
+        """
         if len(self.payload["process"]) <= 1:
             return None
         next_processes = (
@@ -101,19 +163,34 @@ class PayloadManager:
             else self.payload["process"][1]
         )
         for process in next_processes:
-            new = deepcopy(self.payload)
+            new = copy(self.payload)
             del new["id"]
-            new["process"].pop(0)
-            new["process"][0] = process
+            new["process"] = [process, *deepcopy(self.payload["process"][2:])]
             if "chain_filter" in process:
-                jsonfilter = jsonpath.parse(
-                    f"$.features[?({process['chain_filter']})]",
-                )
-                new["features"] = [match.value for match in jsonfilter.find(new)]
+                jsonfilter = compile_chain_filter(process["chain_filter"])
+                features = self.payload.get("features", [])
+                new["features"] = [
+                    match.value for match in jsonfilter.find({"features": features})
+                ]
+            elif "features" in self.payload:
+                new["features"] = list(self.payload["features"])
             yield new
 
-    def calculate_payload_length(self) -> int:
-        return len(json.dumps(json.dumps(self.payload)).encode())
+    def encode_payload(self) -> bytes:
+        """Serialize the payload to JSON
+
+        The result can be shared between the length check, the S3 upload, and
+        the state machine input so large payloads are only encoded once.
+
+        Returns:
+            bytes: JSON-encoded payload
+        """
+        return json_dumpb(self.payload)
+
+    def calculate_payload_length(self, encoded: bytes | None = None) -> int:
+        if encoded is None:
+            encoded = self.encode_payload()
+        return escaped_length(encoded)
 
     def get_payload(self) -> dict:
         """Get original payload for this PayloadManager
@@ -121,12 +198,13 @@ class PayloadManager:
         Returns:
             Dict: Input payload
         """
-        payload_length = self.calculate_payload_length()
+        encoded = self.encode_payload()
+        payload_length = self.calculate_payload_length(encoded)
         if payload_length <= MAX_PAYLOAD_LENGTH:
             return dict(self.payload)
 
         try:
-            url = self.payload_bucket.upload_oversize_payload(self.payload)
+            url = self.payload_bucket.upload_oversize_payload(encoded)
         except UndefinedPayloadBucketError as e:
             raise RuntimeError(
                 "No payload bucket defined and payload too large: "
@@ -136,11 +214,26 @@ class PayloadManager:
 
         return {"url": url}
 
+    def _execution_input(self, encoded: bytes, url: str) -> str:
+        """Get the state machine input for an already uploaded input payload
+
+        Args:
+            encoded (bytes): JSON-encoded payload
+            url (str): S3 URL the encoded payload was uploaded to
+
+        Returns:
+            str: the payload itself, or a reference to the uploaded input
+                payload if it is too large to pass inline
+        """
+        if self.calculate_payload_length(encoded) <= MAX_PAYLOAD_LENGTH:
+            return encoded.decode()
+        return json_dumps({"url": url})
+
     def items_to_sns_messages(self: Self) -> list[SNSMessage]:
         """Prepare list of Payload Items as SNS Messages for publishing"""
         return [
             SNSMessage(
-                body=json.dumps(item),
+                body=json_dumps(item),
                 attributes=build_item_sns_attributes(item),
             )
             for item in self.payload.items_as_dicts
@@ -163,10 +256,14 @@ class PayloadManager:
         wfem: WorkflowEventManager,
         execution_arn: str,
         previous_state: StateEnum,
+        new_only: bool = False,
     ) -> tuple[str, str]:
         """Claim this PayloadManager's payload, and return
         (state_machine_arn, execution_name)
-        to be used for uploading and invoking the state machine"""
+        to be used for uploading and invoking the state machine
+
+        With new_only, the claim is only made if the payload has no state item,
+        and ClaimConflictError is raised with the existing item otherwise."""
 
         (
             state_machine_arn,
@@ -180,8 +277,20 @@ class PayloadManager:
             wfem.claim_processing(
                 self.payload["id"],
                 execution_arn=execution_arn,
+                new_only=new_only,
             )
         except ClientError as e:
+            if (
+                new_only
+                and e.response["Error"]["Code"] == "ConditionalCheckFailedException"
+                and "Item" in e.response
+            ):
+                raise ClaimConflictError(
+                    {
+                        key: DESERIALIZER.deserialize(value)
+                        for key, value in e.response["Item"].items()
+                    },
+                ) from e
             if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
                 # conditional errors on state being CLAIMED or PROCESSING.
                 # if PROCESSING, skip w/o need for other action, and return None
@@ -244,27 +353,34 @@ class PayloadManager:
         wfem,
         execution_arn,
         previous_state,
+        new_only: bool = False,
     ) -> str | None:
         """Add this PayloadManager's payload to Cirrus and start workflow
 
         Returns:
             str: Payload ID
+
+        Raises:
+            ClaimConflictError: if new_only and the payload already has a state item
         """
 
         state_machine_arn, execution_name = self._claim(
             wfem,
             execution_arn,
             previous_state,
+            new_only=new_only,
         )
 
         if state_machine_arn == "":
             # skipped with likely already PROCESSING (announced from _claim function)
             return None
 
+        encoded = self.encode_payload()
+
         try:
             # add input payload to s3
             url = self.payload_bucket.upload_input_payload(
-                self.payload,
+                encoded,
                 self.payload["id"],
                 execution_name,
             )
@@ -277,13 +393,19 @@ class PayloadManager:
         self.logger.debug("Running Step Function %s", execution_arn)
         started_sfn = False
         try:
-            get_client("stepfunctions").start_execution(
+            get_rate_limiter("stepfunctions").call(
+                get_client("stepfunctions").start_execution,
                 stateMachineArn=state_machine_arn,
                 name=execution_name,
-                input=json.dumps(self.get_payload()),
+                input=self._execution_input(encoded, url),
             )
             started_sfn = True
         except ClientError as e:
+            if is_throttling_error(e):
+                # Still throttled after backing off. The payload stays CLAIMED
+                # rather than FAILED, so a redelivery resumes this execution.
+                self.logger.warning("Throttled starting workflow: %s", e)
+                raise
             if e.response["Error"]["Code"] == "StateMachineDoesNotExist":
                 # This failure is tracked in the DB and we raise an error
                 # so we can handle it specifically, to keep the payload
@@ -436,77 +558,194 @@ class PayloadManagers:
             ":stateMachine:",
         ), execution_name
 
+    @staticmethod
+    def _record_start(
+        payload_ids: dict[str, list[str]],
+        payload_id: str,
+        start: Callable[[], str | None],
+    ) -> None:
+        """Run (or collect the result of) a workflow start and file the payload ID
+        under started, skipped, failed, or throttled accordingly"""
+        try:
+            started_id = start()
+        except TerminalError:
+            payload_ids["failed"].append(payload_id)
+        except ClientError as e:
+            if not is_throttling_error(e):
+                raise
+            # the payload is left CLAIMED, to be started again on redelivery
+            payload_ids["throttled"].append(payload_id)
+        else:
+            if started_id is not None:
+                payload_ids["started"].append(started_id)
+            else:
+                payload_ids["skipped"].append(payload_id)
+
+    def _start(
+        self: Self,
+        wfem: WorkflowEventManager,
+        payload_manager: PayloadManager,
+        state: StateEnum | None,
+        exec_arn: str,
+        replace: bool,
+    ) -> str | None:
+        """Start the workflow for a payload if its state allows, else skip it
+
+        Returns:
+            str | None: Payload ID if started, None if skipped
+        """
+        if state in RESTARTABLE_STATES or replace:
+            return payload_manager(wfem, exec_arn, state)
+
+        payload_id = payload_manager.payload["id"]
+        logger.info("Skipping %s, input already in %s state", payload_id, state)
+        wfem.skipping(
+            payload_id=payload_id,
+            state=state,
+            input_payload_url=self.payload_bucket.get_input_payload_url(
+                payload_id,
+                exec_arn.rpartition(":")[2],
+            ),
+        )
+        return None
+
+    def _start_optimistic(
+        self: Self,
+        wfem: WorkflowEventManager,
+        payload_manager: PayloadManager,
+        exec_arn: str,
+        replace: bool,
+    ) -> str | None:
+        """Claim a payload assuming it is new, falling back to the existing state
+        item returned by the failed claim to decide how to handle it
+
+        Returns:
+            str | None: Payload ID if started, None if skipped
+        """
+        try:
+            return payload_manager(wfem, exec_arn, None, new_only=True)
+        except ClaimConflictError as e:
+            item = self.statedb.dbitem_to_item(e.item)
+        _, (state, exec_arn) = next(self.get_process_attrs([item]))
+        return self._start(wfem, payload_manager, state, exec_arn, replace)
+
     def process(
         self: Self,
         wfem: WorkflowEventManager,
         replace: bool = False,
+        max_workers: int = 1,
+        optimistic: bool = False,
     ) -> dict[str, list[str]]:
         """Create Item in Cirrus State DB for each PayloadManager's payload and add to
-        processing queue"""
+        processing queue
+
+        Args:
+            wfem (WorkflowEventManager): event manager used to record state changes
+            replace (bool): start workflows regardless of existing state
+            max_workers (int): maximum number of payloads to start concurrently.
+                With the default of 1 payloads are started serially, in order;
+                larger values run the claim/upload/start/set-processing sequence
+                for each payload in a thread pool, so the wall time for a batch
+                approaches that of its slowest payload.
+            optimistic (bool): skip reading the existing states up front and
+                claim each payload as if it were new. Payloads that turn out to
+                have a state item are handled using the item returned by the
+                failed claim, so mostly-new batches save a read round trip.
+
+        Returns:
+            dict[str, list[str]]: payload IDs grouped by outcome (started, skipped,
+                dropped, failed, throttled). Throttled payloads could not be
+                started even after backing off, and should be retried.
+        """
         payload_ids: dict[str, list[str]] = {
             "started": [],
             "skipped": [],
             "dropped": [],
             "failed": [],
+            "throttled": [],
         }
-        # check existing states
-        states = self.get_states_and_exec_arn()
+        # with known state items there's nothing to gain from claiming blind
+        optimistic = optimistic and self.state_items is None
 
-        for payload_manager in self.payload_managers:
-            _replace = replace or payload_manager.payload.process_definition.get(
-                "replace",
-                False,
-            )
+        # check existing states, unless we are assuming there are none
+        states = (
+            {
+                p.payload["id"]: (
+                    None,
+                    self.gen_execution_arn(
+                        p.payload["id"],
+                        p.payload.process_definition["workflow"],
+                    ),
+                )
+                for p in self.payload_managers
+            }
+            if optimistic
+            else self.get_states_and_exec_arn()
+        )
 
-            # check existing state for Item, if any
-            state, exec_arn = states[payload_manager.payload["id"]]
-            execution_id = exec_arn.rpartition(":")[2]
+        # duplicate detection has to happen up front, as with concurrent starts
+        # the outcome of the first instance of a payload may not be known yet
+        seen: set[str] = set()
+        pending: list[tuple[str, Future]] = []
+        executor = (
+            ThreadPoolExecutor(max_workers=max_workers) if max_workers > 1 else None
+        )
 
-            if (
-                payload_manager.payload["id"] in payload_ids["started"]
-                or payload_manager.payload["id"] in payload_ids["skipped"]
-                or payload_manager.payload["id"] in payload_ids["failed"]
-            ):
-                logger.warning(
-                    "Dropping duplicated payload %s",
-                    payload_manager.payload["id"],
+        try:
+            for payload_manager in self.payload_managers:
+                _replace = replace or payload_manager.payload.process_definition.get(
+                    "replace",
+                    False,
                 )
-                wfem.duplicated(
-                    payload_manager.payload["id"],
-                    input_payload_url=self.payload_bucket.get_input_payload_url(
-                        payload_manager.payload["id"],
-                        execution_id,
-                    ),
+
+                # check existing state for Item, if any
+                payload_id = payload_manager.payload["id"]
+                state, exec_arn = states[payload_id]
+
+                if payload_id in seen:
+                    logger.warning("Dropping duplicated payload %s", payload_id)
+                    wfem.duplicated(
+                        payload_id,
+                        input_payload_url=self.payload_bucket.get_input_payload_url(
+                            payload_id,
+                            exec_arn.rpartition(":")[2],
+                        ),
+                    )
+                    payload_ids["dropped"].append(payload_id)
+                    continue
+
+                seen.add(payload_id)
+
+                start = (
+                    partial(
+                        self._start_optimistic,
+                        wfem,
+                        payload_manager,
+                        exec_arn,
+                        _replace,
+                    )
+                    if optimistic
+                    else partial(
+                        self._start,
+                        wfem,
+                        payload_manager,
+                        state,
+                        exec_arn,
+                        _replace,
+                    )
                 )
-                payload_ids["dropped"].append(payload_manager.payload["id"])
-            elif (
-                state in (StateEnum.FAILED, StateEnum.ABORTED, StateEnum.CLAIMED, None)
-                or _replace
-            ):
-                try:
-                    payload_id = payload_manager(wfem, exec_arn, state)
-                except TerminalError:
-                    payload_ids["failed"].append(payload_manager.payload["id"])
+                if executor is None:
+                    self._record_start(payload_ids, payload_id, start)
                 else:
-                    if payload_id is not None:
-                        payload_ids["started"].append(payload_id)
-                    else:
-                        payload_ids["skipped"].append(payload_manager.payload["id"])
-            else:
-                logger.info(
-                    "Skipping %s, input already in %s state",
-                    payload_manager.payload["id"],
-                    state,
-                )
-                wfem.skipping(
-                    payload_id=payload_manager.payload["id"],
-                    state=state,
-                    input_payload_url=self.payload_bucket.get_input_payload_url(
-                        payload_manager.payload["id"],
-                        execution_id,
-                    ),
-                )
-                payload_ids["skipped"].append(payload_manager.payload["id"])
-                continue
+                    pending.append((payload_id, executor.submit(start)))
+
+            # results are collected in submission order so the returned lists are
+            # deterministic; any non-terminal error is raised once all workers
+            # have finished, as those payloads will be retried
+            for payload_id, future in pending:
+                self._record_start(payload_ids, payload_id, future.result)
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True)
 
         return payload_ids
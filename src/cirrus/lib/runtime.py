@@ -0,0 +1,120 @@
+"""Objects shared by all invocations of a lambda function in a warm container
+
+Building a StateDB, EventDB, WorkflowEventManager, or WorkflowMetricReader
+reads configuration from the environment and may make AWS calls (e.g.,
+creating a workflow metrics log stream or listing CloudWatch metrics), so the
+lambda handlers get them from here: each is built on first use and then reused
+for the lifetime of the container, as are the SNS/SQS publishers shared by
+topic ARN and queue URL (`cirrus.lib.utils.get_sns_publisher` and
+`get_sqs_publisher`, and the publishers here that offload oversized messages
+to the payload bucket). `reset()` discards them all, for tests that change the
+environment between invocations.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+from functools import cache, wraps
+from logging import Logger, LoggerAdapter, getLogger
+
+from cirrus.lib.eventdb import EventDB
+from cirrus.lib.events import WorkflowEventManager, WorkflowMetricReader
+from cirrus.lib.payload_bucket import PayloadBucket
+from cirrus.lib.statedb import StateDB
+from cirrus.lib.utils import (
+    SNSPublisher,
+    SQSPublisher,
+    get_sns_publisher,
+    get_sqs_publisher,
+    publish_max_workers,
+)
+
+logger = getLogger(__name__)
+
+
+@cache
+def get_payload_bucket() -> PayloadBucket:
+    return PayloadBucket.from_env()
+
+
+@cache
+def get_offloading_sns_publisher(topic_arn: str) -> SNSPublisher:
+    """Get the shared SNSPublisher for a topic that uploads messages too large
+    to publish to the payload bucket and sends them by reference"""
+    return SNSPublisher(
+        topic_arn,
+        logger=logger,
+        max_workers=publish_max_workers(),
+        offload=get_payload_bucket().upload_oversize_payload,
+    )
+
+
+@cache
+def get_offloading_sqs_publisher(queue_url: str) -> SQSPublisher:
+    """Get the shared SQSPublisher for a queue that offloads oversized messages,
+    like `get_offloading_sns_publisher`"""
+    return SQSPublisher(
+        queue_url,
+        logger=logger,
+        max_workers=publish_max_workers(),
+        offload=get_payload_bucket().upload_oversize_payload,
+    )
+
+
+@cache
+def get_statedb() -> StateDB:
+    return StateDB(payload_bucket=get_payload_bucket())
+
+
+@cache
+def get_eventdb() -> EventDB:
+    return EventDB()
+
+
+@cache
+def get_metric_reader() -> WorkflowMetricReader:
+    return WorkflowMetricReader()
+
+
+@cache
+def get_workflow_event_manager(
+    logger: Logger | LoggerAdapter | None = None,
+) -> WorkflowEventManager:
+    return WorkflowEventManager(
+        logger=logger,
+        statedb=get_statedb(),
+        eventdb=get_eventdb(),
+    )
+
+
+def with_workflow_event_manager(logger: Logger | LoggerAdapter | None = None):
+    """Like `WorkflowEventManager.with_wfem`, but injects the container's shared
+    WorkflowEventManager, which is flushed at the end of each call, or before the
+    invocation times out, given the lambda context as the second argument"""
+
+    def decorator(function: Callable):
+        @wraps(function)
+        def wrap_function(*args, **kwargs):
+            with get_workflow_event_manager(logger) as wfem:
+                wfem.set_deadline(args[1] if len(args) > 1 else kwargs.get("context"))
+                return function(*args, **kwargs, wfem=wfem)
+
+        return wrap_function
+
+    return decorator
+
+
+def reset() -> None:
+    """Discard the shared objects so they are rebuilt on next use"""
+    for getter in (
+        get_sns_publisher,
+        get_sqs_publisher,
+        get_offloading_sns_publisher,
+        get_offloading_sqs_publisher,
+        get_payload_bucket,
+        get_statedb,
+        get_eventdb,
+        get_metric_reader,
+        get_workflow_event_manager,
+    ):
+        getter.cache_clear()
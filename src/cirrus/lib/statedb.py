@@ -1,25 +1,112 @@
 from __future__ import annotations
 
+import base64
 import functools
+import json
 import logging
 import os
+import random
 
+from collections.abc import Generator, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
 from datetime import UTC, datetime, timedelta
+from time import sleep
 from types import MethodType
 from typing import Any, Self
 
 import boto3
 
 from boto3.dynamodb.conditions import Attr, Key
+from botocore.exceptions import ClientError
 
 from cirrus.exceptions import ExecutionNotFoundError, PayloadNotFoundError
 
 from .enums import StateEnum
 from .payload_bucket import PayloadBucket
-from .utils import execution_url, get_resource
+from .throttle import backoff_delay, get_rate_limiter
+from .utils import execution_url, get_resource, iter_concurrently
 
 logger = logging.getLogger(__name__)
 
+# DynamoDB BatchGetItem accepts at most 100 keys per request
+BATCH_GET_MAX_KEYS = 100
+BATCH_GET_MAX_RETRIES = 8
+BATCH_GET_BASE_DELAY = 0.05  # seconds
+BATCH_GET_MAX_WORKERS = 4
+HISTOGRAM_MAX_WORKERS = len(StateEnum)
+# attempts at a counted state change, which is retried if the state changes
+# between reading it and writing the new one, or if the transaction conflicts
+# with another or is throttled
+COUNTED_WRITE_MAX_ATTEMPTS = 5
+# cancellation reasons, of any item of a counted state change, to retry it on
+TRANSACTION_RETRY_CODES = frozenset(
+    (
+        "ProvisionedThroughputExceeded",
+        "RequestLimitExceeded",
+        "ThrottlingError",
+        "TransactionConflict",
+    ),
+)
+# scanned pages buffered per segment before the segment's worker waits
+SCAN_BUFFERED_PAGES = 2
+
+KEY_ATTRIBUTES = ("collections_workflow", "itemids")
+
+# the attributes each field of StateDB.dbitem_to_item is derived from, besides
+# the key attributes which are always fetched
+ITEM_FIELD_ATTRIBUTES: dict[str, tuple[str, ...]] = {
+    "payload_id": (),
+    "collections": (),
+    "workflow": (),
+    "items": (),
+    "state": ("state_updated",),
+    "created": ("created",),
+    "updated": ("updated",),
+    "input_payload_url": ("executions",),
+    "output_payload_url": ("executions", "state_updated"),
+    "executions": ("executions",),
+    "outputs": ("outputs",),
+    "last_error": ("last_error",),
+    "claimed_at": ("claimed_at",),
+}
+ITEM_FIELDS = tuple(ITEM_FIELD_ATTRIBUTES)
+
+
+def projection(attributes: Iterable[str]) -> dict[str, Any]:
+    """DynamoDB request parameters to fetch only the given attributes (and the
+    key attributes)"""
+    names = {
+        f"#a{i}": attr
+        for i, attr in enumerate(dict.fromkeys([*KEY_ATTRIBUTES, *attributes]))
+    }
+    return {
+        "ProjectionExpression": ", ".join(names),
+        "ExpressionAttributeNames": names,
+    }
+
+
+def item_fields_to_attributes(fields: Iterable[str]) -> list[str]:
+    """Get the StateDB attributes needed to build the given item fields
+
+    Args:
+        fields (Iterable[str]): fields of the items from StateDB.dbitem_to_item
+
+    Raises:
+        ValueError: if any of the fields is unknown
+
+    Returns:
+        List[str]: attribute names
+    """
+    fields = list(fields)
+    if unknown := [f for f in fields if f not in ITEM_FIELD_ATTRIBUTES]:
+        raise ValueError(
+            f"Unknown item fields: {', '.join(unknown)} "
+            f"(valid fields: {', '.join(ITEM_FIELDS)})",
+        )
+    return list(
+        dict.fromkeys(attr for f in fields for attr in ITEM_FIELD_ATTRIBUTES[f]),
+    )
+
 
 def to_current(item: dict[str, Any]) -> dict[str, Any]:
     """Compatiblity function for cirrus-dashboard"""
@@ -95,12 +182,16 @@ class StateDB:
         table_name: str | None = None,
         session: boto3.Session | None = None,
         payload_bucket: PayloadBucket | None = None,
+        counts_table_name: str | None = None,
     ):
         """Initialize a StateDB instance using the Cirrus State DB table
 
         Args:
             table_name (str, optional): The Cirrus StateDB Table name.
                 Defaults to os.getenv('CIRRUS_STATE_DB', None).
+            counts_table_name (str, optional): Name of an optional table, keyed
+                on collections_workflow, in which per-state item counts are
+                maintained. Defaults to os.getenv('CIRRUS_STATE_COUNTS_DB', None).
         """
         table_name = table_name if table_name else os.getenv("CIRRUS_STATE_DB")
 
@@ -115,9 +206,223 @@ class StateDB:
             payload_bucket if payload_bucket else PayloadBucket.from_env()
         )
 
+        counts_table_name = (
+            counts_table_name
+            if counts_table_name
+            else os.getenv("CIRRUS_STATE_COUNTS_DB")
+        )
+        self.counts_table_name = counts_table_name
+        self.counts_table = (
+            self.db.Table(counts_table_name) if counts_table_name else None
+        )
+
+    def _update_item(self, **kwargs) -> dict[str, Any]:
+        """Update an item, backing off and retrying if the table is throttled
+
+        If the update sets a new state and state counts are enabled, the update
+        and the move of the partition's count from the old state to the new one
+        are written together in one transaction (see `_write_counted`).
+        """
+        new_state = kwargs.get("ExpressionAttributeValues", {}).get(":state_updated")
+        if self.counts_table is None or new_state is None:
+            return get_rate_limiter("dynamodb").call(self.table.update_item, **kwargs)
+        return self._write_counted("Update", kwargs, new_state.split("_")[0])
+
+    def _write_counted(
+        self,
+        action: str,
+        params: dict[str, Any],
+        new_state: str | None,
+    ) -> dict[str, Any]:
+        """Write to a state item and its partition's state counts atomically
+
+        The current state of the item is read first, and the write (an Update
+        or a Delete, with the given table-level parameters) is made in a
+        transaction with the counts update, on the condition that the state
+        hasn't changed since. If it has, or the transaction conflicts with
+        another write to the state or counts item (e.g., a concurrent change
+        in the same workflow) or is throttled, this is retried with jittered
+        backoff.
+
+        Args:
+            action (str): transaction action for the item, Update or Delete
+            params (dict): parameters of the action, as for the Table resource
+            new_state (str | None): state of the item after the write, None if
+                it is deleted
+
+        Raises:
+            ClientError: ConditionalCheckFailedException, with the existing
+                `Item` if there is one, if the write's own condition fails, as
+                update_item would, or the TransactionCanceledException of the
+                last attempt if none succeeded
+        """
+        key = params["Key"]
+        attempt = 0
+        while True:
+            old_state_updated = (
+                self.table.get_item(
+                    Key=key,
+                    ConsistentRead=True,
+                    **projection(["state_updated"]),
+                )
+                .get("Item", {})
+                .get("state_updated")
+            )
+            try:
+                return get_rate_limiter("dynamodb").call(
+                    self.db.meta.client.transact_write_items,
+                    TransactItems=self._counted_transaction(
+                        action,
+                        params,
+                        old_state_updated,
+                        new_state,
+                    ),
+                )
+            except ClientError as e:
+                if e.response["Error"]["Code"] != "TransactionCanceledException":
+                    raise
+                reasons = e.response.get("CancellationReasons") or [{}]
+                # the first reason is the state item's, the second the counts'
+                reason = reasons[0]
+                item = reason.get("Item", {})
+                if any(r.get("Code") in TRANSACTION_RETRY_CODES for r in reasons) or (
+                    reason.get("Code") == "ConditionalCheckFailed"
+                    and item.get("state_updated", {}).get("S") != old_state_updated
+                ):
+                    # an item is being written concurrently, or the state has
+                    # been changed since it was read
+                    attempt += 1
+                    if attempt < COUNTED_WRITE_MAX_ATTEMPTS:
+                        sleep(backoff_delay(attempt - 1))
+                        continue
+                    logger.warning(
+                        "Gave up writing the state of %s after %s attempts",
+                        key,
+                        attempt,
+                    )
+                    raise
+                if reason.get("Code") != "ConditionalCheckFailed":
+                    raise
+                error: dict[str, Any] = {
+                    "Error": {
+                        "Code": "ConditionalCheckFailedException",
+                        "Message": "The conditional request failed",
+                    },
+                }
+                if item:
+                    error["Item"] = item
+                raise ClientError(error, f"{action}Item") from e
+
+    def _counted_transaction(
+        self,
+        action: str,
+        params: dict[str, Any],
+        old_state_updated: str | None,
+        new_state: str | None,
+    ) -> list[dict[str, Any]]:
+        """Build the TransactItems of `_write_counted`, conditional on the item
+        still having old_state_updated"""
+        write = {
+            name: value
+            for name, value in params.items()
+            if name not in ("Key", "ConditionExpression", "ExpressionAttributeValues")
+        }
+        values = dict(params.get("ExpressionAttributeValues", {}))
+        if old_state_updated:
+            guard = "state_updated = :old_state_updated"
+            values[":old_state_updated"] = old_state_updated
+        else:
+            guard = "attribute_not_exists(state_updated)"
+        condition = params.get("ConditionExpression")
+        write.update(
+            TableName=self.table_name,
+            Key=params["Key"],
+            ConditionExpression=f"({condition}) AND {guard}" if condition else guard,
+            ReturnValuesOnConditionCheckFailure="ALL_OLD",
+        )
+        if values:
+            write["ExpressionAttributeValues"] = values
+
+        transaction = [{action: write}]
+        old_state = old_state_updated.split("_")[0] if old_state_updated else None
+        if old_state != new_state:
+            deltas = {old_state: -1, new_state: 1}
+            transaction.append(
+                self._counts_update(
+                    params["Key"]["collections_workflow"],
+                    {state: d for state, d in deltas.items() if state is not None},
+                ),
+            )
+        return transaction
+
+    def _counts_update(
+        self,
+        collections_workflow: str,
+        deltas: dict[str, int],
+    ) -> dict[str, Any]:
+        """Transaction item adding the deltas to a partition's state counts"""
+        return {
+            "Update": {
+                "TableName": self.counts_table_name,
+                "Key": {"collections_workflow": collections_workflow},
+                "UpdateExpression": "ADD "
+                + ", ".join(f"#s{i} :d{i}" for i in range(len(deltas))),
+                "ExpressionAttributeNames": {
+                    f"#s{i}": state for i, state in enumerate(deltas)
+                },
+                "ExpressionAttributeValues": {
+                    f":d{i}": delta for i, delta in enumerate(deltas.values())
+                },
+            },
+        }
+
+    def get_state_counts(self, collections_workflow: str) -> dict[str, int] | None:
+        """Get the maintained per-state item counts for a partition
+
+        Args:
+            collections_workflow (str): /-separated list of collections
+
+        Returns:
+            Dict: counts keyed by state, in StateEnum order, or None if state
+                counts are not enabled
+        """
+        if self.counts_table is None:
+            return None
+        item = self.counts_table.get_item(
+            Key={"collections_workflow": collections_workflow},
+        ).get("Item", {})
+        return {state.value: int(item.get(state.value, 0)) for state in StateEnum}
+
+    def rebuild_state_counts(self, collections_workflow: str) -> dict[str, int | str]:
+        """Recount the items in each state for a partition and store the counts
+
+        Transitions that happen while the partition is being counted may be
+        missed, so this is best run while the partition is quiet.
+
+        Args:
+            collections_workflow (str): /-separated list of collections
+
+        Returns:
+            Dict: the new counts keyed by state
+
+        Raises:
+            ValueError: if state counts are not enabled
+        """
+        if self.counts_table is None:
+            raise ValueError("state counts are not enabled for this StateDB")
+        counts = self.get_state_histogram(collections_workflow, use_counts=False)
+        self.counts_table.put_item(
+            Item={"collections_workflow": collections_workflow, **counts},
+        )
+        return counts
+
     def delete_item(self, payload_id: str):
         key = self.payload_id_to_key(payload_id)
-        response = self.table.delete_item(Key=key)
+        response = (
+            self.table.delete_item(Key=key)
+            if self.counts_table is None
+            else self._write_counted("Delete", {"Key": key}, None)
+        )
         logger.debug("Removed item", extra=key)
         return response
 
@@ -151,11 +456,23 @@ class StateDB:
         except KeyError:
             raise PayloadNotFoundError(payload_id) from None
 
-    def get_dbitems(self, payload_ids: list[str]) -> list[dict]:
+    def get_dbitems(
+        self,
+        payload_ids: list[str],
+        attributes: list[str] | None = None,
+        max_workers: int = BATCH_GET_MAX_WORKERS,
+    ) -> list[dict]:
         """Get multiple DynamoDB Items
 
+        Keys are requested in chunks of up to 100 (the BatchGetItem limit), with
+        chunks fetched concurrently. Any keys DynamoDB returns as unprocessed are
+        retried with exponential backoff.
+
         Args:
             payload_ids (List[str]): A List of Payload IDs
+            attributes (Optional[List[str]]): Only fetch these attributes (the
+                key attributes are always included). Defaults to all attributes.
+            max_workers (int): Maximum number of chunks to fetch concurrently.
 
         Raises:
             Exception: Error getting items
@@ -164,23 +481,68 @@ class StateDB:
             List[Dict]: A list of DynamoDB Items
         """
         try:
-            resp = self.db.meta.client.batch_get_item(
-                RequestItems={
-                    self.table_name: {
-                        "Keys": [self.payload_id_to_key(x) for x in set(payload_ids)],
-                    },
-                },
-            )
-            items = []
-            for r in resp["Responses"][self.table_name]:
-                items.append(r)
-            logger.debug("Fetched %s items", len(items))
-            return items
+            keys = [self.payload_id_to_key(x) for x in dict.fromkeys(payload_ids)]
+            chunks = [
+                keys[i : i + BATCH_GET_MAX_KEYS]
+                for i in range(0, len(keys), BATCH_GET_MAX_KEYS)
+            ]
+            if len(chunks) <= 1 or max_workers <= 1:
+                results = [self._batch_get_chunk(chunk, attributes) for chunk in chunks]
+            else:
+                with ThreadPoolExecutor(
+                    max_workers=min(max_workers, len(chunks)),
+                ) as executor:
+                    results = list(
+                        executor.map(
+                            lambda chunk: self._batch_get_chunk(chunk, attributes),
+                            chunks,
+                        ),
+                    )
         except Exception as e:
             msg = "Error fetching items"
             logger.exception(msg)
             raise Exception(msg) from e
 
+        items = [item for result in results for item in result]
+        logger.debug("Fetched %s items", len(items))
+        return items
+
+    def _batch_get_chunk(
+        self,
+        keys: list[dict],
+        attributes: list[str] | None = None,
+    ) -> list[dict]:
+        """Fetch a single BatchGetItem-sized chunk of keys, retrying unprocessed
+        keys with jittered exponential backoff"""
+        request: dict[str, Any] = {"Keys": keys}
+        if attributes:
+            request.update(projection(attributes))
+
+        items: list[dict] = []
+        for attempt in range(BATCH_GET_MAX_RETRIES + 1):
+            if attempt:
+                sleep(random.uniform(0, BATCH_GET_BASE_DELAY * 2**attempt))  # noqa: S311
+            resp = get_rate_limiter("dynamodb").call(
+                self.db.meta.client.batch_get_item,
+                RequestItems={self.table_name: request},
+            )
+            items.extend(resp["Responses"].get(self.table_name, []))
+
+            unprocessed = resp.get("UnprocessedKeys", {}).get(self.table_name)
+            if not unprocessed:
+                return items
+            logger.debug(
+                "Retrying %s unprocessed keys (attempt %s)",
+                len(unprocessed["Keys"]),
+                attempt + 1,
+            )
+            request = unprocessed
+
+        raise RuntimeError(
+            f"{len(request['Keys'])} keys still unprocessed after "
+            f"{BATCH_GET_MAX_RETRIES} retries",
+        )
+
     def get_counts(
         self,
         collections_workflow: str,
@@ -216,6 +578,59 @@ class StateDB:
 
         return counts
 
+    def get_state_histogram(
+        self,
+        collections_workflow: str,
+        since: timedelta | None = None,
+        limit: int | None = None,
+        max_workers: int = HISTOGRAM_MAX_WORKERS,
+        use_counts: bool = True,
+    ) -> dict[str, int | str]:
+        """Get the number of items in each state
+
+        If state counts are enabled (and no since filter is given) they are read
+        in a single request. Otherwise the count query for each state is paged
+        independently of the others, so they are run concurrently and the total
+        time is that of the largest.
+
+        Args:
+            collections_workflow (str): /-separated list of collections
+                (input or output depending on index).
+            since (timedelta, optional): only count items updated since this
+                amount of time in the past.
+            limit (int, optional): The max number to return per state, anything
+                over will be reported as "<limit>+", e.g. "1000+".
+            max_workers (int, optional): maximum number of concurrent queries.
+            use_counts (bool, optional): use the maintained state counts, if
+                enabled, rather than querying.
+
+        Returns:
+            Dict: counts keyed by state, in StateEnum order
+        """
+        counts = (
+            self.get_state_counts(collections_workflow)
+            if use_counts and since is None
+            else None
+        )
+        if counts is not None:
+            return {
+                state: f"{limit}+" if limit and count > limit else count
+                for state, count in counts.items()
+            }
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                state: executor.submit(
+                    self.get_counts,
+                    collections_workflow,
+                    limit=limit,
+                    state=state,
+                    since=since,
+                )
+                for state in StateEnum
+            }
+        return {state.value: future.result() for state, future in futures.items()}
+
     def get_item(
         self: Self,
         payload_id: str,
@@ -233,11 +648,72 @@ class StateDB:
         """
         return self.dbitem_to_item(self.get_dbitem(payload_id))
 
+    def _scan_pages(self, **kwargs) -> Generator[list[dict[str, Any]], None, None]:
+        """Yield the pages of items of a (segment of a) table scan"""
+        while True:
+            resp = get_rate_limiter("dynamodb").call(self.table.scan, **kwargs)
+            yield resp.get("Items", [])
+            if "LastEvaluatedKey" not in resp:
+                return
+            kwargs["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+
+    def scan_items(
+        self,
+        segments: int = 1,
+        filter_expression: Any = None,
+        attributes: list[str] | None = None,
+        page_size: int | None = None,
+    ) -> Generator[dict[str, Any], None, None]:
+        """Yield every DynamoDB Item in the table
+
+        With more than one segment, this runs a DynamoDB parallel scan with a
+        worker thread per segment. Items are yielded as their pages arrive, in
+        no particular order, and only a couple of pages per segment are
+        buffered, so memory use does not grow with the table size. The workers
+        are stopped if the generator is closed early.
+
+        Args:
+            segments (int): Number of segments to scan concurrently.
+            filter_expression (optional): Only yield items matching this
+                FilterExpression, e.g., a boto3.dynamodb.conditions.Attr
+                condition. Filtered items still consume read capacity.
+            attributes (Optional[List[str]]): Only fetch these attributes (the
+                key attributes are always included). Defaults to all attributes.
+            page_size (Optional[int]): Maximum number of items evaluated per
+                Scan request.
+
+        Returns:
+            Generator[Dict]: DynamoDB Items
+        """
+        kwargs: dict[str, Any] = {}
+        if filter_expression is not None:
+            kwargs["FilterExpression"] = filter_expression
+        if attributes:
+            kwargs.update(projection(attributes))
+        if page_size:
+            kwargs["Limit"] = page_size
+
+        if segments <= 1:
+            for page in self._scan_pages(**kwargs):
+                yield from page
+            return
+
+        segment_pages = [
+            self._scan_pages(Segment=segment, TotalSegments=segments, **kwargs)
+            for segment in range(segments)
+        ]
+        for page in iter_concurrently(
+            segment_pages,
+            buffer_size=segments * SCAN_BUFFERED_PAGES,
+        ):
+            yield from page
+
     def get_items_page(
         self: Self,
         collections_workflow: str,
         limit: int = 100,
         nextkey: str | None = None,
+        fields: list[str] | None = None,
         **kwargs,
     ) -> dict[str, Any]:
         """Get Items by query
@@ -245,7 +721,10 @@ class StateDB:
         Args:
             collections_workflow (str): /-separated list of input collections_workflow
             limit (int, optional): number of items to return per page
-            nextkey (str, optional): the item ID from which to begin returned page
+            nextkey (str, optional): the cursor returned as nextkey by the previous
+                page, or (for compatibility) the payload ID of the last item on it
+            fields (list[str], optional): only fetch what is needed for, and
+                return, these item fields. Defaults to all fields.
 
             Additional kwargs used by StateDB.query() are also supported here.
 
@@ -261,28 +740,60 @@ class StateDB:
         )
 
         if nextkey:
-            dbitem = self.get_dbitem(nextkey)
-            startkey = {
-                key: dbitem[key]
-                for key in [
-                    "collections_workflow",
-                    "itemids",
-                    "state_updated",
-                    "updated",
-                ]
-            }
-            kwargs["ExclusiveStartKey"] = startkey
+            kwargs["ExclusiveStartKey"] = self.nextkey_to_start_key(nextkey)
+        if fields is not None:
+            kwargs["attributes"] = item_fields_to_attributes(fields)
 
         resp = self.query(**kwargs)
 
         for i in resp["Items"]:
-            items["items"].append(self.dbitem_to_item(i))
+            items["items"].append(self.dbitem_to_item(i, fields=fields))
 
         if "LastEvaluatedKey" in resp:
-            items["nextkey"] = self.key_to_payload_id(resp["LastEvaluatedKey"])
+            items["nextkey"] = self.encode_cursor(resp["LastEvaluatedKey"])
 
         return items
 
+    def yield_items(
+        self: Self,
+        collections_workflow: str,
+        limit: int | None = None,
+        nextkey: str | None = None,
+        page_size: int | None = None,
+        **kwargs,
+    ) -> Iterator[dict[str, Any]]:
+        """Yield items from database, querying for a page at a time
+
+        Args:
+            collections_workflow (str): /-separated list of input collections_workflow
+            limit (int, optional): Maximum number of items to yield. Defaults to None.
+            nextkey (str, optional): nextkey from which to start
+            page_size (int, optional): Number of items to query for at a time.
+                Defaults to the get_items_page default.
+
+            Additional kwargs used by StateDB.get_items_page() are also supported.
+
+        Returns:
+            Iterator[dict[str, Any]]: StateDB Items
+        """
+        if page_size:
+            kwargs["limit"] = page_size
+        count = 0
+        while True:
+            resp = self.get_items_page(
+                collections_workflow,
+                nextkey=nextkey,
+                **kwargs,
+            )
+            for item in resp["items"]:
+                if limit is not None and count >= limit:
+                    return
+                count += 1
+                yield item
+            if "nextkey" not in resp:
+                return
+            nextkey = resp["nextkey"]
+
     def get_items(
         self: Self,
         collections_workflow: str,
@@ -295,25 +806,19 @@ class StateDB:
         Args:
             limit (int, optional): Maximum number of items to return. Defaults to None.
 
+            Additional kwargs used by StateDB.yield_items() are also supported.
+
         Returns:
             list[dict[str, Any]]: StateDB Items
         """
-        resp = self.get_items_page(
-            collections_workflow,
-            nextkey=nextkey,
-            **kwargs,
-        )
-        items = resp["items"]
-        while "nextkey" in resp and (limit is None or len(items) < limit):
-            resp = self.get_items_page(
+        return list(
+            self.yield_items(
                 collections_workflow,
-                nextkey=resp["nextkey"],
+                limit=limit,
+                nextkey=nextkey,
                 **kwargs,
-            )
-            items += resp["items"]
-        if limit is None or len(items) < limit:
-            return items
-        return items[:limit]
+            ),
+        )
 
     def get_state(self, payload_id: str) -> StateEnum | None:
         """Get current state of Item
@@ -336,11 +841,12 @@ class StateDB:
             Dict[str, str]: Dictionary of Payload IDs to state
         """
         # Should states have all payload_ids in it? None state for those not found?
-        states = {}
-        for dbitem in self.get_dbitems(payload_ids):
-            item = self.dbitem_to_item(dbitem)
-            states[item["payload_id"]] = StateEnum(item["state"])
-        return states
+        return {
+            self.key_to_payload_id(dbitem): StateEnum(
+                dbitem["state_updated"].split("_")[0],
+            )
+            for dbitem in self.get_dbitems(payload_ids, attributes=["state_updated"])
+        }
 
     @ValidStateChange
     def claim_processing(
@@ -348,6 +854,7 @@ class StateDB:
         payload_id: str,
         execution_arn: str,
         isotimestamp: str | None = None,
+        new_only: bool = False,
     ) -> dict[str, Any]:
         """Sets payload_id to CLAIMED and sets the prospective execution_arn.
         This prevents other runs from starting a duplicate stepfunction.  As the
@@ -356,6 +863,9 @@ class StateDB:
             payload_id (str): The Cirrus Payload
             execution_arn (str): The anticipated execution ARN
             isotimestamp (str): ISO format UTC timestamp for this action.
+            new_only (bool): only claim the payload if it has no state yet. On
+                conflict the existing item is returned in the error response,
+                whatever its state.
 
         Returns:
             Dict: DynamoDB response
@@ -374,22 +884,28 @@ class StateDB:
             "executions = list_append(if_not_exists(executions, :empty_list), :exes) "
             "REMOVE last_error, outputs"
         )
-        return self.table.update_item(
-            Key=key,
-            UpdateExpression=expr,
-            ConditionExpression=(
+        expr_attrs: dict[str, Any] = {
+            ":created": now,
+            ":state_updated": f"{StateEnum.CLAIMED}_{now}",
+            ":updated": now,
+            ":exes": [execution_arn],
+            ":empty_list": [],
+        }
+        if new_only:
+            condition = "attribute_not_exists(state_updated)"
+        else:
+            condition = (
                 "NOT (begins_with(state_updated, :proc) "
                 "or begins_with(state_updated, :claim))"
-            ),
-            ExpressionAttributeValues={
-                ":created": now,
-                ":state_updated": f"{StateEnum.CLAIMED}_{now}",
-                ":updated": now,
-                ":proc": StateEnum.PROCESSING,
-                ":claim": StateEnum.CLAIMED,
-                ":exes": [execution_arn],
-                ":empty_list": [],
-            },
+            )
+            expr_attrs[":proc"] = StateEnum.PROCESSING
+            expr_attrs[":claim"] = StateEnum.CLAIMED
+
+        return self._update_item(
+            Key=key,
+            UpdateExpression=expr,
+            ConditionExpression=condition,
+            ExpressionAttributeValues=expr_attrs,
             ReturnValuesOnConditionCheckFailure="ALL_OLD",
         )
 
@@ -412,7 +928,7 @@ class StateDB:
         key = self.payload_id_to_key(payload_id)
 
         expr = "SET state_updated=:state_updated, updated=:updated"
-        return self.table.update_item(
+        return self._update_item(
             Key=key,
             UpdateExpression=expr,
             ConditionExpression="begins_with(state_updated, :claim)",
@@ -451,7 +967,7 @@ class StateDB:
             "updated=:updated, "
             "outputs=:outputs"
         )
-        return self.table.update_item(
+        return self._update_item(
             Key=key,
             UpdateExpression=expr,
             ExpressionAttributeValues={
@@ -499,7 +1015,7 @@ class StateDB:
             expr += ", outputs=:outputs"
             expr_attrs[":outputs"] = outputs
 
-        return self.table.update_item(
+        return self._update_item(
             Key=key,
             UpdateExpression=expr,
             ExpressionAttributeValues=expr_attrs,
@@ -533,7 +1049,7 @@ class StateDB:
             "state_updated=:state_updated, updated=:updated, "
             "last_error=:last_error"
         )
-        return self.table.update_item(
+        return self._update_item(
             Key=key,
             UpdateExpression=expr,
             ExpressionAttributeValues={
@@ -572,7 +1088,7 @@ class StateDB:
             "state_updated=:state_updated, updated=:updated, "
             "last_error=:last_error"
         )
-        return self.table.update_item(
+        return self._update_item(
             Key=key,
             UpdateExpression=expr,
             ExpressionAttributeValues={
@@ -608,7 +1124,7 @@ class StateDB:
             "created = if_not_exists(created, :created), "
             "state_updated=:state_updated, updated=:updated"
         )
-        return self.table.update_item(
+        return self._update_item(
             Key=key,
             UpdateExpression=expr,
             ExpressionAttributeValues={
@@ -627,6 +1143,7 @@ class StateDB:
         sort_ascending: bool = False,
         sort_index: str = "updated",
         error_begins_with: str | None = None,
+        attributes: list[str] | None = None,
         **kwargs,
     ) -> dict:
         """Perform a single Query on a DynamoDB index
@@ -645,6 +1162,9 @@ class StateDB:
                 if not applying a filter (default, state_updated, updated).
                 If default, sorting will use primary index and sort by item_ids
             error_begins_with (Optional[str], optional): Filter by error prefix.
+            attributes (Optional[List[str]], optional): Only fetch these
+                attributes, along with the table and index keys. Defaults to
+                all attributes.
 
             Additional kwargs used by dynamodb.query() are also supported here.
 
@@ -687,6 +1207,10 @@ class StateDB:
                 k: kwargs["ExclusiveStartKey"][k] for k in exclusive_start_key_filters
             }
 
+        if attributes is not None and select == "ALL_ATTRIBUTES":
+            select = "SPECIFIC_ATTRIBUTES"
+            kwargs.update(projection([*attributes, *exclusive_start_key_filters]))
+
         kwargs.update(
             {
                 "KeyConditionExpression": expr,
@@ -705,53 +1229,73 @@ class StateDB:
     def execution_id_from_arn(execution_arn: str) -> str:
         return execution_arn.rpartition(":")[2]
 
-    def dbitem_to_item(self, dbitem: dict) -> dict:
-        state, _ = dbitem["state_updated"].split("_")
+    def dbitem_to_item(
+        self,
+        dbitem: dict,
+        fields: Iterable[str] | None = None,
+    ) -> dict:
+        """Convert a DynamoDB Item to a StateDB item
+
+        Args:
+            dbitem (Dict): DynamoDB Item
+            fields (Iterable[str], optional): only include these fields (see
+                ITEM_FIELDS). Defaults to all fields.
+
+        Returns:
+            Dict: StateDB item
+        """
+        wanted = set(ITEM_FIELDS if fields is None else fields)
+        payload_id = self.key_to_payload_id(dbitem)
         collections, workflow = self.split_collections_workflow(
             dbitem["collections_workflow"],
         )
-        executions = dbitem.get("executions", [])
-        execution_id = (
-            self.execution_id_from_arn(
-                executions[-1],
-            )
-            if executions
-            else None
+        state = (
+            dbitem["state_updated"].split("_")[0] if "state_updated" in dbitem else None
         )
         item = {
-            "payload_id": self.key_to_payload_id(dbitem),
+            "payload_id": payload_id,
             "collections": collections,
             "workflow": workflow,
             "items": dbitem["itemids"],
             "state": state,
-            "created": dbitem["created"],
-            "updated": dbitem["updated"],
-            "input_payload_url": (
+            "created": dbitem.get("created"),
+            "updated": dbitem.get("updated"),
+        }
+
+        executions = dbitem.get("executions", [])
+        if wanted & {"input_payload_url", "output_payload_url"}:
+            execution_id = (
+                self.execution_id_from_arn(
+                    executions[-1],
+                )
+                if executions
+                else None
+            )
+            item["input_payload_url"] = (
                 self.payload_bucket.get_input_payload_url(
-                    self.key_to_payload_id(dbitem),
+                    payload_id,
                     execution_id=execution_id,
                 )
                 if execution_id
                 else None
-            ),
-            "output_payload_url": (
+            )
+            item["output_payload_url"] = (
                 self.payload_bucket.get_output_payload_url(
-                    self.key_to_payload_id(dbitem),
+                    payload_id,
                     execution_id=execution_id,
                 )
                 if execution_id and state == StateEnum.SUCCEEDED
                 else None
-            ),
-        }
-        if "executions" in dbitem:
-            item["executions"] = [execution_url(e) for e in dbitem["executions"]]
-        if "outputs" in dbitem:
-            item["outputs"] = dbitem["outputs"]
-        if "last_error" in dbitem:
-            item["last_error"] = dbitem["last_error"]
-        if "claimed_at" in dbitem:
-            item["claimed_at"] = dbitem["claimed_at"]
-        return item
+            )
+        if "executions" in dbitem and "executions" in wanted:
+            item["executions"] = [execution_url(e) for e in executions]
+        for attr in ("outputs", "last_error", "claimed_at"):
+            if attr in dbitem:
+                item[attr] = dbitem[attr]
+
+        if fields is None:
+            return item
+        return {field: item[field] for field in fields if field in item}
 
     @staticmethod
     def join_collections_workflow(collections: str, workflow: str) -> str:
@@ -806,6 +1350,69 @@ class StateDB:
         parts = cls.split_collections_workflow(key["collections_workflow"])
         return f"{parts[0]}/workflow-{parts[1]}/{key['itemids']}"
 
+    @staticmethod
+    def encode_cursor(key: dict[str, Any]) -> str:
+        """Encode a DynamoDB LastEvaluatedKey as an opaque pagination cursor
+
+        Args:
+            key (Dict): LastEvaluatedKey from a query response
+
+        Returns:
+            str: URL-safe cursor
+        """
+        encoded = json.dumps(key, separators=(",", ":"), sort_keys=True).encode()
+        return base64.urlsafe_b64encode(encoded).rstrip(b"=").decode()
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> dict[str, Any]:
+        """Decode a pagination cursor back into a DynamoDB ExclusiveStartKey
+
+        Args:
+            cursor (str): cursor from StateDB.encode_cursor
+
+        Returns:
+            Dict: ExclusiveStartKey for the next query
+
+        Raises:
+            ValueError: if the cursor is not valid
+        """
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            key = json.loads(base64.urlsafe_b64decode(padded))
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"Invalid pagination cursor: {cursor}") from e
+        if not isinstance(key, dict):
+            raise ValueError(f"Invalid pagination cursor: {cursor}")
+        return key
+
+    def nextkey_to_start_key(self: Self, nextkey: str) -> dict[str, Any]:
+        """Get the ExclusiveStartKey for a nextkey from StateDB.get_items_page
+
+        A nextkey is normally a cursor encoding the LastEvaluatedKey of the
+        previous page. Payload IDs are accepted as well for compatibility with
+        older clients, at the cost of fetching the item to build the key.
+
+        Args:
+            nextkey (str): pagination cursor or payload ID
+
+        Returns:
+            Dict: ExclusiveStartKey for the next query
+        """
+        # payload IDs always contain '/', which is not in the urlsafe alphabet
+        if "/" not in nextkey:
+            return self.decode_cursor(nextkey)
+
+        dbitem = self.get_dbitem(nextkey)
+        return {
+            key: dbitem[key]
+            for key in [
+                "collections_workflow",
+                "itemids",
+                "state_updated",
+                "updated",
+            ]
+        }
+
     def payload_id_most_recent_execution_arn(
         self,
         payload_id: str,
@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import logging
+import os
+import random
+import threading
+
+from collections import deque
+from collections.abc import Callable
+from functools import cache
+from time import monotonic, sleep
+from typing import Any
+
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+
+THROTTLING_ERROR_CODES = frozenset(
+    (
+        "ProvisionedThroughputExceededException",
+        "RequestLimitExceeded",
+        "RequestThrottled",
+        "SlowDown",
+        "Throttled",
+        "ThrottledException",
+        "Throttling",
+        "ThrottlingException",
+        "TooManyRequestsException",
+    ),
+)
+
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BASE_DELAY = 0.1  # seconds
+DEFAULT_MAX_DELAY = 5.0  # seconds
+
+# botocore retry mode of the cirrus clients (see cirrus.lib.utils.get_client_config)
+DEFAULT_RETRY_MODE = "adaptive"
+
+# on throttling the rate is cut by this factor, at most once per cooldown period
+THROTTLE_DECREASE_FACTOR = 0.5
+THROTTLE_COOLDOWN = 0.5  # seconds
+
+
+def backoff_delay(
+    attempt: int,
+    base_delay: float = DEFAULT_BASE_DELAY,
+    max_delay: float = DEFAULT_MAX_DELAY,
+) -> float:
+    """Jittered exponential backoff: a random delay of up to base_delay * 2**attempt
+    seconds, capped at max_delay"""
+    return random.uniform(0, min(max_delay, base_delay * 2**attempt))  # noqa: S311
+
+
+def botocore_retry_mode() -> str:
+    """The botocore retry mode of the cirrus clients, from CIRRUS_BOTO_RETRY_MODE"""
+    return os.getenv("CIRRUS_BOTO_RETRY_MODE", DEFAULT_RETRY_MODE)
+
+
+def is_throttling_error(error: BaseException) -> bool:
+    return (
+        isinstance(error, ClientError)
+        and error.response.get("Error", {}).get("Code") in THROTTLING_ERROR_CODES
+    )
+
+
+class RateLimiter:
+    def __init__(
+        self,
+        max_rate: float | None = None,
+        min_rate: float = 1.0,
+        recovery_rate: float = 1.0,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        base_delay: float = DEFAULT_BASE_DELAY,
+        max_delay: float = DEFAULT_MAX_DELAY,
+        adaptive: bool = True,
+    ) -> None:
+        """Token bucket limiting calls to an API, with a rate that adapts to
+        throttling.
+
+        The bucket starts out allowing max_rate calls per second, or any number
+        of calls if max_rate is None. Each throttling error halves the allowed
+        rate (starting from the rate observed over the last second if the bucket
+        was unlimited), and the rate then recovers linearly while calls succeed.
+        Throttled calls are retried with jittered exponential backoff.
+
+        A limiter that is not adaptive only holds calls to max_rate: throttling
+        errors are raised as they are, without changing the rate.
+
+        A limiter is safe to share between threads.
+
+        Args:
+            max_rate (float | None): maximum calls per second, or None for no
+                limit until throttling is encountered
+            min_rate (float): the rate is never reduced below this
+            recovery_rate (float): calls per second added back to the rate for
+                each second elapsed
+            max_retries (int): number of times to retry a throttled call
+            base_delay (float): initial retry delay, in seconds
+            max_delay (float): cap on the retry delay, in seconds
+            adaptive (bool): whether to reduce the rate and retry on throttling
+        """
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.recovery_rate = recovery_rate
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.adaptive = adaptive
+
+        self.rate = max_rate
+        self._tokens = max_rate if max_rate is not None else 0.0
+        self._updated = monotonic()
+        self._last_throttle = float("-inf")
+        self._recent: deque[float] = deque()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._updated = now
+        if self.rate is None:
+            return
+
+        if self.max_rate is None or self.rate < self.max_rate:
+            self.rate += self.recovery_rate * elapsed
+            if self.max_rate is not None:
+                self.rate = min(self.rate, self.max_rate)
+
+        # allow bursts of up to one second's worth of calls
+        self._tokens = min(max(self.rate, 1.0), self._tokens + elapsed * self.rate)
+
+    def acquire(self) -> float:
+        """Block until a call is allowed by the current rate
+
+        Returns:
+            float: time spent waiting, in seconds
+        """
+        with self._lock:
+            now = monotonic()
+            self._recent.append(now)
+            while self._recent[0] < now - 1:
+                self._recent.popleft()
+
+            self._refill(now)
+            if self.rate is None:
+                return 0.0
+
+            # reserve a token and sleep outside of the lock until it is ours
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+        if wait:
+            sleep(wait)
+        return wait
+
+    def throttled(self) -> None:
+        """Reduce the allowed rate after a throttling error"""
+        with self._lock:
+            now = monotonic()
+            if now - self._last_throttle < THROTTLE_COOLDOWN:
+                return
+            self._last_throttle = now
+            self._refill(now)
+
+            current = self.rate if self.rate is not None else len(self._recent)
+            if self.rate is None:
+                self._tokens = 0.0
+            self.rate = max(self.min_rate, current * THROTTLE_DECREASE_FACTOR)
+            logger.warning("Throttled, reducing request rate to %.1f/s", self.rate)
+
+    def call(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Call func within the rate limit, retrying if it is throttled
+
+        Clients from `cirrus.lib.utils.get_client` already retry throttled calls
+        with botocore's own backoff, so an error that went through those retries
+        (a non-zero `RetryAttempts`) only reduces the rate and is not retried
+        again here, to not back off twice.
+
+        Args:
+            func (Callable): function making the API call, e.g., a boto3 client method
+            *args: positional arguments for func
+            **kwargs: keyword arguments for func
+
+        Returns:
+            Any: the return value of func
+
+        Raises:
+            ClientError: any non-throttling error from func, or the throttling
+                error once retries are exhausted
+        """
+        attempt = 0
+        while True:
+            self.acquire()
+            try:
+                return func(*args, **kwargs)
+            except ClientError as e:
+                if not self.adaptive or not is_throttling_error(e):
+                    raise
+                retried = e.response.get("ResponseMetadata", {}).get("RetryAttempts")
+                if retried or attempt >= self.max_retries:
+                    self.throttled()
+                    raise
+            self.throttled()
+            sleep(backoff_delay(attempt, self.base_delay, self.max_delay))
+            attempt += 1
+
+
+@cache
+def get_rate_limiter(service: str) -> RateLimiter:
+    """Get the rate limiter shared by all calls to an AWS service
+
+    The maximum rate can be set per service with an environment variable like
+    CIRRUS_STEPFUNCTIONS_MAX_RATE (calls per second); by default there is no
+    limit until the service starts throttling.
+
+    With botocore's adaptive retry mode (the default for cirrus clients), each
+    client already slows down and retries when throttled, so the limiter does
+    neither and only adds the maximum rate, which is shared by all the clients
+    and threads calling the service. With the other retry modes, which retry
+    without limiting the rate, the limiter also adapts its rate to throttling.
+
+    Args:
+        service (str): boto3 service name, e.g., 'stepfunctions'
+
+    Returns:
+        RateLimiter: the limiter for the service
+    """
+    max_rate = os.getenv(f"CIRRUS_{service.upper()}_MAX_RATE")
+    return RateLimiter(
+        max_rate=float(max_rate) if max_rate else None,
+        adaptive=botocore_retry_mode() != "adaptive",
+    )
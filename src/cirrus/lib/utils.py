@@ -1,22 +1,87 @@
+import contextlib
+import gzip
 import json
 import logging
+import math
+import queue
 import re
+import threading
 
-from collections.abc import Callable
+from abc import ABC, abstractmethod
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from datetime import timedelta
 from functools import cache
 from os import getenv
+from time import monotonic, perf_counter, sleep
 from typing import Any, Protocol, Self
 
 import boto3
 
 from boto3 import Session
 from boto3utils import s3
+from botocore.config import Config
+
+from cirrus.lib import instrumentation
+from cirrus.lib.errors import NoUrlError, PublishError
+from cirrus.lib.throttle import (
+    backoff_delay,
+    botocore_retry_mode,
+    get_rate_limiter,
+)
 
-from cirrus.lib.errors import NoUrlError
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore[assignment]
+
+# types orjson would serialize although the standard library does not, which
+# are instead passed on to the standard library
+ORJSON_OPTIONS = (
+    0
+    if orjson is None
+    else orjson.OPT_PASSTHROUGH_DATACLASS
+    | orjson.OPT_PASSTHROUGH_DATETIME
+    | orjson.OPT_PASSTHROUGH_SUBCLASS
+)
 
 logger = logging.getLogger(__name__)
 
+# orjson is used for JSON encoding/decoding if it is installed; set
+# CIRRUS_JSON_BACKEND=json to force the standard library implementation
+JSON_BACKEND = (
+    "orjson"
+    if orjson is not None and getenv("CIRRUS_JSON_BACKEND", "orjson") != "json"
+    else "json"
+)
+
+# maximum total size of the messages in an SNS or SQS batch, which is also the
+# maximum size of a single message
+MAX_PUBLISH_BATCH_BYTES = 256 * 1024
+
+# time left before a lambda times out for sending the batches of a BatchHandler
+# with a deadline
+DEFAULT_DEADLINE_MARGIN_MS = 500
+
+# times the SNS/SQS publishers resend entries that failed in a batch request
+DEFAULT_PUBLISH_MAX_RETRIES = 3
+
+# entries an SNS/SQS publisher resends in all between flushes, so a failing
+# destination can't hold up a flush with the backoff of every batch
+DEFAULT_PUBLISH_RETRY_BUDGET = 100
+
+# number of full batches the shared SNS/SQS publishers send at once
+DEFAULT_PUBLISH_MAX_WORKERS = 4
+
+# number of clients cold_start creates at once
+COLD_START_MAX_WORKERS = 8
+
+# defaults for get_client_config
+DEFAULT_MAX_POOL_CONNECTIONS = 50
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_CONNECT_TIMEOUT = 5.0  # seconds
+DEFAULT_READ_TIMEOUT = 30.0  # seconds
+
 QUEUE_ARN_REGEX = re.compile(
     r"^arn:aws:sqs:(?P<region>[\-a-z0-9]+):(?P<account_id>\d+):(?P<name>[\-_a-zA-Z0-9]+)$",
 )
@@ -55,6 +120,92 @@ def parse_since(since: str) -> timedelta:
     return timedelta(days=days, hours=hours, minutes=minutes)
 
 
+def env_flag(name: str, default: bool = False) -> bool:
+    """Read a boolean feature flag from the environment.
+
+    Args:
+        name (str): environment variable name
+        default (bool): value to use if the variable is unset or empty
+
+    Returns:
+        bool: True if the variable is one of '1', 'true', 'yes', or 'on'
+            (case-insensitive)
+    """
+    value = getenv(name, "")
+    if not value:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _has_nonfinite_float(obj: Any) -> bool:
+    if isinstance(obj, float):
+        return not math.isfinite(obj)
+    if isinstance(obj, dict):
+        return any(_has_nonfinite_float(value) for value in obj.values())
+    if isinstance(obj, list | tuple):
+        return any(_has_nonfinite_float(value) for value in obj)
+    return False
+
+
+def json_dumpb(obj: Any) -> bytes:
+    """Serialize an object to UTF-8 encoded JSON using the configured backend
+
+    orjson is stricter than the standard library about what it accepts (e.g.,
+    non-string keys or integers wider than 64 bits), so anything it refuses is
+    passed on to the standard library. So that the output does not depend on
+    the backend, orjson is also made to refuse the datetimes, dataclasses, and
+    subclasses of builtin types it would otherwise serialize itself, and
+    objects with NaN or Infinity values, which it would write as null, are
+    serialized by the standard library as well. orjson still serializes UUIDs
+    and Enum members the standard library rejects.
+
+    Args:
+        obj (Any): object to serialize
+
+    Returns:
+        bytes: JSON document
+    """
+    if JSON_BACKEND == "orjson":
+        with contextlib.suppress(TypeError):
+            encoded = orjson.dumps(obj, option=ORJSON_OPTIONS)
+            # non-finite floats are written as null, so look for them only in
+            # documents with a null in them
+            if b"null" not in encoded or not _has_nonfinite_float(obj):
+                return encoded
+    return json.dumps(obj).encode()
+
+
+def json_dumps(obj: Any) -> str:
+    """Serialize an object to a JSON string using the configured backend
+
+    Args:
+        obj (Any): object to serialize
+
+    Returns:
+        str: JSON document
+    """
+    return json_dumpb(obj).decode()
+
+
+def json_loads(data: str | bytes | bytearray) -> Any:
+    """Deserialize a JSON document using the configured backend
+
+    Documents orjson rejects (e.g., with NaN or Infinity values) are retried
+    with the standard library, so invalid JSON raises json.JSONDecodeError
+    regardless of the backend.
+
+    Args:
+        data (str | bytes | bytearray): JSON document
+
+    Returns:
+        Any: deserialized object
+    """
+    if JSON_BACKEND == "orjson":
+        with contextlib.suppress(ValueError):
+            return orjson.loads(data)
+    return json.loads(data)
+
+
 def execution_url(execution_arn: str, region: str | None = None) -> str:
     if region is None:
         region = getenv("AWS_REGION", "us-west-2")
@@ -64,8 +215,96 @@ def execution_url(execution_arn: str, region: str | None = None) -> str:
     )
 
 
+_ITER_DONE = object()
+
+
+def _put_until_stopped(q: queue.Queue, stop: threading.Event, value: Any) -> bool:
+    """Put a value on a bounded queue, giving up if stop is set while waiting"""
+    while not stop.is_set():
+        try:
+            q.put(value, timeout=0.1)
+        except queue.Full:
+            continue
+        return True
+    return False
+
+
+def _drain_into(
+    iterable: Iterable[Any],
+    q: queue.Queue,
+    stop: threading.Event,
+) -> None:
+    try:
+        for value in iterable:
+            if not _put_until_stopped(q, stop, value):
+                return
+    except Exception as e:  # noqa: BLE001
+        _put_until_stopped(q, stop, e)
+    finally:
+        _put_until_stopped(q, stop, _ITER_DONE)
+
+
+def iter_concurrently(
+    iterables: Sequence[Iterable[Any]],
+    buffer_size: int | None = None,
+) -> Iterator[Any]:
+    """Iterate over several iterables at once, each in its own thread
+
+    Values are yielded as they are produced, interleaved in no particular
+    order. At most buffer_size values (by default two per iterable) are
+    buffered, so a slow consumer makes the producers wait rather than
+    accumulating values in memory. If the generator is closed early the
+    producers stop after their current value, and an exception raised by any
+    producer is re-raised here.
+
+    Args:
+        iterables (Sequence[Iterable]): iterables to consume, e.g., generators
+            making paginated AWS calls
+        buffer_size (int, optional): maximum number of buffered values
+
+    Returns:
+        Iterator: values from all iterables
+    """
+    if not iterables:
+        return
+    values: queue.Queue = queue.Queue(maxsize=buffer_size or 2 * len(iterables))
+    stop = threading.Event()
+
+    with ThreadPoolExecutor(max_workers=len(iterables)) as executor:
+        for iterable in iterables:
+            executor.submit(_drain_into, iterable, values, stop)
+        try:
+            remaining = len(iterables)
+            while remaining:
+                value = values.get()
+                if value is _ITER_DONE:
+                    remaining -= 1
+                elif isinstance(value, Exception):
+                    raise value
+                else:
+                    yield value
+        finally:
+            stop.set()
+
+
+def workflow_event_clients() -> tuple[str, ...]:
+    """Get the clients the WorkflowEventManager will use, as configured by the
+    environment"""
+    clients: list[str] = []
+    if getenv("CIRRUS_WORKFLOW_EVENT_TOPIC_ARN"):
+        clients.append("sns")
+    if (
+        getenv("CIRRUS_WORKFLOW_LOG_GROUP")
+        and getenv("CIRRUS_WORKFLOW_METRIC_OUTPUT", "logs").lower() != "emf"
+    ):
+        clients.append("logs")
+    if getenv("CIRRUS_EVENT_DB_AND_TABLE"):
+        clients += ["timestream-write", "timestream-query"]
+    return tuple(clients)
+
+
 def cold_start(
-    clients=(
+    clients: Iterable[str] = (
         "batch",
         "s3",
         "sns",
@@ -76,15 +315,97 @@ def cold_start(
         "logs",
         "cloudwatch",
     ),
-    resources=("dynamodb", "sqs"),
-):
+    resources: Iterable[str] = ("dynamodb", "sqs"),
+    max_workers: int = COLD_START_MAX_WORKERS,
+) -> dict[str, float]:
     """Used in lambda functions to populate the cache of boto clients/resoures.  Default
-    values cover core cirrus usages."""
-    for client in clients:
-        get_client(client)
+    values cover core cirrus usages, but functions should pass only what they use.
+
+    Creating a client is dominated by loading its botocore service model, so
+    the clients and resources are created concurrently, and the time each took
+    is logged.
 
-    for resource in resources:
-        get_resource(resource)
+    Args:
+        clients (Iterable[str]): names of the services to create clients for
+        resources (Iterable[str]): names of the services to create resources for
+        max_workers (int): maximum number to create at once
+
+    Returns:
+        dict[str, float]: seconds taken to create each client or resource
+    """
+
+    def timed(factory: Callable[[str], Any], service: str) -> float:
+        start = perf_counter()
+        factory(service)
+        return perf_counter() - start
+
+    jobs = [(get_client, service) for service in dict.fromkeys(clients)]
+    jobs += [(get_resource, service) for service in dict.fromkeys(resources)]
+    if not jobs:
+        return {}
+
+    start = perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(jobs)))) as pool:
+        durations = list(pool.map(lambda job: timed(*job), jobs))
+    timings = {
+        f"{service}{' (resource)' if factory is get_resource else ''}": duration
+        for (factory, service), duration in zip(jobs, durations, strict=True)
+    }
+
+    logger.info(
+        "Cold start created %s clients/resources in %.3fs: %s",
+        len(timings),
+        perf_counter() - start,
+        ", ".join(f"{name}={duration:.3f}s" for name, duration in timings.items()),
+    )
+    return timings
+
+
+@cache
+def get_client_config() -> Config:
+    """The botocore configuration shared by all cirrus clients and resources
+
+    Compared to the botocore defaults, the connection pool is sized for the
+    concurrent code paths (thread pools) in cirrus rather than 10 connections,
+    retries use the adaptive mode, idle connections are kept alive, and the
+    timeouts are tighter so a stalled connection fails fast and is retried.
+    Each setting can be overridden with an environment variable:
+
+    - CIRRUS_BOTO_MAX_POOL_CONNECTIONS (default: the larger of 50 and
+      CIRRUS_PROCESS_MAX_WORKERS)
+    - CIRRUS_BOTO_RETRY_MODE (default: adaptive)
+    - CIRRUS_BOTO_MAX_ATTEMPTS (default: 5)
+    - CIRRUS_BOTO_CONNECT_TIMEOUT (seconds, default: 5)
+    - CIRRUS_BOTO_READ_TIMEOUT (seconds, default: 30)
+    - CIRRUS_BOTO_TCP_KEEPALIVE (default: true)
+
+    Returns:
+        Config: botocore client configuration
+    """
+    max_pool_connections = getenv("CIRRUS_BOTO_MAX_POOL_CONNECTIONS")
+    return Config(
+        max_pool_connections=(
+            int(max_pool_connections)
+            if max_pool_connections
+            else max(
+                DEFAULT_MAX_POOL_CONNECTIONS,
+                int(getenv("CIRRUS_PROCESS_MAX_WORKERS", "1")),
+            )
+        ),
+        retries={
+            "mode": botocore_retry_mode(),
+            "total_max_attempts": int(
+                getenv("CIRRUS_BOTO_MAX_ATTEMPTS", str(DEFAULT_MAX_ATTEMPTS)),
+            ),
+        },
+        connect_timeout=float(
+            getenv("CIRRUS_BOTO_CONNECT_TIMEOUT", str(DEFAULT_CONNECT_TIMEOUT)),
+        ),
+        read_timeout=float(
+            getenv("CIRRUS_BOTO_READ_TIMEOUT", str(DEFAULT_READ_TIMEOUT)),
+        ),
+        tcp_keepalive=env_flag("CIRRUS_BOTO_TCP_KEEPALIVE", default=True),
+    )
 
 
 @cache
@@ -94,14 +415,19 @@ def get_client(
     region: str | None = None,
 ) -> boto3.client:
     """
-    Wrapper around boto3 which implements singleton pattern via @cache
+    Wrapper around boto3 which implements singleton pattern via @cache, and
+    configures the client with get_client_config()
     """
     if session is None:
         session = boto3.Session()
-    return session.client(
+    client = session.client(
         service_name=service,
         region_name=region,
+        config=get_client_config(),
     )
+    if instrumentation.output():
+        instrumentation.instrument(client)
+    return client
 
 
 @cache
@@ -110,13 +436,18 @@ def get_resource(
     session: boto3.Session | None = None,
     region: str | None = None,
 ):
-    """Wrapper around boto3 which implements singleton pattern via @cache"""
+    """Wrapper around boto3 which implements singleton pattern via @cache, and
+    configures the resource with get_client_config()"""
     if session is None:
         session = boto3.Session()
-    return session.resource(
+    resource = session.resource(
         service_name=service,
         region_name=region,
+        config=get_client_config(),
     )
+    if instrumentation.output():
+        instrumentation.instrument(resource.meta.client)
+    return resource
 
 
 def assume_role(
@@ -128,7 +459,7 @@ def assume_role(
     Acquire and assign new IAM credentials to session if IAM role is available
     """
     if iam_role_arn:
-        creds = boto3.client("sts").assume_role(
+        creds = get_client("sts").assume_role(
             RoleArn=iam_role_arn,
             RoleSessionName="CLIrrus_iam_session",
         )["Credentials"]
@@ -218,12 +549,12 @@ def recursive_compare(  # noqa: C901
 
 def extract_record(record: dict):
     if "body" in record:
-        record = json.loads(record["body"])
+        record = json_loads(record["body"])
     elif "Sns" in record:
         record = record["Sns"]
 
     if "Message" in record:
-        record = json.loads(record["Message"])
+        record = json_loads(record["Message"])
 
     if (
         "url" not in record
@@ -248,12 +579,21 @@ def extract_event_records(event: dict):
 
 def payload_from_s3(record: dict) -> dict:
     try:
-        payload = s3().read_json(record["url"])
+        url = record["url"]
     except KeyError as e:
         raise NoUrlError(
             "Item does not have a URL and therefore cannot be retrieved from S3",
         ) from e
-    return payload
+
+    parts = s3.urlparse(url)
+    body = (
+        get_client("s3")
+        .get_object(Bucket=parts["bucket"], Key=parts["key"])["Body"]
+        .read()
+    )
+    if parts["key"].endswith(".gz"):
+        body = gzip.decompress(body)
+    return json_loads(body)
 
 
 def parse_queue_arn(queue_arn: str) -> dict:
@@ -449,20 +789,66 @@ class BatchHandler[T]:
         self: Self,
         batchable: Callable[[list[T]], Any],
         batch_size: int = 10,
+        max_workers: int = 1,
+        max_batch_bytes: int | None = None,
+        linger_ms: float | None = None,
+        size: Callable[[T], int] | None = None,
     ) -> None:
         """
         Handles dispatch of messages to AWS functions which support batched
         operation. Provides a context manager to ensure complete dispatch of
         all messages (flushing any fractional batch on exit).
 
+        Adding and flushing are guarded by a lock, so a single handler can be
+        shared between worker threads.
+
+        With more than one worker, full batches are sent from a thread pool
+        while more messages are added, so batches may be delivered out of
+        order. `execute` sends the fractional batch and waits for all the
+        batches in flight, raising the first error of any of them.
+
+        With `max_batch_bytes`, a batch is also sent before adding a message
+        would make the total `size` of its messages exceed it; a message
+        larger than that on its own is sent in a batch by itself.
+
+        With `linger_ms`, or once `set_deadline` is called, a background thread
+        sends the fractional batch when its first message has waited
+        `linger_ms`, or when the deadline is reached, whichever comes first.
+        The thread stops whenever there is no batch left to send, and is
+        started again by the next `add`.
+        Like those sent by the workers, the next flush waits for the batch and
+        raises any error sending it.
+
         Args:
           batchable (Callable): function to be passed message batches.
           batch_size (int): size of batches to be sent (defaults to 10)
+          max_workers (int): number of full batches to send concurrently
+            (defaults to 1, i.e., batches are sent in the calling thread)
+          max_batch_bytes (int | None): maximum total size of the messages in
+            a batch (defaults to None, i.e., only the count is limited)
+          linger_ms (float | None): longest time a message waits for its batch
+            to fill before it is sent (defaults to None, i.e., until `execute`)
+          size (Callable | None): function giving the size of a message counted
+            against `max_batch_bytes`, which requires it
         """
+        if max_batch_bytes is not None and size is None:
+            raise ValueError("max_batch_bytes requires a size function")
 
         self.batchable = batchable
         self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.max_batch_bytes = max_batch_bytes
+        self.linger_ms = linger_ms
+        self.size = size
         self._batch: list[T] = []
+        self._batch_bytes = 0
+        self._batch_started = 0.0
+        self._deadline: float | None = None
+        self._lock = threading.RLock()
+        self._cond = threading.Condition(self._lock)
+        self._sender: threading.Thread | None = None
+        self._executor: ThreadPoolExecutor | None = None
+        self._pending: list[Future] = []
 
     def __enter__(self: Self) -> Self:
         return self
@@ -477,19 +863,133 @@ class BatchHandler[T]:
         Args:
           message (str): message to be handled by `fn`
         """
-        self._batch.append(item)
+        with self._lock:
+            if self.max_batch_bytes is not None and self.size is not None:
+                size = self.size(item)
+                if self._batch and self._batch_bytes + size > self.max_batch_bytes:
+                    self._send_batch()
+                self._batch_bytes += size
+
+            if not self._batch:
+                self._batch_started = monotonic()
+            self._batch.append(item)
+
+            if len(self._batch) >= self.batch_size:
+                self._send_batch()
+            elif self.linger_ms is not None or self._deadline is not None:
+                self._start_sender()
+                self._cond.notify()
+
+    def set_deadline(
+        self: Self,
+        context: Any,
+        margin_ms: float = DEFAULT_DEADLINE_MARGIN_MS,
+    ) -> None:
+        """Send any fractional batch `margin_ms` before the lambda invocation of
+        `context` times out, so the messages of an invocation about to be
+        killed are not lost. The deadline holds until the next `execute`.
 
-        if len(self._batch) >= self.batch_size:
-            self.execute()
+        Args:
+          context: the lambda context, for its `get_remaining_time_in_millis`
+          margin_ms (float): time left for sending the batch
+        """
+        remaining_ms = context.get_remaining_time_in_millis()
+        with self._lock:
+            self._deadline = monotonic() + (remaining_ms - margin_ms) / 1e3
+            if self._batch:
+                self._start_sender()
+                self._cond.notify()
+
+    def _start_sender(self: Self) -> None:
+        if self._sender is None:
+            self._sender = threading.Thread(
+                target=self._send_lingering,
+                name=f"{type(self).__name__}-sender",
+                daemon=True,
+            )
+            self._sender.start()
 
-    def execute(self: Self) -> Any:
+    def _flush_at(self: Self) -> float | None:
+        """Time at which the fractional batch is due, if any"""
         if not self._batch:
             return None
+        due = [] if self._deadline is None else [self._deadline]
+        if self.linger_ms is not None:
+            due.append(self._batch_started + self.linger_ms / 1e3)
+        return min(due, default=None)
+
+    def _send_lingering(self: Self) -> None:
+        while True:
+            with self._cond:
+                flush_at = self._flush_at()
+                if flush_at is None:
+                    # nothing left to send, so the thread (and its reference to
+                    # the handler) goes away until the next add starts another
+                    self._sender = None
+                    return
+                timeout = flush_at - monotonic()
+                if timeout > 0:
+                    self._cond.wait(timeout)
+                    continue
+                # the batch is sent outside the lock, so adding to the next
+                # one doesn't wait on it; the next flush waits for it instead,
+                # and raises its error
+                batch = self._take_batch()
+                sent: Future = Future()
+                self._pending.append(sent)
+            try:
+                sent.set_result(self.batchable(batch))
+            except Exception as e:  # noqa: BLE001
+                sent.set_exception(e)
+
+    def _take_batch(self: Self) -> list[T]:
+        batch, self._batch = self._batch, []
+        self._batch_bytes = 0
+        return batch
+
+    def _send_batch(self: Self) -> None:
+        if self.max_workers <= 1:
+            self._flush()
+            return
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        self._pending.append(self._executor.submit(self.batchable, self._take_batch()))
+
+    def _flush(self: Self) -> Any:
+        with self._lock:
+            pending, self._pending = self._pending, []
+            try:
+                if not self._batch:
+                    return None
+
+                try:
+                    return self.batchable(self._batch)
+                finally:
+                    self._batch = []
+                    self._batch_bytes = 0
+            finally:
+                self._wait_for(pending)
 
-        try:
-            return self.batchable(self._batch)
-        finally:
-            self._batch = []
+    @staticmethod
+    def _wait_for(pending: list[Future]) -> None:
+        """Wait for all the batches in flight, then raise the first error of
+        any of them, logging the others"""
+        wait(pending)
+        errors = [e for future in pending if (e := future.exception()) is not None]
+        for error in errors[1:]:
+            logger.error("Failed to send a batch", exc_info=error)
+        if errors:
+            raise errors[0]
+
+    def execute(self: Self) -> Any:
+        with self._lock:
+            self._deadline = None
+            try:
+                return self._flush()
+            finally:
+                # wake the sender, if any, to stop now the batch is sent
+                self._cond.notify()
 
 
 class SNSMessage:
@@ -520,41 +1020,221 @@ class SNSMessage:
             "MessageAttributes": self._attrs,
         }
 
+    def size(self: Self) -> int:
+        """Bytes counted against the SNS message and batch size limits: the
+        body, and the name, type, and value of each attribute"""
+        size = len(self._body.encode())
+        for name, attr in self._attrs.items():
+            value = attr.get("StringValue", attr.get("BinaryValue", b""))
+            size += len(name.encode()) + len(attr["DataType"].encode())
+            size += len(value.encode() if isinstance(value, str) else value)
+        return size
+
+    def offload(self: Self, upload: Callable[[bytes], str]) -> "SNSMessage":
+        """Upload the body with `upload`, and get a message with the same
+        attributes referencing it by URL instead"""
+        return SNSMessage(
+            json_dumps({"url": upload(self._body.encode())}),
+            self._attrs,
+        )
+
+
+def utf8_size(message: str) -> int:
+    """Bytes of a message body as sent to SNS or SQS"""
+    return len(message.encode())
+
 
 class DebugLogger(Protocol):  # pragma: no cover
     def debug(self, msg, *args, **kwargs) -> None: ...
 
 
-class SNSPublisher(BatchHandler[SNSMessage]):
-    """Handles publication of SNS messages via batched interface."""
+class Publisher[T](BatchHandler[T], ABC):
+    """Base of the batched SNS and SQS publishers.
+
+    Batches are limited to the total size SNS and SQS accept as well as to
+    `batch_size` messages. Given an `offload` function (e.g.,
+    `PayloadBucket.upload_oversize_payload`), a message too large to send is
+    uploaded with it and sent as a `{"url": ...}` reference instead.
+
+    A batch request can succeed while some of its entries fail. Entries that
+    failed through no fault of the sender (e.g., throttling or an internal
+    error) are resent on their own with jittered exponential backoff, up to
+    `max_retries` times per batch and `retry_budget` entries in all between
+    flushes. Entries rejected as invalid, or still failing after the retries,
+    raise a `PublishError` carrying those messages, so the caller (or the
+    lambda retry) can redeliver them.
+
+    The `delivered`, `retried`, and `failed` entry counts accumulate over the
+    lifetime of the publisher, and the counts of each flush are logged with
+    the destination name.
+    """
 
     def __init__(
         self: Self,
-        topic_arn: str,
+        dest_name: str,
+        size: Callable[[T], int],
         batch_size: int = 10,
         logger: DebugLogger | None = None,
+        max_workers: int = 1,
+        offload: Callable[[bytes], str] | None = None,
+        max_retries: int = DEFAULT_PUBLISH_MAX_RETRIES,
+        retry_budget: int = DEFAULT_PUBLISH_RETRY_BUDGET,
     ) -> None:
-        """extend BatchHandler constructor to add topic_arn and setup SNS Client"""
-        super().__init__(batchable=self._send, batch_size=batch_size)
-        self.topic_arn = topic_arn
-        self.dest_name = topic_arn.split(":")[-1]
-        self._sns_client = boto3.client("sns")
+        super().__init__(
+            batchable=self._send,
+            batch_size=batch_size,
+            max_workers=max_workers,
+            max_batch_bytes=MAX_PUBLISH_BATCH_BYTES,
+            size=size,
+        )
+        self.dest_name = dest_name
         self._logger = logger
-
-    def _send(self: Self, batch: list[SNSMessage]) -> dict[str, Any]:
+        self.offload = offload
+        self.max_retries = max_retries
+        self.retry_budget = retry_budget
+        self.delivered = 0
+        self.retried = 0
+        self.failed = 0
+        # batches may be sent from worker threads, outside of the batch lock
+        self._stats_lock = threading.Lock()
+        self._retries_left = retry_budget
+        self._flushed_stats = self.stats()
+
+    @abstractmethod
+    def prepare_batch(self: Self, batch: list[T]) -> list[dict[str, Any]]:
+        """Render a batch of messages as the entries of a batch request"""
+
+    @abstractmethod
+    def _send_entries(self: Self, entries: list[dict[str, Any]]) -> dict[str, Any]:
+        """Make one batch request, returning its response"""
+
+    def _take_retries(self: Self, count: int) -> int:
+        """Take up to `count` entry resends from the retry budget, returning
+        the number granted"""
+        with self._stats_lock:
+            granted = min(count, self._retries_left)
+            self._retries_left -= granted
+            self.retried += granted
+            return granted
+
+    def _send(self: Self, batch: list[T]) -> dict[str, Any]:
         """This method is intended to be used with message batches by the
-        BatchHandler.execute method.  Use directly with extreme caution"""
-        resp = self._sns_client.publish_batch(
-            TopicArn=self.topic_arn,
-            PublishBatchRequestEntries=self.prepare_batch(batch),
-        )
+        BatchHandler.execute method.  Use directly with extreme caution
+
+        Returns:
+            dict: the `Successful` and `Failed` entries of all the requests
+        """
+        entries = self.prepare_batch(batch)
+        # the messages of the entries, by the Ids prepare_batch gave them
+        messages = {entry["Id"]: msg for entry, msg in zip(entries, batch, strict=True)}
+        successful: list[dict[str, Any]] = []
+        failed: list[dict[str, Any]] = []
+        attempt = 0
+        while True:
+            resp = self._send_entries(entries)
+            successful.extend(resp.get("Successful", []))
+            retryable = []
+            for failure in resp.get("Failed", []):
+                if failure.get("SenderFault") or attempt >= self.max_retries:
+                    failed.append(failure)
+                else:
+                    retryable.append(failure)
+            granted = self._take_retries(len(retryable))
+            failed.extend(retryable[granted:])
+            if not granted:
+                break
+
+            retry_ids = {failure["Id"] for failure in retryable[:granted]}
+            entries = [entry for entry in entries if entry["Id"] in retry_ids]
+            sleep(backoff_delay(attempt))
+            attempt += 1
+
+        with self._stats_lock:
+            self.delivered += len(successful)
+            self.failed += len(failed)
+        if failed:
+            raise PublishError(
+                self.dest_name,
+                [messages[failure["Id"]] for failure in failed],
+                failed,
+            )
         if self._logger:
             self._logger.debug(
                 "Published %s messages to %s",
-                len(batch),
+                len(successful),
                 self.dest_name,
             )
-        return resp
+        return {"Successful": successful, "Failed": failed}
+
+    def stats(self: Self) -> dict[str, int]:
+        """Entry counts since the publisher was created"""
+        with self._stats_lock:
+            return {
+                "delivered": self.delivered,
+                "retried": self.retried,
+                "failed": self.failed,
+            }
+
+    def execute(self: Self) -> Any:
+        """Send the fractional batch and wait for the batches in flight, then
+        log the entry counts of the flush and renew the retry budget"""
+        try:
+            return super().execute()
+        finally:
+            stats = self.stats()
+            flushed = {k: v - self._flushed_stats[k] for k, v in stats.items()}
+            self._flushed_stats = stats
+            with self._stats_lock:
+                self._retries_left = self.retry_budget
+            if any(flushed.values()):
+                logger.info(
+                    "Published to %s: %s delivered, %s retried, %s failed",
+                    self.dest_name,
+                    flushed["delivered"],
+                    flushed["retried"],
+                    flushed["failed"],
+                    extra={"publisher": self.dest_name, "publish_stats": flushed},
+                )
+
+
+class SNSPublisher(Publisher[SNSMessage]):
+    """Handles publication of SNS messages via batched interface."""
+
+    def __init__(
+        self: Self,
+        topic_arn: str,
+        batch_size: int = 10,
+        logger: DebugLogger | None = None,
+        max_workers: int = 1,
+        offload: Callable[[bytes], str] | None = None,
+        max_retries: int = DEFAULT_PUBLISH_MAX_RETRIES,
+        retry_budget: int = DEFAULT_PUBLISH_RETRY_BUDGET,
+    ) -> None:
+        """extend Publisher constructor to add topic_arn and setup SNS Client"""
+        super().__init__(
+            topic_arn.split(":")[-1],
+            size=SNSMessage.size,
+            batch_size=batch_size,
+            logger=logger,
+            max_workers=max_workers,
+            offload=offload,
+            max_retries=max_retries,
+            retry_budget=retry_budget,
+        )
+        self.topic_arn = topic_arn
+        self._sns_client = get_client("sns")
+
+    def add(self: Self, item: SNSMessage) -> None:
+        if self.offload is not None and item.size() > MAX_PUBLISH_BATCH_BYTES:
+            item = item.offload(self.offload)
+        super().add(item)
+
+    def _send_entries(self: Self, entries: list[dict[str, Any]]) -> dict[str, Any]:
+        return get_rate_limiter("sns").call(
+            self._sns_client.publish_batch,
+            TopicArn=self.topic_arn,
+            PublishBatchRequestEntries=entries,
+        )
 
     def prepare_batch(self: Self, batch: list[SNSMessage]) -> list[dict[str, Any]]:
         return [
@@ -562,32 +1242,44 @@ class SNSPublisher(BatchHandler[SNSMessage]):
         ]
 
 
-class SQSPublisher(BatchHandler[str]):
-    """Handles publication of SQS messages via batched interface."""
+class SQSPublisher(Publisher[str]):
+    """Handles publication of SQS messages via batched interface. The process
+    lambda accepts the `{"url": ...}` reference to an offloaded payload."""
 
     def __init__(
         self: Self,
         queue_url: str,
         batch_size: int = 10,
         logger: DebugLogger | None = None,
+        max_workers: int = 1,
+        offload: Callable[[bytes], str] | None = None,
+        max_retries: int = DEFAULT_PUBLISH_MAX_RETRIES,
+        retry_budget: int = DEFAULT_PUBLISH_RETRY_BUDGET,
     ) -> None:
-        """extend BatchHandler constructor to add queue_url and setup SQS Queue"""
-        super().__init__(batchable=self._send, batch_size=batch_size)
+        """extend Publisher constructor to add queue_url and setup SQS Client"""
+        super().__init__(
+            queue_url.split("/")[-1],
+            size=utf8_size,
+            batch_size=batch_size,
+            logger=logger,
+            max_workers=max_workers,
+            offload=offload,
+            max_retries=max_retries,
+            retry_budget=retry_budget,
+        )
         self.queue_url = queue_url
-        self.dest_name = queue_url.split("/")[-1]
-        self._sqs_client = get_resource("sqs")
-        self._queue = self._sqs_client.Queue(self.queue_url)
-        self._logger = logger
+        self._sqs_client = get_client("sqs")
 
-    def _send(self: Self, batch: list[str]) -> dict[str, Any]:
-        resp = self._queue.send_messages(Entries=self.prepare_batch(batch))
-        if self._logger:
-            self._logger.debug(
-                "Published %s messages to %s",
-                len(batch),
-                self.dest_name,
-            )
-        return resp
+    def add(self: Self, item: str) -> None:
+        if self.offload is not None and utf8_size(item) > MAX_PUBLISH_BATCH_BYTES:
+            item = json_dumps({"url": self.offload(item.encode())})
+        super().add(item)
+
+    def _send_entries(self: Self, entries: list[dict[str, Any]]) -> dict[str, Any]:
+        return self._sqs_client.send_message_batch(
+            QueueUrl=self.queue_url,
+            Entries=entries,
+        )
 
     def prepare_batch(self: Self, batch: list[str]) -> list[dict[str, Any]]:
         return [
@@ -597,3 +1289,40 @@ class SQSPublisher(BatchHandler[str]):
             }
             for idx, msg in enumerate(batch)
         ]
+
+
+def publish_max_workers() -> int:
+    """Number of batches the shared publishers send concurrently, from
+    CIRRUS_PUBLISH_MAX_WORKERS"""
+    return int(getenv("CIRRUS_PUBLISH_MAX_WORKERS", str(DEFAULT_PUBLISH_MAX_WORKERS)))
+
+
+@cache
+def get_sns_publisher(
+    topic_arn: str,
+    batch_size: int = 10,
+) -> SNSPublisher:
+    """Get the SNSPublisher for a topic shared by all callers, e.g., across the
+    invocations of a warm lambda container. Callers must flush it (e.g., by
+    using it as a context manager) when done adding messages."""
+    return SNSPublisher(
+        topic_arn,
+        batch_size=batch_size,
+        logger=logger,
+        max_workers=publish_max_workers(),
+    )
+
+
+@cache
+def get_sqs_publisher(
+    queue_url: str,
+    batch_size: int = 10,
+) -> SQSPublisher:
+    """Get the SQSPublisher for a queue shared by all callers, like
+    `get_sns_publisher`"""
+    return SQSPublisher(
+        queue_url,
+        batch_size=batch_size,
+        logger=logger,
+        max_workers=publish_max_workers(),
+    )
@@ -9,8 +9,17 @@ import click
 
 from boto3 import Session
 
+from cirrus.lib.enums import StateEnum
 from cirrus.lib.statedb import StateDB
 from cirrus.management.deployment import WORKFLOW_POLL_INTERVAL, Deployment
+from cirrus.management.exceptions import ParquetUnavailableError
+from cirrus.management.export import (
+    EXPORT_FORMATS,
+    EXPORT_PAGE_SIZE,
+    export_items,
+    open_export_output,
+    parquet_available,
+)
 from cirrus.management.task_logs import (
     format_log_event,
     parse_log_metadata,
@@ -22,7 +31,9 @@ from cirrus.management.utils.click import (
     silence_templating_errors,
 )
 from cirrus.management.utils.manage import (
+    SINCE,
     execution_arn,
+    fields_option,
     pass_deployment,
     query_filters,
     raw_option,
@@ -455,6 +466,7 @@ def get_input_payloads(
 
 
 @manage.command("query")
+@fields_option
 @query_filters
 @pass_deployment
 def query(
@@ -464,6 +476,7 @@ def query(
     since: timedelta | None,
     error_prefix: str | None,
     limit: int | None,
+    fields: list[str] | None,
 ) -> None:
     """
     Retrieve a filtered set of payloads from S3 via querying the state DB for
@@ -480,10 +493,126 @@ def query(
         since=since,
         error_begins_with=error_prefix,
         limit=limit,
+        fields=fields,
     ):
         click.echo(json.dumps(record, default=str))
 
 
+@manage.command("export")
+@click.option(
+    "--collections-workflow",
+    "collections_workflows",
+    multiple=True,
+    help=(
+        "A collections-workflow to export; may be repeated to query several "
+        "concurrently. Without any, the whole state DB is scanned."
+    ),
+)
+@click.option(
+    "--state",
+    help="Execution state to filter on",
+    type=click.Choice([state.value for state in StateEnum]),
+)
+@click.option(
+    "--since",
+    help="Time filter, e.g., '7d', '24h', '30m'",
+    type=SINCE,
+)
+@click.option("--error-prefix", help="The error prefix to filter on")
+@fields_option
+@click.option(
+    "--format",
+    "export_format",
+    type=click.Choice(EXPORT_FORMATS),
+    default="ndjson",
+    show_default=True,
+    help="Output format (parquet requires pyarrow)",
+)
+@click.option(
+    "-o",
+    "--output",
+    default="-",
+    show_default=True,
+    help="Output file, or '-' for stdout",
+)
+@click.option(
+    "--compress/--no-compress",
+    default=None,
+    help="gzip ndjson/csv output (default: if the output ends with '.gz')",
+)
+@click.option(
+    "--page-size",
+    type=click.IntRange(1, 10000),
+    default=EXPORT_PAGE_SIZE,
+    show_default=True,
+    help="Number of items to read from the state DB per request",
+)
+@click.option(
+    "--segments",
+    type=click.IntRange(1, 64),
+    default=1,
+    show_default=True,
+    help="Number of segments to scan the state DB with in parallel",
+)
+@pass_deployment
+def export(
+    deployment: Deployment,
+    collections_workflows: tuple[str, ...],
+    state: str | None,
+    since: timedelta | None,
+    error_prefix: str | None,
+    fields: list[str] | None,
+    export_format: str,
+    output: str,
+    compress: bool | None,
+    page_size: int,
+    segments: int,
+) -> None:
+    """
+    Stream StateDB records for one or more collections-workflows, or the whole
+    state DB, to a NDJSON, CSV, or parquet file
+    """
+    if export_format == "parquet":
+        if output == "-":
+            raise click.UsageError("parquet exports must be written to a file")
+        if not parquet_available():
+            raise click.ClickException(str(ParquetUnavailableError()))
+
+    items = deployment.yield_export_items(
+        list(collections_workflows),
+        state=state,
+        since=since,
+        error_begins_with=error_prefix,
+        fields=fields,
+        page_size=page_size,
+        segments=segments,
+    )
+    with open_export_output(
+        output,
+        compress=False if export_format == "parquet" else compress,
+    ) as stream:
+        count = export_items(items, stream, export_format, fields)
+    click.echo(f"Exported {count} records", err=True)
+
+
+@manage.command("rebuild-state-counts")
+@click.option(
+    "--collections-workflow",
+    help="The collections-workflow to recount",
+    required=True,
+)
+@pass_deployment
+def rebuild_state_counts(deployment: Deployment, collections_workflow: str) -> None:
+    """Recount items by state for a collections-workflow and reset its state
+    counts (requires CIRRUS_STATE_COUNTS_DB)"""
+    collections, workflow = StateDB.split_collections_workflow(collections_workflow)
+    try:
+        counts = deployment.rebuild_workflow_state_counts(collections, workflow)
+    except ValueError as e:
+        raise click.UsageError(str(e)) from e
+    click.echo(json.dumps(counts))
+
+
 @manage.command()
 @click.option("--dry-run", is_flag=True, help="Preview changes without writing")
 @click.option(
@@ -492,11 +621,23 @@ def query(
     default=90,
     help="Cutoff in days for fetching SFN outputs",
 )
+@click.option(
+    "--segments",
+    type=click.IntRange(1, 64),
+    default=1,
+    help="Number of segments to scan the state DB with in parallel",
+)
 @pass_deployment
-def migrate(deployment: Deployment, dry_run: bool, since_days: int) -> None:
+def migrate(
+    deployment: Deployment,
+    dry_run: bool,
+    since_days: int,
+    segments: int,
+) -> None:
     """Migrate state DB and payload bucket to cirrus v2 compatible schema"""
     deployment.migrate(
         dry_run=dry_run,
         since_days=since_days,
+        segments=segments,
         output=click.get_text_stream("stderr"),
     )
@@ -3,6 +3,7 @@ from __future__ import annotations
 import functools
 import json
 import logging
+import operator
 import os
 import sys
 
@@ -16,16 +17,16 @@ from typing import IO, Any, Literal
 import backoff
 import boto3
 
+from boto3.dynamodb.conditions import Attr
 from botocore.exceptions import ClientError
 
 from cirrus.exceptions import PayloadNotFoundError
 from cirrus.lib.cirrus_payload import CirrusPayload
-from cirrus.lib.enums import StateEnum
 from cirrus.lib.errors import EventsDisabledError
 from cirrus.lib.eventdb import EventDB, daily, hourly
 from cirrus.lib.payload_bucket import PayloadBucket
-from cirrus.lib.statedb import StateDB, to_current
-from cirrus.lib.utils import assume_role, get_client
+from cirrus.lib.statedb import StateDB, item_fields_to_attributes, to_current
+from cirrus.lib.utils import assume_role, get_client, iter_concurrently
 from cirrus.management.deployment_pointer import DeploymentPointer
 from cirrus.management.exceptions import (
     NoPayloadUrlError,
@@ -88,6 +89,7 @@ class Deployment:
             table_name=self.environment["CIRRUS_STATE_DB"],
             session=self.session,
             payload_bucket=self.payload_bucket,
+            counts_table_name=self.environment.get("CIRRUS_STATE_COUNTS_DB"),
         )
 
     @staticmethod
@@ -359,13 +361,15 @@ class Deployment:
         sort_ascending: bool = False,
         sort_index: str = "updated",
         error_begins_with: str | None = None,
+        fields: list[str] | None = None,
     ) -> Iterator[dict[str, Any]]:
         """Yield raw StateDB items for a collections/workflow partition.
 
         Streams all matching items across pages. Does not apply ``to_current``;
-        consumers work with raw StateDB items.
+        consumers work with raw StateDB items. If ``fields`` is given, only those
+        item fields are fetched and returned.
         """
-        yield from self.statedb.get_items(
+        yield from self.statedb.yield_items(
             collections_workflow=StateDB.join_collections_workflow(
                 collections,
                 workflow,
@@ -376,8 +380,64 @@ class Deployment:
             sort_ascending=sort_ascending,
             sort_index=sort_index,
             error_begins_with=error_begins_with,
+            fields=fields,
         )
 
+    def yield_export_items(
+        self,
+        collections_workflows: list[str] | None = None,
+        *,
+        state: str | None = None,
+        since: timedelta | None = None,
+        error_begins_with: str | None = None,
+        fields: list[str] | None = None,
+        page_size: int | None = None,
+        segments: int = 1,
+    ) -> Iterator[dict[str, Any]]:
+        """Yield raw StateDB items for export, without ``to_current``.
+
+        Each collections_workflow partition is queried in its own thread, and
+        items are yielded as the pages arrive. Without any partitions the whole
+        table is scanned instead, in ``segments`` parallel segments, with the
+        filters applied by DynamoDB.
+        """
+        if collections_workflows:
+            partitions = [
+                self.statedb.yield_items(
+                    collections_workflow,
+                    state=state,
+                    since=since,
+                    error_begins_with=error_begins_with,
+                    fields=fields,
+                    page_size=page_size,
+                )
+                for collections_workflow in collections_workflows
+            ]
+            if len(partitions) == 1:
+                yield from partitions[0]
+            else:
+                yield from iter_concurrently(partitions)
+            return
+
+        conditions = []
+        if state:
+            conditions.append(Attr("state_updated").begins_with(f"{state}_"))
+        if since:
+            start = (datetime.now(UTC) - since).isoformat()
+            conditions.append(Attr("updated").gte(start))
+        if error_begins_with:
+            conditions.append(Attr("last_error").begins_with(error_begins_with))
+
+        for dbitem in self.statedb.scan_items(
+            segments=segments,
+            filter_expression=functools.reduce(operator.and_, conditions)
+            if conditions
+            else None,
+            attributes=item_fields_to_attributes(fields) if fields else None,
+            page_size=page_size,
+        ):
+            yield self.statedb.dbitem_to_item(dbitem, fields=fields)
+
     def yield_input_payloads(
         self,
         collections: str,
@@ -400,6 +460,7 @@ class Deployment:
             sort_ascending=sort_ascending,
             sort_index=sort_index,
             error_begins_with=error_begins_with,
+            fields=["payload_id"],
         ):
             payload = self.fetch_payload(item["payload_id"], "input")
             if payload:
@@ -439,20 +500,30 @@ class Deployment:
             workflow_name,
         )
         logger.debug("Getting summary for %s", collections_workflow)
-        counts = {}
-        for s in StateEnum:
-            counts[s.value] = self.statedb.get_counts(
-                collections_workflow,
-                limit=limit,
-                state=s,
-                since=since,
-            )
+        counts = self.statedb.get_state_histogram(
+            collections_workflow,
+            since=since,
+            limit=limit,
+        )
         return {
             "collections": collections,
             "workflow": workflow_name,
             "counts": counts,
         }
 
+    def rebuild_workflow_state_counts(
+        self,
+        collections: str,
+        workflow_name: str,
+    ) -> dict[str, int | str]:
+        "Recount items by state for a collections/workflow and store the counts"
+        collections_workflow = self.statedb.join_collections_workflow(
+            collections,
+            workflow_name,
+        )
+        logger.debug("Rebuilding state counts for %s", collections_workflow)
+        return self.statedb.rebuild_state_counts(collections_workflow)
+
     def get_workflow_stats(
         self,
     ) -> dict[str, Any] | None:
@@ -485,8 +556,13 @@ class Deployment:
         sort_ascending: bool = False,
         sort_index: str = "updated",
         error_begins_with: str | None = None,
+        fields: list[str] | None = None,
     ) -> dict[str, Any]:
-        "Get items for a collections/workflow from DynamoDB"
+        """Get items for a collections/workflow from DynamoDB
+
+        If ``fields`` is given, only those item fields are returned, without the
+        compatibility fields added by ``to_current``.
+        """
         collections_workflow = StateDB.join_collections_workflow(
             collections,
             workflow,
@@ -501,9 +577,14 @@ class Deployment:
             sort_ascending=sort_ascending,
             sort_index=sort_index,
             error_begins_with=error_begins_with,
+            fields=fields,
         )
         result: dict[str, Any] = {
-            "items": [to_current(item) for item in items_page["items"]],
+            "items": (
+                items_page["items"]
+                if fields is not None
+                else [to_current(item) for item in items_page["items"]]
+            ),
         }
         if "nextkey" in items_page:
             result["nextkey"] = items_page["nextkey"]
@@ -561,6 +642,7 @@ class Deployment:
         dry_run: bool = False,
         since_days: int = 90,
         output: IO = sys.stderr,
+        segments: int = 1,
     ) -> None:
         "Migrate state DB and payload bucket to new schema"
         Migrator(
@@ -571,4 +653,5 @@ class Deployment:
             since_days=since_days,
             dry_run=dry_run,
             output=output,
+            segments=segments,
         ).run()
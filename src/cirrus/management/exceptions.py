@@ -31,6 +31,12 @@ class StatsUnavailableError(CirrusError):
         super().__init__(msg, *args, **kwargs)
 
 
+class ParquetUnavailableError(CirrusError):
+    def __init__(self, *args, **kwargs):
+        msg = "Parquet exports require pyarrow to be installed"
+        super().__init__(msg, *args, **kwargs)
+
+
 class NoPayloadUrlError(CirrusError):
     def __init__(
         self,
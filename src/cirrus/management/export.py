@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import csv
+import gzip
+import io
+import logging
+import sys
+
+from abc import ABC, abstractmethod
+from collections.abc import Iterable
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+from typing import IO, Any
+
+from cirrus.lib.statedb import ITEM_FIELDS
+from cirrus.lib.utils import json_dumpb, json_dumps
+from cirrus.management.exceptions import ParquetUnavailableError
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover
+    pa = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ("ndjson", "csv", "parquet")
+
+# StateDB items fetched per query/scan request when exporting
+EXPORT_PAGE_SIZE = 1000
+# rows buffered before they are written out as a parquet row group
+PARQUET_ROW_GROUP_SIZE = 10000
+
+
+def parquet_available() -> bool:
+    return pa is not None
+
+
+def flatten_value(value: Any) -> str | None:
+    """Represent an item value as a single CSV/parquet string column"""
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, list | dict):
+        return json_dumps(value)
+    return str(value)
+
+
+class ExportWriter(ABC):
+    """Writes StateDB items to a binary stream, one at a time"""
+
+    def __init__(self, stream: IO[bytes], fields: list[str] | None = None) -> None:
+        self.stream = stream
+        self.fields = list(fields) if fields else list(ITEM_FIELDS)
+        self.count = 0
+
+    def write(self, item: dict[str, Any]) -> None:
+        self._write(item)
+        self.count += 1
+
+    @abstractmethod
+    def _write(self, item: dict[str, Any]) -> None:
+        """Write a single item to the stream"""
+
+    def close(self) -> None:  # noqa: B027
+        """Flush anything buffered; the stream itself is left open"""
+
+
+class NdjsonExportWriter(ExportWriter):
+    def _write(self, item: dict[str, Any]) -> None:
+        self.stream.write(json_dumpb(item) + b"\n")
+
+
+class CsvExportWriter(ExportWriter):
+    def __init__(self, stream: IO[bytes], fields: list[str] | None = None) -> None:
+        super().__init__(stream, fields)
+        self._text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+        self._writer = csv.DictWriter(
+            self._text,
+            fieldnames=self.fields,
+            extrasaction="ignore",
+        )
+        self._writer.writeheader()
+
+    def _write(self, item: dict[str, Any]) -> None:
+        self._writer.writerow({k: flatten_value(v) for k, v in item.items()})
+
+    def close(self) -> None:
+        self._text.flush()
+        # don't let the wrapper close the underlying stream
+        self._text.detach()
+
+
+class ParquetExportWriter(ExportWriter):
+    """Writes items as parquet row groups of string columns, with list and dict
+    values JSON-encoded"""
+
+    def __init__(
+        self,
+        stream: IO[bytes],
+        fields: list[str] | None = None,
+        row_group_size: int = PARQUET_ROW_GROUP_SIZE,
+    ) -> None:
+        if pa is None:
+            raise ParquetUnavailableError
+        super().__init__(stream, fields)
+        self.row_group_size = row_group_size
+        self.schema = pa.schema([(field, pa.string()) for field in self.fields])
+        self._writer = pq.ParquetWriter(stream, self.schema)
+        self._columns: dict[str, list[str | None]] = {f: [] for f in self.fields}
+        self._rows = 0
+
+    def _write(self, item: dict[str, Any]) -> None:
+        for field, column in self._columns.items():
+            column.append(flatten_value(item.get(field)))
+        self._rows += 1
+        if self._rows >= self.row_group_size:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self._rows:
+            return
+        self._writer.write_table(
+            pa.Table.from_pydict(self._columns, schema=self.schema),
+        )
+        self._columns = {f: [] for f in self.fields}
+        self._rows = 0
+
+    def close(self) -> None:
+        self._flush()
+        self._writer.close()
+
+
+WRITERS: dict[str, type[ExportWriter]] = {
+    "ndjson": NdjsonExportWriter,
+    "csv": CsvExportWriter,
+    "parquet": ParquetExportWriter,
+}
+
+
+@contextmanager
+def open_export_output(path: str, compress: bool | None = None):
+    """Open an export destination for binary writing
+
+    Args:
+        path (str): file path, or '-' for stdout
+        compress (bool, optional): gzip the output. Defaults to compressing
+            when the path ends in '.gz'.
+    """
+    if compress is None:
+        compress = path.endswith(".gz")
+
+    with ExitStack() as stack:
+        if path == "-":
+            stream = sys.stdout.buffer
+            stack.callback(stream.flush)
+        else:
+            stream = stack.enter_context(Path(path).open("wb"))
+        if compress:
+            stream = stack.enter_context(gzip.GzipFile(fileobj=stream, mode="wb"))
+        yield stream
+
+
+def export_items(
+    items: Iterable[dict[str, Any]],
+    stream: IO[bytes],
+    export_format: str = "ndjson",
+    fields: list[str] | None = None,
+) -> int:
+    """Write StateDB items to a stream as they are produced
+
+    Args:
+        items (Iterable[dict]): StateDB items, e.g., from StateDB.yield_items
+        stream (IO[bytes]): binary destination
+        export_format (str): one of EXPORT_FORMATS
+        fields (list[str], optional): item fields to write; CSV and parquet
+            exports always have a column for each. Defaults to all fields.
+
+    Returns:
+        int: number of items written
+    """
+    writer = WRITERS[export_format](stream, fields)
+    try:
+        for item in items:
+            writer.write(item)
+    finally:
+        writer.close()
+    logger.debug("Exported %s items", writer.count)
+    return writer.count
@@ -13,7 +13,7 @@ from botocore.exceptions import ClientError
 
 from cirrus.lib.payload_bucket import PayloadBucket
 from cirrus.lib.statedb import StateDB
-from cirrus.lib.utils import get_client, get_resource
+from cirrus.lib.utils import get_client
 
 logger = logging.getLogger(__name__)
 
@@ -156,12 +156,18 @@ class Migrator:
         since_days: int = 90,
         dry_run: bool = False,
         output: IO = sys.stderr,
+        segments: int = 1,
     ) -> None:
-        dynamodb = get_resource("dynamodb", session=session)
-        self.table = dynamodb.Table(table_name)  # type: ignore
         self.s3 = get_client("s3", session=session)
         self.sfn = get_client("stepfunctions", session=session)
         self.payload_bucket = PayloadBucket(bucket_name, root_prefix=root_prefix)
+        self.statedb = StateDB(
+            table_name,
+            session=session,
+            payload_bucket=self.payload_bucket,
+        )
+        self.table = self.statedb.table
+        self.segments = segments
         self.bucket_name = bucket_name
         self.cutoff = datetime.now(UTC) - timedelta(days=since_days)
         self.dry_run = dry_run
@@ -179,27 +185,17 @@ class Migrator:
         }
 
     def run(self) -> None:
-        scan_kwargs: dict[str, Any] = {}
-        while True:
-            response = self.table.scan(**scan_kwargs)
-            items = response.get("Items", [])
-
-            for item in items:
-                self.counts["processed"] += 1
-                try:
-                    self.migrate_record(MigrationRecord(item))
-                except Exception:
-                    self.counts["unexpected_errors"] += 1
-                    logger.exception(
-                        "Unexpected error migrating record %s/%s",
-                        item.get("collections_workflow"),
-                        item.get("itemids"),
-                    )
-
-            last_key = response.get("LastEvaluatedKey")
-            if not last_key:
-                break
-            scan_kwargs["ExclusiveStartKey"] = last_key
+        for item in self.statedb.scan_items(segments=self.segments):
+            self.counts["processed"] += 1
+            try:
+                self.migrate_record(MigrationRecord(item))
+            except Exception:
+                self.counts["unexpected_errors"] += 1
+                logger.exception(
+                    "Unexpected error migrating record %s/%s",
+                    item.get("collections_workflow"),
+                    item.get("itemids"),
+                )
 
         self.output.write(
             f"\nMigration {'(dry run) ' if self.dry_run else ''}complete.\n"
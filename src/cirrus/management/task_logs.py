@@ -6,6 +6,8 @@ from datetime import UTC, datetime
 
 import boto3
 
+from cirrus.lib.utils import get_client
+
 logger = logging.getLogger(__name__)
 
 AWS_MAX_LOG_EVENTS = 10000
@@ -127,7 +129,7 @@ def get_lambda_logs(
     limit: int = 20,
     next_token: str | None = None,
 ) -> dict:
-    logs_client = session.client("logs")
+    logs_client = get_client("logs", session=session)
 
     kwargs: dict = {
         "logGroupName": log_group_name,
@@ -174,7 +176,7 @@ def get_batch_logs(
     limit: int = 20,
     next_token: str | None = None,
 ) -> dict:
-    logs_client = session.client("logs")
+    logs_client = get_client("logs", session=session)
 
     kwargs: dict = {
         "logGroupName": log_group_name,
@@ -14,6 +14,7 @@ from click_option_group import (
 )
 
 from cirrus.lib.enums import StateEnum
+from cirrus.lib.statedb import ITEM_FIELDS
 from cirrus.lib.utils import parse_since
 from cirrus.management.deployment import Deployment
 
@@ -133,3 +134,26 @@ def rerun_option(func):
         is_flag=True,
         help="Rerun payloads",
     )(func)
+
+
+def _split_fields(ctx, param, value: str | None) -> list[str] | None:
+    if value is None:
+        return None
+    fields = [field.strip() for field in value.split(",") if field.strip()]
+    if unknown := [field for field in fields if field not in ITEM_FIELDS]:
+        raise click.BadParameter(
+            f"unknown fields {', '.join(unknown)} "
+            f"(choose from {', '.join(ITEM_FIELDS)})",
+        )
+    return fields
+
+
+def fields_option(func):
+    return click.option(
+        "--fields",
+        callback=_split_fields,
+        help=(
+            "Comma-separated item fields to fetch and output, e.g., "
+            "'payload_id,state,updated'. Defaults to all fields."
+        ),
+    )(func)
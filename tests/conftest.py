@@ -11,6 +11,7 @@ import pytest
 
 from click.testing import CliRunner
 
+from cirrus.lib import runtime
 from cirrus.lib.eventdb import EventDB
 from cirrus.lib.events import WorkflowEventManager
 from cirrus.lib.payload_bucket import PayloadBucket
@@ -39,6 +40,13 @@ def _aws_credentials():
     set_fake_creds()
 
 
+@pytest.fixture(autouse=True)
+def _reset_runtime():
+    # lambda singletons are built from the environment, which differs by test
+    yield
+    runtime.reset()
+
+
 @pytest.fixture(scope="session")
 def fixtures():
     return Path(__file__).parent.joinpath("fixtures")
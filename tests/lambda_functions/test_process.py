@@ -12,6 +12,8 @@ from cirrus.lambda_functions.process import lambda_handler as process
 from cirrus.lib.errors import UndefinedPayloadBucketError
 from cirrus.lib.events import WorkflowEventManager
 from cirrus.lib.payload_manager import PayloadManager, PayloadManagers
+from cirrus.lib.throttle import get_rate_limiter
+from cirrus.lib.utils import get_client
 
 
 def assert_sns_message_sequence(expected, topic):
@@ -115,6 +117,36 @@ def test_single_payload(
     )
 
 
+def test_single_payload_oversized(
+    payload,
+    s3,
+    stepfunctions,
+    workflow,
+    statedb,
+    workflow_event_topic,
+):
+    payload["features"][0]["properties"]["padding"] = "x" * 200_000
+    assert process(payload, {}) == 1
+
+    executions = stepfunctions.list_executions(
+        stateMachineArn=workflow["stateMachineArn"],
+    )["executions"]
+    assert len(executions) == 1
+    sfn_input = json.loads(
+        stepfunctions.describe_execution(
+            executionArn=executions[0]["executionArn"],
+        )["input"],
+    )
+
+    # the state machine gets a reference to the uploaded input payload
+    # rather than a second copy of it
+    item = statedb.dbitem_to_item(statedb.get_dbitem(payload["id"]))
+    assert sfn_input == {"url": item["input_payload_url"]}
+    bucket, key = sfn_input["url"][len("s3://") :].split("/", 1)
+    body = s3.get_object(Bucket=bucket, Key=key)["Body"].read()
+    assert json.loads(body)["features"][0]["properties"]["padding"] == "x" * 200_000
+
+
 def test_no_payload_bucket(
     payload,
     stepfunctions,
@@ -200,6 +232,94 @@ def test_simulate_race_to_in_process_client_error(
     )
 
 
+def test_start_execution_throttled(
+    payload,
+    stepfunctions,
+    workflow,
+    statedb,
+    workflow_event_topic,
+    mocker,
+):
+    mocker.patch("cirrus.lib.throttle.sleep")
+    start_execution = mocker.patch.object(
+        get_client("stepfunctions"),
+        "start_execution",
+        side_effect=botocore.exceptions.ClientError(
+            error_response={"Error": {"Code": "ThrottlingException"}},
+            operation_name="StartExecution",
+        ),
+    )
+
+    with pytest.raises(Exception, match="One or more payloads failed to process"):
+        process(payload, {})
+    # retrying is left to botocore's adaptive mode
+    assert start_execution.call_count == 1
+
+    # the payload is left CLAIMED for a retry, not FAILED
+    items = statedb.get_dbitems(payload_ids=[payload["id"]])
+    assert items[0]["state_updated"].startswith("CLAIMED")
+    assert_sns_message_sequence(["CLAIMED_PROCESSING"], workflow_event_topic)
+
+    # and the redelivered payload resumes the claimed execution
+    mocker.stopall()
+    get_rate_limiter.cache_clear()
+    assert process(payload, {}) == 1
+    items = statedb.get_dbitems(payload_ids=[payload["id"]])
+    assert items[0]["state_updated"].startswith("PROCESSING")
+
+
+def test_start_execution_throttled_report_batch_item_failures(
+    payload,
+    sqs,
+    queue,
+    stepfunctions,
+    workflow,
+    statedb,
+    workflow_event_topic,
+    monkeypatch,
+    mocker,
+):
+    monkeypatch.setenv("CIRRUS_PROCESS_REPORT_BATCH_ITEM_FAILURES", "true")
+    mocker.patch("cirrus.lib.throttle.sleep")
+    start_execution = get_client("stepfunctions").start_execution
+    throttled_id = payload["id"][:-1] + "2"
+
+    def throttle_second(**kwargs):
+        if throttled_id.rpartition("/")[2] in kwargs["input"]:
+            raise botocore.exceptions.ClientError(
+                error_response={"Error": {"Code": "ThrottlingException"}},
+                operation_name="StartExecution",
+            )
+        return start_execution(**kwargs)
+
+    mocker.patch.object(
+        get_client("stepfunctions"),
+        "start_execution",
+        side_effect=throttle_second,
+    )
+    sqs.send_message(QueueUrl=queue["QueueUrl"], MessageBody=json.dumps(payload))
+    payload["id"] = throttled_id
+    sqs.send_message(QueueUrl=queue["QueueUrl"], MessageBody=json.dumps(payload))
+    _payload = sqs_to_event(
+        sqs.receive_message(
+            QueueUrl=queue["QueueUrl"],
+            VisibilityTimeout=0,
+            MaxNumberOfMessages=10,
+        ),
+        queue["Arn"],
+    )
+    throttled_message_id = next(
+        record["messageId"]
+        for record in _payload["Records"]
+        if json.loads(record["body"])["id"] == throttled_id
+    )
+
+    # only the throttled payload is reported, for SQS to redeliver
+    assert process(_payload, {}) == {
+        "batchItemFailures": [{"itemIdentifier": throttled_message_id}],
+    }
+
+
 @pytest.mark.parametrize("racey_state", ["PROCESSING", "CLAIMED"])
 def test_failure_to_set_processing(
     payload,
@@ -252,6 +372,54 @@ def test_failure_to_set_processing(
     )
 
 
+@pytest.mark.parametrize(
+    ("existing_state", "expected_result", "expected_events"),
+    [
+        (None, 1, ["CLAIMED_PROCESSING", "STARTED_PROCESSING"]),
+        ("SUCCEEDED", 0, ["ALREADY_SUCCEEDED"]),
+        ("FAILED", 1, ["CLAIMED_PROCESSING", "STARTED_PROCESSING"]),
+        ("CLAIMED", 1, ["STARTED_PROCESSING"]),
+        ("PROCESSING", 0, ["ALREADY_PROCESSING"]),
+    ],
+)
+def test_optimistic_claim(
+    payload,
+    stepfunctions,
+    workflow,
+    statedb,
+    workflow_event_topic,
+    monkeypatch,
+    mocker,
+    existing_state,
+    expected_result,
+    expected_events,
+):
+    monkeypatch.setenv("CIRRUS_PROCESS_OPTIMISTIC_CLAIM", "true")
+    exec_arn = PayloadManagers.gen_execution_arn(payload["id"], "test-workflow1")
+    if existing_state == "SUCCEEDED":
+        statedb.set_succeeded(payload["id"])
+    elif existing_state == "FAILED":
+        statedb.set_failed(payload["id"], "failure")
+    elif existing_state in ("CLAIMED", "PROCESSING"):
+        statedb.claim_processing(payload["id"], execution_arn=exec_arn)
+        if existing_state == "PROCESSING":
+            statedb.set_processing(payload["id"])
+    get_dbitems = mocker.spy(statedb.__class__, "get_dbitems")
+
+    assert process(payload, {}) == expected_result
+    # no state is read up front
+    get_dbitems.assert_not_called()
+
+    executions = stepfunctions.list_executions(
+        stateMachineArn=workflow["stateMachineArn"],
+    )["executions"]
+    assert len(executions) == expected_result
+    if existing_state == "CLAIMED":
+        # the execution claimed before is the one that gets started
+        assert executions[0]["executionArn"] == exec_arn
+    assert_sns_message_sequence(expected_events, workflow_event_topic)
+
+
 def test_rerun_completed(
     payload,
     stepfunctions,
@@ -810,6 +978,66 @@ def test_double_payload_sqs_with_bad_workflow(
     )
 
 
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_concurrent_process(
+    payload,
+    stepfunctions,
+    workflow,
+    statedb,
+    max_workers,
+):
+    payload_ids = [f"{payload['id'][:-1]}{i}" for i in range(6)]
+    payload_managers = [
+        PayloadManager({**payload, "id": payload_id}) for payload_id in payload_ids
+    ]
+    # the same payload again should be dropped as a duplicate
+    payload_managers.append(PayloadManager({**payload, "id": payload_ids[0]}))
+    # and one already SUCCEEDED should be skipped
+    statedb.set_succeeded(payload_ids[-1])
+
+    with WorkflowEventManager(statedb=statedb) as wfem:
+        processed = PayloadManagers(payload_managers, statedb=statedb).process(
+            wfem,
+            max_workers=max_workers,
+        )
+
+    assert processed["started"] == payload_ids[:-1]
+    assert processed["skipped"] == [payload_ids[-1]]
+    assert processed["dropped"] == [payload_ids[0]]
+    assert processed["failed"] == []
+
+    exec_count = len(
+        stepfunctions.list_executions(
+            stateMachineArn=workflow["stateMachineArn"],
+        )["executions"],
+    )
+    assert exec_count == len(payload_ids) - 1
+
+
+def test_concurrent_process_terminal_error(
+    payload,
+    stepfunctions,
+    workflow,
+    statedb,
+):
+    good_id = payload["id"]
+    bad_payload = {
+        **payload,
+        "id": payload["id"][:-1] + "2",
+        "process": [{**payload["process"][0], "workflow": "unknown-workflow"}],
+    }
+    payload_managers = [PayloadManager(payload), PayloadManager(bad_payload)]
+
+    with WorkflowEventManager(statedb=statedb) as wfem:
+        processed = PayloadManagers(payload_managers, statedb=statedb).process(
+            wfem,
+            max_workers=2,
+        )
+
+    assert processed["started"] == [good_id]
+    assert processed["failed"] == [bad_payload["id"]]
+
+
 def test_payload_bad_workflow_no_id(
     payload,
     sqs,
@@ -889,6 +1117,107 @@ def test_double_payload_sqs_with_bad_format(
     )
 
 
+def test_double_payload_sqs_report_batch_item_failures(
+    payload,
+    sqs,
+    queue,
+    stepfunctions,
+    workflow,
+    statedb,
+    workflow_event_topic,
+    monkeypatch,
+):
+    monkeypatch.setenv("CIRRUS_PROCESS_REPORT_BATCH_ITEM_FAILURES", "true")
+    sqs.send_message(
+        QueueUrl=queue["QueueUrl"],
+        MessageBody=json.dumps(payload),
+    )
+    payload["id"] = payload["id"][:-1] + "2"
+    del payload["process"]
+    sqs.send_message(
+        QueueUrl=queue["QueueUrl"],
+        MessageBody=json.dumps(payload),
+    )
+    _payload = sqs_to_event(
+        sqs.receive_message(
+            QueueUrl=queue["QueueUrl"],
+            VisibilityTimeout=0,
+            MaxNumberOfMessages=10,
+        ),
+        queue["Arn"],
+    )
+    bad_message_id = next(
+        record["messageId"]
+        for record in _payload["Records"]
+        if "process" not in json.loads(record["body"])
+    )
+    result = process(_payload, {})
+    assert result == {"batchItemFailures": [{"itemIdentifier": bad_message_id}]}
+
+    exec_count = len(
+        stepfunctions.list_executions(
+            stateMachineArn=workflow["stateMachineArn"],
+        )["executions"],
+    )
+    assert exec_count == 1
+
+    # lambda deletes the successful messages for us, so nothing is
+    # removed from the queue by the handler itself
+    messages = sqs.receive_message(
+        QueueUrl=queue["QueueUrl"],
+        VisibilityTimeout=0,
+        MaxNumberOfMessages=10,
+    )
+    assert len(messages["Messages"]) == 2
+    assert_sns_message_sequence(
+        ["NOT_A_PROCESS_PAYLOAD", "CLAIMED_PROCESSING", "STARTED_PROCESSING"],
+        workflow_event_topic,
+    )
+
+
+def test_single_payload_report_batch_item_failures_not_sqs(
+    payload,
+    stepfunctions,
+    workflow,
+    statedb,
+    workflow_event_topic,
+    monkeypatch,
+):
+    monkeypatch.setenv("CIRRUS_PROCESS_REPORT_BATCH_ITEM_FAILURES", "true")
+    # direct invocations still return the number of started workflows
+    assert process(payload, {}) == 1
+
+
+def test_single_payload_sqs_report_batch_item_failures_success(
+    payload,
+    sqs,
+    queue,
+    stepfunctions,
+    workflow,
+    statedb,
+    workflow_event_topic,
+    monkeypatch,
+):
+    monkeypatch.setenv("CIRRUS_PROCESS_REPORT_BATCH_ITEM_FAILURES", "1")
+    sqs.send_message(
+        QueueUrl=queue["QueueUrl"],
+        MessageBody=json.dumps(payload),
+    )
+    _payload = sqs_to_event(
+        sqs.receive_message(
+            QueueUrl=queue["QueueUrl"],
+            VisibilityTimeout=0,
+            MaxNumberOfMessages=10,
+        ),
+        queue["Arn"],
+    )
+    assert process(_payload, {}) == {"batchItemFailures": []}
+    assert_sns_message_sequence(
+        ["CLAIMED_PROCESSING", "STARTED_PROCESSING"],
+        workflow_event_topic,
+    )
+
+
 def test_payload_unable_to_upload(
     payload,
     sqs,
@@ -905,9 +1234,7 @@ def test_payload_unable_to_upload(
             operation_name="monkeying around",
         )
 
-    s3_upload = mocker.patch(
-        "boto3utils.s3.s3.upload_json",
-    )
+    s3_upload = mocker.patch.object(get_client("s3"), "put_object")
     s3_upload.side_effect = raises_client_error
 
     with pytest.raises(botocore.exceptions.ClientError, match="monkeying around"):
@@ -1,4 +1,5 @@
 import contextlib
+import json
 import os
 
 from pprint import pformat
@@ -11,6 +12,7 @@ from moto import mock_aws
 from cirrus.lib.events import (
     WFEventType,
     WorkflowEvent,
+    WorkflowEventManager,
     WorkflowMetricLogger,
     WorkflowMetricReader,
 )
@@ -51,6 +53,63 @@ def test_workflow_metric_logger_and_and_send(monkeypatch):
     assert len(events["events"]) == 2
 
 
+@mock_aws
+def test_workflow_event_manager_flushes_metric_logger(monkeypatch, statedb):
+    log_group_name = "workflow-metrics"
+    monkeypatch.delenv("CIRRUS_WORKFLOW_EVENT_TOPIC_ARN", raising=False)
+    logs_client = get_client("logs")
+    logs_client.create_log_group(logGroupName=log_group_name)
+
+    metric_logger = WorkflowMetricLogger(log_group_name=log_group_name)
+    with WorkflowEventManager(statedb=statedb, metric_logger=metric_logger) as wfem:
+        # lambda contexts without the remaining time are ignored
+        wfem.set_deadline(object())
+        wfem.announce(make_event())
+        wfem.announce(make_event())
+        assert len(metric_logger._batch) == 2
+
+    events = logs_client.get_log_events(
+        logGroupName=log_group_name,
+        logStreamName=metric_logger.log_stream_name,
+    )
+    assert len(events["events"]) == 2
+
+
+def test_workflow_metric_logger_emf(monkeypatch, capsys, mocker):
+    monkeypatch.setenv("CIRRUS_WORKFLOW_METRIC_OUTPUT", "emf")
+    monkeypatch.setenv("CIRRUS_WORKFLOW_METRIC_NAMESPACE", "cirrus-test")
+    monkeypatch.setenv("CIRRUS_WORKFLOW_LOG_GROUP", "unused")
+    get_client = mocker.patch("cirrus.lib.events.get_client")
+
+    metric_logger = WorkflowMetricLogger()
+    assert metric_logger.enabled()
+    metric_logger.add(make_event())
+
+    get_client.assert_not_called()
+    lines = capsys.readouterr().out.splitlines()
+    some, everything = (json.loads(line) for line in lines)
+    assert some["_aws"]["CloudWatchMetrics"] == [
+        {
+            "Namespace": "cirrus-test",
+            "Dimensions": [["event", "workflow"]],
+            "Metrics": [{"Name": "a_workflow_by_event", "Unit": "Count"}],
+        },
+    ]
+    assert some["event"] == "SUCCEEDED"
+    assert some["workflow"] == "copier"
+    assert some["source"] == "somesource"
+    assert some["a_workflow_by_event"] == 1
+    assert everything["_aws"]["CloudWatchMetrics"][0]["Dimensions"] == [["event"]]
+    assert everything["all_workflows_by_event"] == 1
+
+
+def test_workflow_metric_logger_emf_disabled(monkeypatch):
+    monkeypatch.delenv("CIRRUS_WORKFLOW_METRIC_NAMESPACE", raising=False)
+    assert not WorkflowMetricLogger(output="emf").enabled()
+    with pytest.raises(ValueError, match="Unsupported workflow metric output"):
+        WorkflowMetricLogger(output="stdout")
+
+
 @mock_aws
 def test_workflow_metric_logger_disabled(monkeypatch):
     monkeypatch.delenv("CIRRUS_WORKFLOW_METRIC_NAMESPACE", raising=False)
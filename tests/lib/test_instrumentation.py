@@ -0,0 +1,135 @@
+import json
+
+import boto3
+import pytest
+
+from botocore.exceptions import ClientError
+
+from cirrus.lib import instrumentation, utils
+from tests.conftest import MOCK_REGION
+
+
+@pytest.fixture(autouse=True)
+def _recorder():
+    instrumentation.recorder.reset()
+    yield
+    instrumentation.recorder.reset()
+
+
+@pytest.fixture
+def s3_client(s3):
+    return instrumentation.instrument(boto3.client("s3", region_name=MOCK_REGION))
+
+
+def test_output(monkeypatch):
+    monkeypatch.delenv("CIRRUS_AWS_CALL_METRICS", raising=False)
+    assert instrumentation.output() is None
+    monkeypatch.setenv("CIRRUS_AWS_CALL_METRICS", "EMF")
+    assert instrumentation.output() == "emf"
+    monkeypatch.setenv("CIRRUS_AWS_CALL_METRICS", "statsd")
+    assert instrumentation.output() is None
+
+
+def test_operation_stats():
+    stats = instrumentation.OperationStats()
+    for latency in (1.0, 4.0, 30.0, 10_000.0):
+        stats.record(latency, error=False, retries=1, consumed_capacity=0.5)
+    summary = stats.summary()
+    assert summary["calls"] == 4
+    assert summary["retries"] == 4
+    assert summary["consumed_capacity"] == 2.0
+    assert summary["max_latency_ms"] == 10_000.0
+    assert summary["latency_histogram_ms"] == {"<=5": 2, "<=50": 1, ">5000": 1}
+    assert stats.emf_metrics()["Latency"] == {
+        "Values": [5, 50, 10_000.0],
+        "Counts": [2, 1, 1],
+    }
+
+
+def test_instrument_records_calls(s3_client):
+    s3_client.create_bucket(Bucket="bucket")
+    s3_client.put_object(Bucket="bucket", Key="key", Body=b"data")
+    s3_client.put_object(Bucket="bucket", Key="key", Body=b"data")
+    with pytest.raises(ClientError):
+        s3_client.get_object(Bucket="bucket", Key="missing")
+
+    summary = instrumentation.recorder.summary()
+    assert list(summary) == ["s3.CreateBucket", "s3.GetObject", "s3.PutObject"]
+    assert summary["s3.PutObject"]["calls"] == 2
+    assert summary["s3.PutObject"]["errors"] == 0
+    assert summary["s3.GetObject"]["errors"] == 1
+    assert sum(summary["s3.PutObject"]["latency_histogram_ms"].values()) == 2
+
+
+def test_instrument_dynamodb_consumed_capacity(dynamo, statedb_schema):
+    client = instrumentation.instrument(
+        boto3.client("dynamodb", region_name=MOCK_REGION),
+    )
+    client.create_table(**statedb_schema)
+    response = client.put_item(
+        TableName=statedb_schema["TableName"],
+        Item={"collections_workflow": {"S": "col_wf"}, "itemids": {"S": "item"}},
+    )
+
+    assert "ConsumedCapacity" in response
+    summary = instrumentation.recorder.summary()
+    assert summary["dynamodb.PutItem"]["consumed_capacity"] > 0
+
+
+def test_emit_summary_log(monkeypatch, caplog, s3_client):
+    monkeypatch.setenv("CIRRUS_AWS_CALL_METRICS", "log")
+    s3_client.create_bucket(Bucket="bucket")
+    with caplog.at_level("INFO"):
+        instrumentation.emit_summary()
+    (record,) = caplog.records
+    assert record.getMessage() == "AWS calls: 1 calls to 1 operations"
+    assert record.aws_calls["s3.CreateBucket"]["calls"] == 1
+
+
+def test_emit_summary_emf(monkeypatch, capsys, s3_client):
+    monkeypatch.setenv("CIRRUS_AWS_CALL_METRICS", "emf")
+    monkeypatch.setenv("CIRRUS_AWS_CALL_METRICS_NAMESPACE", "test-namespace")
+    s3_client.create_bucket(Bucket="bucket")
+    instrumentation.emit_summary()
+
+    (document,) = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    (directive,) = document["_aws"]["CloudWatchMetrics"]
+    assert directive["Namespace"] == "test-namespace"
+    assert directive["Dimensions"] == [["service", "operation"]]
+    assert document["service"] == "s3"
+    assert document["operation"] == "CreateBucket"
+    assert document["Calls"] == 1
+
+
+def test_emit_summary_disabled(monkeypatch, capsys, caplog, s3_client):
+    monkeypatch.delenv("CIRRUS_AWS_CALL_METRICS", raising=False)
+    s3_client.create_bucket(Bucket="bucket")
+    instrumentation.emit_summary()
+    assert capsys.readouterr().out == ""
+    assert not caplog.records
+
+
+def test_with_aws_call_summary(monkeypatch, caplog, s3_client):
+    monkeypatch.setenv("CIRRUS_AWS_CALL_METRICS", "log")
+
+    @instrumentation.with_aws_call_summary()
+    def handler(bucket):
+        s3_client.create_bucket(Bucket=bucket)
+        return bucket
+
+    with caplog.at_level("INFO"):
+        assert handler("bucket-1") == "bucket-1"
+        handler("bucket-2")
+
+    # each invocation summarizes only its own calls
+    assert [r.aws_calls["s3.CreateBucket"]["calls"] for r in caplog.records] == [1, 1]
+
+
+def test_get_client_instrumented(monkeypatch, s3):
+    monkeypatch.setenv("CIRRUS_AWS_CALL_METRICS", "log")
+    utils.get_client.cache_clear()
+    try:
+        utils.get_client("s3", region=MOCK_REGION).list_buckets()
+    finally:
+        utils.get_client.cache_clear()
+    assert instrumentation.recorder.summary()["s3.ListBuckets"]["calls"] == 1
@@ -5,8 +5,12 @@ from pathlib import Path
 
 import pytest
 
-from cirrus.lib.payload_manager import MAX_PAYLOAD_LENGTH, PayloadManager
-from cirrus.lib.utils import build_item_sns_attributes, recursive_compare
+from cirrus.lib.payload_manager import (
+    MAX_PAYLOAD_LENGTH,
+    PayloadManager,
+    compile_chain_filter,
+)
+from cirrus.lib.utils import build_item_sns_attributes, json_dumps, recursive_compare
 
 fixtures = Path(__file__).parent.joinpath("fixtures")
 
@@ -125,6 +129,38 @@ def test_next_payloads_chain_filter(chain_payload, chain_filter_payload):
     assert recursive_compare(payloads[0], chain_filter_payload)
 
 
+def test_next_payloads_no_features(chain_payload):
+    payload_manager = PayloadManager(chain_payload, set_id_if_missing=True)
+    del payload_manager.payload["features"]
+    payloads = list(payload_manager.next_payloads())
+    assert payloads[0]["features"] == []
+
+    payload_manager.payload["process"][1].pop("chain_filter")
+    payloads = list(payload_manager.next_payloads())
+    assert "features" not in payloads[0]
+
+
+def test_next_payloads_shares_features(chain_payload):
+    original = copy.deepcopy(chain_payload)
+    pm = PayloadManager(chain_payload, set_id_if_missing=True)
+    payloads = list(pm.next_payloads())
+    assert len(payloads) == 1
+    # features are shared with the original payload, not copied
+    assert payloads[0]["features"][0] is chain_payload["features"][-1]
+    assert payloads[0]["process"] is not chain_payload["process"]
+    # and the original payload is left untouched
+    assert recursive_compare(pm.payload, original)
+
+
+def test_compile_chain_filter_cached(chain_payload):
+    compile_chain_filter.cache_clear()
+    for _ in range(3):
+        list(PayloadManager(chain_payload, set_id_if_missing=True).next_payloads())
+    info = compile_chain_filter.cache_info()
+    assert info.misses == 1
+    assert info.hits == 2
+
+
 def test_items_to_sns_messages(base_payload):
     # SNSMessage instances do not implement the equality dunder method; instead,
     # compare the rendered message contents.
@@ -134,7 +170,7 @@ def test_items_to_sns_messages(base_payload):
     ]
     expected = [
         {
-            "Message": json.dumps(base_payload["features"][0]),
+            "Message": json_dumps(base_payload["features"][0]),
             "MessageAttributes": build_item_sns_attributes(base_payload["features"][0]),
         },
     ]
@@ -150,6 +186,16 @@ def test_calculate_payload_length(base_payload) -> None:
     assert double_encoded_length > single_encoded_length
 
 
+def test_calculate_payload_length_escaping(base_payload) -> None:
+    base_payload["features"][0]["properties"]["text"] = 'a "quoted" \\path\n é ☃'
+    pm = PayloadManager(base_payload)
+    encoded = pm.encode_payload()
+    assert json.loads(encoded) == pm.payload
+    assert pm.calculate_payload_length(encoded) == len(
+        json.dumps(encoded.decode(), ensure_ascii=False).encode(),
+    )
+
+
 def test_fail_and_raise(base_payload):
     payload_manager = PayloadManager(base_payload)
     with pytest.raises(Exception):
@@ -0,0 +1,50 @@
+import pytest
+
+from cirrus.lib import runtime
+
+
+@pytest.fixture
+def _env(monkeypatch, statedb, payload_bucket):
+    monkeypatch.setenv("CIRRUS_STATE_DB", statedb.table_name)
+    monkeypatch.setenv("CIRRUS_PAYLOAD_BUCKET", payload_bucket.bucket_name)
+
+
+@pytest.mark.usefixtures("_env")
+def test_shared_objects():
+    statedb = runtime.get_statedb()
+    assert runtime.get_statedb() is statedb
+    assert statedb.payload_bucket is runtime.get_payload_bucket()
+
+    wfem = runtime.get_workflow_event_manager()
+    assert runtime.get_workflow_event_manager() is wfem
+    assert wfem.statedb is statedb
+    assert wfem.eventdb is runtime.get_eventdb()
+
+    runtime.reset()
+    assert runtime.get_statedb() is not statedb
+    assert runtime.get_workflow_event_manager() is not wfem
+
+
+@pytest.mark.usefixtures("_env")
+def test_with_workflow_event_manager(mocker):
+    @runtime.with_workflow_event_manager()
+    def handler(event, *, wfem):
+        return wfem
+
+    first = handler({})
+    flush = mocker.spy(first, "flush")
+    assert handler({}) is first
+    flush.assert_called_once()
+
+
+@pytest.mark.usefixtures("_env")
+def test_offloading_publishers():
+    topic_arn = "arn:aws:sns:us-east-1:123456789012:test-topic"
+    publisher = runtime.get_offloading_sns_publisher(topic_arn)
+    assert runtime.get_offloading_sns_publisher(topic_arn) is publisher
+    assert publisher.offload == runtime.get_payload_bucket().upload_oversize_payload
+
+    queue_url = "https://sqs.us-east-1.amazonaws.com/123456789012/test-queue"
+    publisher = runtime.get_offloading_sqs_publisher(queue_url)
+    assert runtime.get_offloading_sqs_publisher(queue_url) is publisher
+    assert publisher.offload == runtime.get_payload_bucket().upload_oversize_payload
@@ -4,11 +4,12 @@ from typing import Any
 
 import pytest
 
+from boto3.dynamodb.conditions import Attr
 from botocore.exceptions import ClientError
 
 from cirrus.exceptions import PayloadNotFoundError
 from cirrus.lib.enums import StateEnum
-from cirrus.lib.statedb import StateDB
+from cirrus.lib.statedb import BATCH_GET_MAX_KEYS, StateDB
 
 # fixtures
 test_dbitem: dict[str, Any] = {
@@ -206,6 +207,167 @@ def test_get_items_limit_1_bulk(state_table: StateDB):
     assert len(items) == 1
 
 
+def test_cursor_round_trip():
+    key = {
+        "collections_workflow": "col1_wf1",
+        "itemids": "item1/item2",
+        "state_updated": "PROCESSING_2024-01-01T00:00:00+00:00",
+    }
+    cursor = StateDB.encode_cursor(key)
+    assert "/" not in cursor
+    assert "=" not in cursor
+    assert StateDB.decode_cursor(cursor) == key
+
+
+@pytest.mark.parametrize("cursor", ["not a cursor", "WzEsMl0"])
+def test_decode_cursor_invalid(cursor):
+    with pytest.raises(ValueError, match="Invalid pagination cursor"):
+        StateDB.decode_cursor(cursor)
+
+
+def test_get_items_page_cursor(state_table: StateDB, mocker):
+    count = 5
+    create_items_bulk(count, state_table.claim_processing, execution_arn="arn::test")
+    create_items_bulk(count, state_table.set_processing)
+    get_dbitem = mocker.spy(state_table, "get_dbitem")
+
+    payload_ids = []
+    nextkey = None
+    while True:
+        page = state_table.get_items_page(
+            test_dbitem["collections_workflow"],
+            state="PROCESSING",
+            limit=2,
+            nextkey=nextkey,
+        )
+        payload_ids += [item["payload_id"] for item in page["items"]]
+        if "nextkey" not in page:
+            break
+        nextkey = page["nextkey"]
+
+    assert len(payload_ids) == len(set(payload_ids)) == count + 1
+    get_dbitem.assert_not_called()
+
+
+def test_get_items_page_legacy_nextkey(state_table: StateDB):
+    create_items_bulk(2, state_table.claim_processing, execution_arn="arn::test")
+    create_items_bulk(2, state_table.set_processing)
+    page1 = state_table.get_items_page(
+        test_dbitem["collections_workflow"],
+        state="PROCESSING",
+        limit=1,
+    )
+    legacy = state_table.get_items_page(
+        test_dbitem["collections_workflow"],
+        state="PROCESSING",
+        limit=1,
+        nextkey=page1["items"][0]["payload_id"],
+    )
+    current = state_table.get_items_page(
+        test_dbitem["collections_workflow"],
+        state="PROCESSING",
+        limit=1,
+        nextkey=page1["nextkey"],
+    )
+    assert legacy["items"] == current["items"]
+    assert legacy["items"][0]["payload_id"] != page1["items"][0]["payload_id"]
+
+
+def test_get_items_page_fields(state_table: StateDB, mocker):
+    query = mocker.spy(state_table.table, "query")
+    page = state_table.get_items_page(
+        test_dbitem["collections_workflow"],
+        state="PROCESSING",
+        fields=["payload_id", "state", "input_payload_url"],
+    )
+
+    assert len(page["items"]) == 1
+    item = page["items"][0]
+    assert list(item) == ["payload_id", "state", "input_payload_url"]
+    assert item["state"] == "PROCESSING"
+    assert item["input_payload_url"].endswith("/input.json")
+
+    kwargs = query.call_args.kwargs
+    assert kwargs["Select"] == "SPECIFIC_ATTRIBUTES"
+    assert sorted(kwargs["ExpressionAttributeNames"].values()) == [
+        "collections_workflow",
+        "executions",
+        "itemids",
+        "state_updated",
+    ]
+
+
+def test_get_items_page_unknown_fields(state_table: StateDB):
+    with pytest.raises(ValueError, match="Unknown item fields: nope"):
+        state_table.get_items_page(
+            test_dbitem["collections_workflow"],
+            fields=["payload_id", "nope"],
+        )
+
+
+def test_dbitem_to_item_fields(state_table: StateDB):
+    full = state_table.dbitem_to_item(test_dbitem)
+    fields = ["updated", "payload_id"]
+    assert state_table.dbitem_to_item(test_dbitem, fields=fields) == {
+        "updated": full["updated"],
+        "payload_id": full["payload_id"],
+    }
+
+
+def table_items(statedb: StateDB) -> list[dict[str, Any]]:
+    return statedb.table.scan()["Items"]
+
+
+@pytest.mark.parametrize("segments", [1, 3])
+def test_scan_items(state_table: StateDB, segments):
+    count = 12
+    create_items_bulk(count, state_table.claim_processing, execution_arn="arn::test")
+    expected = [
+        (i["collections_workflow"], i["itemids"]) for i in table_items(state_table)
+    ]
+
+    items = list(state_table.scan_items(segments=segments, page_size=2))
+
+    assert len(expected) > count
+    assert sorted((i["collections_workflow"], i["itemids"]) for i in items) == sorted(
+        expected,
+    )
+
+
+def test_scan_items_filter_and_attributes(state_table: StateDB):
+    create_items_bulk(3, state_table.claim_processing, execution_arn="arn::test")
+    items = list(
+        state_table.scan_items(
+            segments=2,
+            filter_expression=Attr("state_updated").begins_with("CLAIMED"),
+            attributes=["state_updated"],
+        ),
+    )
+    claimed = [
+        i for i in table_items(state_table) if i["state_updated"].startswith("CLAIMED")
+    ]
+    assert len(items) == len(claimed) >= 3
+    for item in items:
+        assert set(item) == {"collections_workflow", "itemids", "state_updated"}
+
+
+def test_scan_items_close_early(state_table: StateDB):
+    create_items_bulk(10, state_table.claim_processing, execution_arn="arn::test")
+    items = state_table.scan_items(segments=4, page_size=1)
+    assert "itemids" in next(items)
+    items.close()
+
+
+def test_scan_items_error(state_table: StateDB, mocker):
+    mocker.patch.object(
+        state_table.table,
+        "scan",
+        side_effect=ClientError({"Error": {"Code": "ValidationException"}}, "Scan"),
+    )
+    with pytest.raises(ClientError, match="ValidationException"):
+        list(state_table.scan_items(segments=2))
+
+
 def test_get_items_error(state_table: StateDB):
     items = state_table.get_items(
         test_dbitem["collections_workflow"],
@@ -265,6 +427,66 @@ def test_get_dbitems_duplicates(state_table: StateDB):
         assert state_table.key_to_payload_id(dbitem) in ids
 
 
+def test_get_dbitems_over_batch_limit(state_table: StateDB):
+    count = BATCH_GET_MAX_KEYS * 2 + 5
+    create_items_bulk(count, state_table.set_failed, msg="failed")
+    ids = [test_item["id"] + str(i) for i in range(count)]
+    dbitems = state_table.get_dbitems(ids)
+    assert len(dbitems) == count
+    assert {state_table.key_to_payload_id(dbitem) for dbitem in dbitems} == set(ids)
+
+
+def test_get_dbitems_retries_unprocessed(state_table: StateDB, mocker):
+    ids = [test_item["id"] + f"_{s.lower()}" for s in STATES]
+    client = state_table.db.meta.client
+    batch_get_item = client.batch_get_item
+
+    def partial_response(RequestItems):  # noqa: N803
+        # report all but the first key as unprocessed on the first call
+        request = RequestItems[state_table.table_name]
+        if mock.call_count > 1:
+            return batch_get_item(RequestItems=RequestItems)
+        resp = batch_get_item(
+            RequestItems={
+                state_table.table_name: {**request, "Keys": request["Keys"][:1]},
+            },
+        )
+        resp["UnprocessedKeys"] = {
+            state_table.table_name: {**request, "Keys": request["Keys"][1:]},
+        }
+        return resp
+
+    mocker.patch("cirrus.lib.statedb.sleep")
+    mock = mocker.patch.object(client, "batch_get_item", side_effect=partial_response)
+    dbitems = state_table.get_dbitems(ids)
+    assert mock.call_count == 2
+    assert {state_table.key_to_payload_id(dbitem) for dbitem in dbitems} == set(ids)
+
+
+def test_get_dbitems_unprocessed_exhausted(state_table: StateDB, mocker):
+    ids = [test_item["id"] + "_processing"]
+    mocker.patch("cirrus.lib.statedb.sleep")
+    mocker.patch.object(
+        state_table.db.meta.client,
+        "batch_get_item",
+        return_value={
+            "Responses": {},
+            "UnprocessedKeys": {
+                state_table.table_name: {"Keys": [StateDB.payload_id_to_key(ids[0])]},
+            },
+        },
+    )
+    with pytest.raises(Exception, match="Error fetching items"):
+        state_table.get_dbitems(ids)
+
+
+def test_get_dbitems_attributes(state_table: StateDB):
+    ids = [test_item["id"] + "_succeeded"]
+    dbitems = state_table.get_dbitems(ids, attributes=["state_updated"])
+    assert len(dbitems) == 1
+    assert set(dbitems[0]) == {"collections_workflow", "itemids", "state_updated"}
+
+
 def test_get_dbitems_noitems(state_table: StateDB):
     dbitems = state_table.get_dbitems(["no-collection/workflow-none/fake-id"])
     assert len(dbitems) == 0
@@ -335,6 +557,22 @@ def test_get_counts_state_limit(state_table: StateDB):
     assert count == "15+"
 
 
+def test_get_state_histogram(state_table: StateDB):
+    _count = 20
+    create_items_bulk(_count, state_table.set_failed, msg="failed")
+    histogram = state_table.get_state_histogram(test_dbitem["collections_workflow"])
+    assert list(histogram) == STATES
+    assert histogram == {s: _count + 1 if s == "FAILED" else 1 for s in STATES}
+
+    histogram = state_table.get_state_histogram(
+        test_dbitem["collections_workflow"],
+        since=timedelta(hours=1),
+        limit=15,
+    )
+    assert histogram["FAILED"] == "15+"
+    assert histogram["SUCCEEDED"] == 1
+
+
 def test_get_counts_since_limit_under(state_table: StateDB):
     _count = 20
     create_items_bulk(_count, state_table.set_failed, msg="failed")
@@ -476,3 +714,192 @@ def test_delete_item(state_table: StateDB):
     state_table.delete_item(test_item["id"])
     with pytest.raises(PayloadNotFoundError):
         state_table.get_dbitem(test_item["id"])
+
+
+@pytest.fixture
+def counted_statedb(dynamo, statedb: StateDB) -> StateDB:
+    dynamo.create_table(
+        TableName="state-counts",
+        KeySchema=[{"AttributeName": "collections_workflow", "KeyType": "HASH"}],
+        AttributeDefinitions=[
+            {"AttributeName": "collections_workflow", "AttributeType": "S"},
+        ],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    return StateDB(
+        table_name=statedb.table_name,
+        payload_bucket=statedb.payload_bucket,
+        counts_table_name="state-counts",
+    )
+
+
+def test_state_counts(counted_statedb: StateDB):
+    collections_workflow = test_dbitem["collections_workflow"]
+    payload_id = test_item["id"]
+    counted_statedb.claim_processing(payload_id, execution_arn="arn::1")
+    counted_statedb.set_processing(payload_id)
+    counted_statedb.set_failed(payload_id, "failed")
+    counted_statedb.set_failed(payload_id, "failed again")
+    counted_statedb.claim_processing(payload_id, execution_arn="arn::2")
+    counted_statedb.set_processing(payload_id)
+    counted_statedb.set_succeeded(payload_id)
+    counted_statedb.set_invalid(f"{payload_id}-2", "invalid")
+    counted_statedb.set_aborted(f"{payload_id}-3")
+
+    expected = {s: 1 if s in ("SUCCEEDED", "INVALID", "ABORTED") else 0 for s in STATES}
+    assert counted_statedb.get_state_counts(collections_workflow) == expected
+    assert counted_statedb.get_state_histogram(collections_workflow) == expected
+    assert (
+        counted_statedb.get_state_histogram(
+            collections_workflow,
+            use_counts=False,
+        )
+        == expected
+    )
+
+
+def test_state_counts_limit(counted_statedb: StateDB):
+    create_items_bulk(5, counted_statedb.set_failed, msg="failed")
+    histogram = counted_statedb.get_state_histogram(
+        test_dbitem["collections_workflow"],
+        limit=3,
+    )
+    assert histogram["FAILED"] == "3+"
+    assert histogram["SUCCEEDED"] == 0
+
+
+def test_rebuild_state_counts(counted_statedb: StateDB):
+    collections_workflow = test_dbitem["collections_workflow"]
+    create_items_bulk(3, counted_statedb.set_failed, msg="failed")
+    # simulate drift
+    assert counted_statedb.counts_table is not None
+    counted_statedb.counts_table.put_item(
+        Item={"collections_workflow": collections_workflow, "FAILED": 7, "INVALID": 2},
+    )
+    counts = counted_statedb.get_state_counts(collections_workflow)
+    assert counts is not None
+    assert counts["FAILED"] == 7
+
+    expected = {s: 3 if s == "FAILED" else 0 for s in STATES}
+    assert counted_statedb.rebuild_state_counts(collections_workflow) == expected
+    assert counted_statedb.get_state_counts(collections_workflow) == expected
+
+
+def test_state_counts_delete(counted_statedb: StateDB):
+    collections_workflow = test_dbitem["collections_workflow"]
+    counted_statedb.set_failed(test_item["id"], "failed")
+    counted_statedb.delete_item(test_item["id"])
+    # deleting a missing item changes nothing
+    counted_statedb.delete_item(test_item["id"])
+    assert counted_statedb.get_state_counts(collections_workflow) == dict.fromkeys(
+        STATES,
+        0,
+    )
+
+
+def test_state_counts_failed_condition(counted_statedb: StateDB):
+    collections_workflow = test_dbitem["collections_workflow"]
+    payload_id = test_item["id"]
+    counted_statedb.claim_processing(payload_id, execution_arn="arn::1")
+    with pytest.raises(ClientError) as excinfo:
+        counted_statedb.claim_processing(payload_id, execution_arn="arn::2")
+    error = excinfo.value.response
+    assert error["Error"]["Code"] == "ConditionalCheckFailedException"
+    assert error["Item"]["state_updated"]["S"].startswith("CLAIMED")
+
+    with pytest.raises(ClientError) as excinfo:
+        counted_statedb.set_processing(f"{payload_id}-2")
+    assert "Item" not in excinfo.value.response
+
+    counts = counted_statedb.get_state_counts(collections_workflow)
+    assert counts == {s: 1 if s == "CLAIMED" else 0 for s in STATES}
+
+
+def test_state_counts_atomic(counted_statedb: StateDB, dynamo):
+    # the state change fails along with the counts update
+    dynamo.delete_table(TableName="state-counts")
+    with pytest.raises(ClientError):
+        counted_statedb.set_failed(test_item["id"], "failed")
+    with pytest.raises(PayloadNotFoundError):
+        counted_statedb.get_dbitem(test_item["id"])
+
+
+def test_state_counts_concurrent_change(counted_statedb: StateDB, mocker):
+    collections_workflow = test_dbitem["collections_workflow"]
+    payload_id = test_item["id"]
+    counted_statedb.set_failed(payload_id, "failed")
+
+    # the state changes between the first read and the transaction
+    current = counted_statedb.table.get_item(
+        Key=counted_statedb.payload_id_to_key(payload_id),
+    )
+    get_item = mocker.patch.object(
+        counted_statedb.table,
+        "get_item",
+        side_effect=[{}, current],
+    )
+    counted_statedb.set_succeeded(payload_id)
+
+    assert get_item.call_count == 2
+    counts = counted_statedb.get_state_counts(collections_workflow)
+    assert counts == {s: 1 if s == "SUCCEEDED" else 0 for s in STATES}
+
+
+def cancelled_transaction(*codes):
+    return ClientError(
+        {
+            "Error": {"Code": "TransactionCanceledException"},
+            "CancellationReasons": [{"Code": code} for code in codes],
+        },
+        "TransactWriteItems",
+    )
+
+
+def failing_transactions(statedb, mocker, *errors):
+    """Fail the first transactions with the given errors"""
+    client = statedb.db.meta.client
+    transact_write_items = client.transact_write_items
+    failures = list(errors)
+
+    def transact(**kwargs):
+        if failures:
+            raise failures.pop(0)
+        return transact_write_items(**kwargs)
+
+    return mocker.patch.object(client, "transact_write_items", side_effect=transact)
+
+
+def test_state_counts_counts_conflict(counted_statedb: StateDB, mocker):
+    collections_workflow = test_dbitem["collections_workflow"]
+    payload_id = test_item["id"]
+    sleep = mocker.patch("cirrus.lib.statedb.sleep")
+    # another change in the workflow is updating its counts, then throttling
+    transact = failing_transactions(
+        counted_statedb,
+        mocker,
+        cancelled_transaction("None", "TransactionConflict"),
+        cancelled_transaction("None", "ThrottlingError"),
+    )
+    counted_statedb.set_failed(payload_id, "failed")
+
+    assert transact.call_count == 3
+    assert sleep.call_count == 2
+    counts = counted_statedb.get_state_counts(collections_workflow)
+    assert counts == {s: 1 if s == "FAILED" else 0 for s in STATES}
+
+
+def test_state_counts_conflict_retries_exhausted(counted_statedb: StateDB, mocker):
+    mocker.patch("cirrus.lib.statedb.sleep")
+    failing_transactions(
+        counted_statedb,
+        mocker,
+        *[cancelled_transaction("None", "TransactionConflict")] * 5,
+    )
+    with pytest.raises(ClientError, match="TransactionCanceledException"):
+        counted_statedb.set_failed(test_item["id"], "failed")
+
+
+def test_state_counts_disabled(statedb: StateDB):
+    assert statedb.get_state_counts(test_dbitem["collections_workflow"]) is None
+    with pytest.raises(ValueError):
+        statedb.rebuild_state_counts(test_dbitem["collections_workflow"])
@@ -0,0 +1,145 @@
+import pytest
+
+from botocore.exceptions import ClientError
+
+from cirrus.lib import throttle
+from cirrus.lib.throttle import RateLimiter, get_rate_limiter, is_throttling_error
+
+
+def client_error(code):
+    return ClientError(
+        error_response={"Error": {"Code": code}},
+        operation_name="StartExecution",
+    )
+
+
+@pytest.fixture
+def sleeps(mocker):
+    return mocker.patch("cirrus.lib.throttle.sleep")
+
+
+def test_is_throttling_error():
+    assert is_throttling_error(client_error("ThrottlingException"))
+    assert is_throttling_error(client_error("ProvisionedThroughputExceededException"))
+    assert not is_throttling_error(client_error("ExecutionAlreadyExists"))
+    assert not is_throttling_error(ValueError("ThrottlingException"))
+
+
+def test_call_retries_throttling(mocker, sleeps):
+    func = mocker.Mock(
+        side_effect=[client_error("ThrottlingException")] * 2 + ["ok"],
+    )
+    limiter = RateLimiter()
+    assert limiter.call(func, 1, key="value") == "ok"
+    assert func.call_count == 3
+    func.assert_called_with(1, key="value")
+    # the limiter is now rate limited, where it was unlimited before
+    assert limiter.rate is not None
+    assert limiter.rate >= limiter.min_rate
+
+
+def test_call_retries_exhausted(mocker, sleeps):
+    func = mocker.Mock(side_effect=client_error("ThrottlingException"))
+    limiter = RateLimiter(max_retries=3)
+    with pytest.raises(ClientError):
+        limiter.call(func)
+    assert func.call_count == 4
+
+
+def test_call_botocore_retried_not_retried(mocker, sleeps):
+    error = client_error("ThrottlingException")
+    error.response["ResponseMetadata"] = {"RetryAttempts": 4}
+    func = mocker.Mock(side_effect=error)
+    limiter = RateLimiter()
+    with pytest.raises(ClientError):
+        limiter.call(func)
+    # botocore already backed off, so the limiter only lowers its rate
+    assert func.call_count == 1
+    sleeps.assert_not_called()
+    assert limiter.rate is not None
+
+
+def test_call_other_error_not_retried(mocker, sleeps):
+    func = mocker.Mock(side_effect=client_error("StateMachineDoesNotExist"))
+    with pytest.raises(ClientError):
+        RateLimiter().call(func)
+    assert func.call_count == 1
+    sleeps.assert_not_called()
+
+
+def test_throttled_halves_rate(mocker):
+    limiter = RateLimiter(max_rate=100, min_rate=10)
+    limiter.throttled()
+    assert limiter.rate == pytest.approx(50, abs=1)
+    # repeated throttling within the cooldown does not compound
+    limiter.throttled()
+    assert limiter.rate == pytest.approx(50, abs=1)
+
+    clock = mocker.patch("cirrus.lib.throttle.monotonic")
+    clock.return_value = limiter._updated + throttle.THROTTLE_COOLDOWN + 60
+    limiter.throttled()
+    # recovered by a minute's worth of recovery_rate (capped at max_rate), then halved
+    assert limiter.rate == pytest.approx(50, abs=1)
+    for _ in range(5):
+        clock.return_value += throttle.THROTTLE_COOLDOWN
+        limiter.throttled()
+    assert limiter.rate == limiter.min_rate
+
+
+def test_acquire_waits_for_tokens(mocker, sleeps):
+    clock = mocker.patch("cirrus.lib.throttle.monotonic", return_value=1000.0)
+    limiter = RateLimiter(max_rate=2)
+    assert limiter.acquire() == 0
+    assert limiter.acquire() == 0
+    assert limiter.acquire() == pytest.approx(0.5)
+    assert limiter.acquire() == pytest.approx(1.0)
+    clock.return_value += 10
+    assert limiter.acquire() == 0
+
+
+def test_acquire_unlimited(sleeps):
+    limiter = RateLimiter()
+    for _ in range(100):
+        assert limiter.acquire() == 0
+    sleeps.assert_not_called()
+
+
+def test_get_rate_limiter(monkeypatch):
+    get_rate_limiter.cache_clear()
+    monkeypatch.setenv("CIRRUS_SNS_MAX_RATE", "25")
+    try:
+        assert get_rate_limiter("sns").max_rate == 25
+        assert get_rate_limiter("sns") is get_rate_limiter("sns")
+        assert get_rate_limiter("dynamodb").max_rate is None
+    finally:
+        get_rate_limiter.cache_clear()
+
+
+def test_get_rate_limiter_retry_mode(monkeypatch):
+    get_rate_limiter.cache_clear()
+    monkeypatch.delenv("CIRRUS_BOTO_RETRY_MODE", raising=False)
+    try:
+        # botocore's adaptive mode already backs off and retries
+        assert not get_rate_limiter("sns").adaptive
+        get_rate_limiter.cache_clear()
+        monkeypatch.setenv("CIRRUS_BOTO_RETRY_MODE", "standard")
+        assert get_rate_limiter("sns").adaptive
+    finally:
+        get_rate_limiter.cache_clear()
+
+
+def test_call_not_adaptive(mocker, sleeps):
+    func = mocker.Mock(side_effect=client_error("ThrottlingException"))
+    limiter = RateLimiter(max_rate=10, adaptive=False)
+    with pytest.raises(ClientError):
+        limiter.call(func)
+    assert func.call_count == 1
+    assert limiter.rate == 10
+
+
+def test_backoff_delay(mocker):
+    uniform = mocker.patch("cirrus.lib.throttle.random.uniform", side_effect=max)
+    assert throttle.backoff_delay(0, base_delay=0.1, max_delay=1.0) == 0.1
+    assert throttle.backoff_delay(2, base_delay=0.1, max_delay=1.0) == 0.4
+    assert throttle.backoff_delay(10, base_delay=0.1, max_delay=1.0) == 1.0
+    assert uniform.call_count == 3
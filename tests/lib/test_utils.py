@@ -1,6 +1,12 @@
+import gzip
 import json
+import logging
+import math
+import threading
 
+from datetime import UTC, datetime
 from pathlib import Path
+from types import SimpleNamespace
 
 import boto3
 import pytest
@@ -9,6 +15,7 @@ from moto.core.models import DEFAULT_ACCOUNT_ID
 from moto.sns.models import sns_backends
 
 from cirrus.lib import utils
+from cirrus.lib.errors import PublishError
 from tests.conftest import MOCK_REGION
 
 fixtures = Path(__file__).parent.joinpath("fixtures")
@@ -208,6 +215,307 @@ def test_batch_handler_batch(batch_tester):
     assert batch_tester.items == items
 
 
+def test_batch_handler_concurrent(batch_tester):
+    items = list(range(10))
+    with utils.BatchHandler(batch_tester, batch_size=3, max_workers=4) as handler:
+        for item in items:
+            handler.add(item)
+
+    assert len(batch_tester.calls) == 4
+    assert sorted(batch_tester.items) == items
+
+
+def test_batch_handler_concurrent_error():
+    def fail_on_first(batch):
+        if 0 in batch:
+            raise ValueError("send failed")
+
+    handler = utils.BatchHandler(fail_on_first, batch_size=2, max_workers=2)
+    for item in range(5):
+        handler.add(item)
+    # errors of the batches sent in the background surface on flush
+    with pytest.raises(ValueError, match="send failed"):
+        handler.execute()
+    handler.execute()
+
+
+def test_batch_handler_concurrent_errors(caplog):
+    sent = []
+    release = threading.Event()
+
+    def fail_slowly(batch):
+        if batch[0] == 2:
+            release.wait(5)
+        sent.append(batch[0])
+        if batch[0] > 0:
+            raise ValueError(f"send {batch[0]} failed")
+
+    handler = utils.BatchHandler(fail_slowly, batch_size=1, max_workers=4)
+    for item in range(3):
+        handler.add(item)
+    # the last batch is still in flight when the first error is raised
+    threading.Timer(0.1, release.set).start()
+    with pytest.raises(ValueError, match="send 1 failed"):
+        handler.execute()
+    # every batch is waited for, and the other errors are logged
+    assert sorted(sent) == [0, 1, 2]
+    assert "send 2 failed" in caplog.text
+    handler.execute()
+
+
+def test_batch_handler_max_batch_bytes(batch_tester):
+    with utils.BatchHandler(
+        batch_tester,
+        batch_size=3,
+        max_batch_bytes=10,
+        size=lambda item: item,
+    ) as handler:
+        for item in (4, 4, 4, 12, 1, 1, 1, 1):
+            handler.add(item)
+
+    assert batch_tester.calls == [[4, 4], [4], [12], [1, 1, 1], [1]]
+
+
+def test_batch_handler_max_batch_bytes_requires_size(batch_tester):
+    with pytest.raises(ValueError, match="requires a size function"):
+        utils.BatchHandler(batch_tester, max_batch_bytes=10)
+
+
+def waiting_batch_tester(batch_tester):
+    sent = threading.Event()
+
+    def batchable(batch):
+        batch_tester(batch)
+        sent.set()
+
+    return batchable, sent
+
+
+def test_batch_handler_linger(batch_tester):
+    batchable, sent = waiting_batch_tester(batch_tester)
+    handler = utils.BatchHandler(batchable, batch_size=10, linger_ms=20)
+    handler.add(1)
+    handler.add(2)
+    assert sent.wait(timeout=5)
+    assert batch_tester.calls == [[1, 2]]
+
+    sent.clear()
+    handler.add(3)
+    assert sent.wait(timeout=5)
+    assert batch_tester.calls == [[1, 2], [3]]
+
+
+def live_senders():
+    return [t for t in threading.enumerate() if t.name == "BatchHandler-sender"]
+
+
+def test_batch_handler_sender_stops(batch_tester):
+    batchable, sent = waiting_batch_tester(batch_tester)
+    handler = utils.BatchHandler(batchable, batch_size=10, linger_ms=10)
+    handler.add(1)
+    assert sent.wait(timeout=5)
+    # the sender stops once the batch is sent, and is restarted by add
+    for thread in live_senders():
+        thread.join(timeout=1)
+    assert handler._sender is None
+    sent.clear()
+    handler.add(2)
+    assert sent.wait(timeout=5)
+    assert batch_tester.calls == [[1], [2]]
+
+    # handlers flushed before their batch lingers long enough leave no threads
+    for item in range(50):
+        with utils.BatchHandler(batch_tester, batch_size=10, linger_ms=1000) as h:
+            h.add(item)
+    for thread in live_senders():
+        thread.join(timeout=1)
+    assert live_senders() == []
+
+
+def test_batch_handler_deadline(batch_tester):
+    batchable, sent = waiting_batch_tester(batch_tester)
+    handler = utils.BatchHandler(batchable, batch_size=10)
+    context = SimpleNamespace(get_remaining_time_in_millis=lambda: 1020)
+    handler.set_deadline(context, margin_ms=1000)
+    handler.add(1)
+    assert sent.wait(timeout=5)
+    assert batch_tester.calls == [[1]]
+
+    # the deadline is cleared by execute
+    handler.execute()
+    sent.clear()
+    handler.add(2)
+    assert not sent.wait(timeout=0.1)
+    handler.execute()
+    assert batch_tester.calls == [[1], [2]]
+
+
+def test_batch_handler_linger_error():
+    sending = threading.Event()
+    release = threading.Event()
+
+    def fail(batch):
+        sending.set()
+        release.wait(5)
+        raise ValueError("send failed")
+
+    handler = utils.BatchHandler(fail, linger_ms=0)
+    handler.add(1)
+    assert sending.wait(5)
+    # adding doesn't wait on the batch being sent
+    handler.add(2)
+    assert handler._batch == [2]
+
+    release.set()
+    # the error surfaces on the next flush
+    with pytest.raises(ValueError, match="send failed"):
+        handler.execute()
+    assert handler._batch == []
+
+
+def counting_batchable(handler):
+    calls = []
+    batchable = handler.batchable
+
+    def wrapper(batch):
+        calls.append(len(batch))
+        return batchable(batch)
+
+    handler.batchable = wrapper
+    return calls
+
+
+def test_snspublisher_packs_by_size(sns, topic):
+    body = "x" * 100_000
+    with utils.SNSPublisher(topic_arn=topic) as publisher:
+        calls = counting_batchable(publisher)
+        for _ in range(5):
+            publisher.add(utils.SNSMessage(body=body))
+    assert calls == [2, 2, 1]
+
+
+def test_snspublisher_offload(sns, topic):
+    uploaded = []
+
+    def offload(body):
+        uploaded.append(body)
+        return "s3://bucket/oversized.json"
+
+    attrs = {"status": {"DataType": "String", "StringValue": "created"}}
+    with utils.SNSPublisher(topic_arn=topic, offload=offload) as publisher:
+        publisher.add(utils.SNSMessage(body="x" * 300_000, attributes=attrs))
+        publisher.add(utils.SNSMessage(body="small", attributes=attrs))
+
+    assert uploaded == [b"x" * 300_000]
+    sns_backend = sns_backends[DEFAULT_ACCOUNT_ID]["us-east-1"]
+    messages = [e[1] for e in sns_backend.topics[topic].sent_notifications]
+    assert json.loads(messages[0]) == {"url": "s3://bucket/oversized.json"}
+    assert messages[1] == "small"
+
+
+def test_sqspublisher_offload(sqs, queue, payload_bucket):
+    payload = {"id": "oversized", "features": ["x" * 300_000]}
+    with utils.SQSPublisher(
+        queue_url=queue,
+        offload=payload_bucket.upload_oversize_payload,
+    ) as publisher:
+        publisher.add(utils.json_dumps(payload))
+
+    body = json.loads(sqs.receive_message(QueueUrl=queue)["Messages"][0]["Body"])
+    assert body["url"].startswith(f"s3://{payload_bucket.bucket_name}/")
+    assert utils.payload_from_s3(body) == payload
+
+
+def failing_send_entries(publisher, failures):
+    """Fail the entries with the given IDs, by attempt, with the given codes"""
+    sent = []
+    send_entries = publisher._send_entries
+
+    def wrapper(entries):
+        sent.append([entry["Id"] for entry in entries])
+        failing = failures[len(sent) - 1] if len(sent) <= len(failures) else {}
+        resp = send_entries([e for e in entries if e["Id"] not in failing])
+        resp.setdefault("Failed", []).extend(
+            {"Id": _id, "Code": code, "SenderFault": code == "InvalidParameter"}
+            for _id, code in failing.items()
+        )
+        return resp
+
+    publisher._send_entries = wrapper
+    return sent
+
+
+def test_publisher_retries_failed_entries(mocker, sqs, queue):
+    sleep = mocker.patch("cirrus.lib.utils.sleep")
+    publisher = utils.SQSPublisher(queue_url=queue)
+    sent = failing_send_entries(
+        publisher,
+        [{"1": "InternalError", "3": "InternalError"}, {"3": "Throttling"}],
+    )
+    with publisher:
+        for item in range(5):
+            publisher.add(str(item))
+
+    assert sent == [["0", "1", "2", "3", "4"], ["1", "3"], ["3"]]
+    assert sleep.call_count == 2
+    assert publisher.stats() == {"delivered": 5, "retried": 3, "failed": 0}
+    bodies = [
+        sqs.receive_message(QueueUrl=queue)["Messages"][0]["Body"] for _ in range(5)
+    ]
+    assert sorted(bodies) == ["0", "1", "2", "3", "4"]
+
+
+def test_publisher_failed_entries(mocker, caplog, sns, topic):
+    mocker.patch("cirrus.lib.utils.sleep")
+    publisher = utils.SNSPublisher(topic_arn=topic, max_retries=1)
+    sent = failing_send_entries(
+        publisher,
+        [{"0": "InvalidParameter", "1": "InternalError"}, {"1": "InternalError"}],
+    )
+    for item in range(3):
+        publisher.add(utils.SNSMessage(body=str(item)))
+    with caplog.at_level(logging.INFO), pytest.raises(PublishError) as exc_info:
+        publisher.execute()
+
+    # sender faults are not retried, and retries are limited
+    assert sent == [["0", "1", "2"], ["1"]]
+    assert [m.render()["Message"] for m in exc_info.value.messages] == ["0", "1"]
+    assert [f["Code"] for f in exc_info.value.failed] == [
+        "InvalidParameter",
+        "InternalError",
+    ]
+    assert exc_info.value.dest_name == "some-topic"
+    assert publisher.stats() == {"delivered": 1, "retried": 1, "failed": 2}
+    assert "some-topic: 1 delivered, 1 retried, 2 failed" in caplog.text
+
+
+def test_publisher_retry_budget(mocker, sqs, queue):
+    mocker.patch("cirrus.lib.utils.sleep")
+    publisher = utils.SQSPublisher(queue_url=queue, batch_size=2, retry_budget=1)
+    sent = failing_send_entries(
+        publisher,
+        [{"0": "InternalError"}, {}, {"0": "InternalError"}],
+    )
+    for item in range(3):
+        publisher.add(str(item))
+    # the second batch's failure finds the budget spent by the first
+    with pytest.raises(PublishError) as exc_info:
+        publisher.add("3")
+
+    assert sent == [["0", "1"], ["0"], ["0", "1"]]
+    # the entry Ids are batch positions, so this is the second batch's first
+    assert exc_info.value.messages == ["2"]
+    assert publisher.stats() == {"delivered": 3, "retried": 1, "failed": 1}
+
+    # the budget is renewed on flush
+    publisher.execute()
+    failing_send_entries(publisher, [{"0": "InternalError"}])
+    with publisher:
+        publisher.add("4")
+        publisher.add("5")
+    assert publisher.stats() == {"delivered": 5, "retried": 2, "failed": 1}
+
+
 def test_sqspublisher_batch(sqs, queue):
     items = list(range(10))
     with utils.SQSPublisher(queue_url=queue, batch_size=3) as publisher:
@@ -232,6 +540,24 @@ def test_snspublisher_batch(sns, topic):
     assert {e[1] for e in all_send_notifications} == set(items)
 
 
+def test_get_publishers_shared(monkeypatch, sns, topic, sqs, queue):
+    monkeypatch.setenv("CIRRUS_PUBLISH_MAX_WORKERS", "3")
+    publisher = utils.get_sns_publisher(topic)
+    assert utils.get_sns_publisher(topic) is publisher
+    assert utils.get_sns_publisher(topic, batch_size=5) is not publisher
+    assert publisher.max_workers == 3
+    assert utils.get_sqs_publisher(queue) is utils.get_sqs_publisher(queue)
+
+    items = [str(x) for x in range(25)]
+    with publisher:
+        for item in items:
+            publisher.add(utils.SNSMessage(body=item))
+
+    sns_backend = sns_backends[DEFAULT_ACCOUNT_ID]["us-east-1"]
+    all_send_notifications = sns_backend.topics[topic].sent_notifications
+    assert sorted(e[1] for e in all_send_notifications) == sorted(items)
+
+
 def test_snspublisher_mesg_attrs(sns, topic):
     items = [str(x) for x in range(10)]
     with utils.SNSPublisher(topic_arn=topic, batch_size=3) as publisher:
@@ -286,3 +612,165 @@ def test_parse_since():
     assert td.seconds == 3600
     td = utils.parse_since("10m")
     assert td.seconds == 600
+
+
+def test_payload_from_s3_gzip(s3, payload_bucket):
+    item = {"id": "some-id"}
+    key = "item.json.gz"
+    s3.put_object(
+        Bucket=payload_bucket.bucket_name,
+        Key=key,
+        Body=gzip.compress(json.dumps(item).encode()),
+    )
+    record = utils.payload_from_s3(
+        {"url": f"s3://{payload_bucket.bucket_name}/{key}"},
+    )
+    assert record == item
+
+
+@pytest.mark.parametrize("backend", ["json", "orjson"])
+@pytest.mark.parametrize(
+    "obj",
+    [
+        {"id": "some-id", "features": [{"properties": {"a": 1.5, "b": None}}]},
+        {"text": 'unicode é ☃ "quoted" \\ \n'},
+        {"big": 2**70},
+        {1: "non-string key"},
+        [],
+    ],
+)
+def test_json_codec_roundtrip(monkeypatch, backend, obj):
+    if backend == "orjson":
+        pytest.importorskip("orjson")
+    monkeypatch.setattr(utils, "JSON_BACKEND", backend)
+    encoded = utils.json_dumpb(obj)
+    assert isinstance(encoded, bytes)
+    assert utils.json_dumps(obj) == encoded.decode()
+    assert utils.json_loads(encoded) == json.loads(json.dumps(obj))
+    assert utils.json_loads(encoded.decode()) == json.loads(json.dumps(obj))
+
+
+@pytest.mark.parametrize("backend", ["json", "orjson"])
+def test_json_dumps_matches_stdlib(monkeypatch, backend):
+    if backend == "orjson":
+        pytest.importorskip("orjson")
+    monkeypatch.setattr(utils, "JSON_BACKEND", backend)
+    obj = {"a": [1.5, None, {"b": math.nan}], "c": -math.inf}
+    assert utils.json_dumps(obj) == json.dumps(obj)
+    with pytest.raises(TypeError):
+        utils.json_dumpb({"when": datetime.now(UTC)})
+
+
+@pytest.mark.parametrize("backend", ["json", "orjson"])
+def test_json_loads_invalid(monkeypatch, backend):
+    if backend == "orjson":
+        pytest.importorskip("orjson")
+    monkeypatch.setattr(utils, "JSON_BACKEND", backend)
+    assert math.isnan(utils.json_loads('{"a": NaN}')["a"])
+    with pytest.raises(json.JSONDecodeError):
+        utils.json_loads("{not json")
+
+
+def test_iter_concurrently():
+    iterables = [range(0, 50), range(50, 100), iter([])]
+    assert sorted(utils.iter_concurrently(iterables, buffer_size=1)) == list(range(100))
+    assert list(utils.iter_concurrently([])) == []
+
+
+def test_iter_concurrently_error():
+    def failing():
+        yield 1
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError, match="boom"):
+        list(utils.iter_concurrently([failing(), range(10)]))
+
+
+def test_iter_concurrently_close_early():
+    produced = []
+
+    def produce():
+        for i in range(1000):
+            produced.append(i)
+            yield i
+
+    values = utils.iter_concurrently([produce()], buffer_size=1)
+    assert next(values) == 0
+    values.close()
+    # the producer stops once the consumer goes away
+    assert len(produced) < 10
+
+
+@pytest.fixture
+def client_config_env(monkeypatch):
+    utils.get_client_config.cache_clear()
+    yield monkeypatch
+    utils.get_client_config.cache_clear()
+
+
+def test_get_client_config_defaults(client_config_env):
+    client_config_env.setenv("CIRRUS_PROCESS_MAX_WORKERS", "80")
+    config = utils.get_client_config()
+    assert config.max_pool_connections == 80
+    assert config.retries == {"mode": "adaptive", "total_max_attempts": 5}
+    assert config.connect_timeout == utils.DEFAULT_CONNECT_TIMEOUT
+    assert config.read_timeout == utils.DEFAULT_READ_TIMEOUT
+    assert config.tcp_keepalive is True
+
+
+def test_get_client_config_env(client_config_env):
+    client_config_env.setenv("CIRRUS_BOTO_MAX_POOL_CONNECTIONS", "20")
+    client_config_env.setenv("CIRRUS_BOTO_RETRY_MODE", "standard")
+    client_config_env.setenv("CIRRUS_BOTO_READ_TIMEOUT", "2.5")
+    client_config_env.setenv("CIRRUS_BOTO_TCP_KEEPALIVE", "false")
+    config = utils.get_client_config()
+    assert config.max_pool_connections == 20
+    assert config.retries["mode"] == "standard"
+    assert config.read_timeout == 2.5
+    assert config.tcp_keepalive is False
+
+
+def test_get_client_uses_client_config():
+    client = utils.get_client("sqs", region=MOCK_REGION)
+    assert (
+        client.meta.config.max_pool_connections
+        == utils.get_client_config().max_pool_connections
+    )
+
+
+def test_workflow_event_clients(monkeypatch):
+    for var in (
+        "CIRRUS_WORKFLOW_EVENT_TOPIC_ARN",
+        "CIRRUS_WORKFLOW_LOG_GROUP",
+        "CIRRUS_EVENT_DB_AND_TABLE",
+        "CIRRUS_WORKFLOW_METRIC_OUTPUT",
+    ):
+        monkeypatch.delenv(var, raising=False)
+    assert utils.workflow_event_clients() == ()
+
+    monkeypatch.setenv("CIRRUS_WORKFLOW_LOG_GROUP", "log-group")
+    assert utils.workflow_event_clients() == ("logs",)
+
+    monkeypatch.setenv("CIRRUS_EVENT_DB_AND_TABLE", "db|table")
+    assert utils.workflow_event_clients() == (
+        "logs",
+        "timestream-write",
+        "timestream-query",
+    )
+
+    # workflow metrics written as EMF don't use the log group
+    monkeypatch.setenv("CIRRUS_WORKFLOW_METRIC_OUTPUT", "emf")
+    assert utils.workflow_event_clients() == ("timestream-write", "timestream-query")
+
+
+def test_cold_start(caplog):
+    with caplog.at_level("INFO", logger=utils.logger.name):
+        timings = utils.cold_start(clients=("s3", "sqs", "s3"), resources=("sqs",))
+    assert list(timings) == ["s3", "sqs", "sqs (resource)"]
+    assert all(duration >= 0 for duration in timings.values())
+    assert utils.get_client.cache_info().currsize >= 2
+    assert "Cold start created 3 clients/resources" in caplog.text
+
+
+def test_cold_start_nothing():
+    assert utils.cold_start(clients=(), resources=()) == {}
@@ -175,6 +175,32 @@ def test_get_workflow_summary_with_limit(deployment, create_records, statedb):
         assert count == 0 or count == 1 or count == "1+"
 
 
+def test_rebuild_workflow_state_counts(deployment, create_records, dynamo):
+    """Test rebuilding state counts and summarizing from them"""
+    dynamo.create_table(
+        TableName="cirrus-test-state-counts",
+        KeySchema=[{"AttributeName": "collections_workflow", "KeyType": "HASH"}],
+        AttributeDefinitions=[
+            {"AttributeName": "collections_workflow", "AttributeType": "S"},
+        ],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    deployment.environment["CIRRUS_STATE_COUNTS_DB"] = "cirrus-test-state-counts"
+
+    counts = deployment.rebuild_workflow_state_counts("sar-test-panda", "test")
+    assert counts["SUCCEEDED"] == 2
+    assert counts["FAILED"] == 2
+
+    summary = deployment.get_workflow_summary("sar-test-panda", "test")
+    assert summary["counts"] == counts
+
+
+def test_rebuild_workflow_state_counts_disabled(deployment):
+    """Test rebuilding state counts without a counts table"""
+    with pytest.raises(ValueError):
+        deployment.rebuild_workflow_state_counts("sar-test-panda", "test")
+
+
 # Tests for get_workflow_stats
 
 
@@ -398,6 +424,34 @@ def test_yield_workflow_items_with_filters(deployment, create_records, statedb):
         assert item["state"] == "FAILED"
 
 
+def test_yield_workflow_items_fields(deployment, create_records, statedb):
+    items = list(
+        deployment.yield_workflow_items(
+            "sar-test-panda",
+            "test",
+            state="SUCCEEDED",
+            fields=["payload_id", "state", "updated"],
+        ),
+    )
+
+    assert len(items) == 2
+    for item in items:
+        assert list(item) == ["payload_id", "state", "updated"]
+        assert item["state"] == "SUCCEEDED"
+        assert item["payload_id"] in create_records["completed"]
+
+
+def test_get_workflow_items_fields(deployment, create_records, statedb):
+    result = deployment.get_workflow_items(
+        "sar-test-panda",
+        "test",
+        limit=1,
+        fields=["payload_id"],
+    )
+    assert result["items"] == [{"payload_id": create_records["failed"][1]}]
+    assert "nextkey" in result
+
+
 def test_yield_input_payloads(deployment, create_records, statedb):
     """Smoke test for yield_input_payloads with the new signature and rerun flag."""
     payloads = list(
@@ -0,0 +1,135 @@
+"""Tests for streaming StateDB exports"""
+
+import csv
+import gzip
+import io
+import json
+
+import pytest
+
+from cirrus.lib.statedb import ITEM_FIELDS
+from cirrus.management.export import (
+    export_items,
+    flatten_value,
+    open_export_output,
+)
+
+ITEMS = [
+    {
+        "payload_id": "col/workflow-wf/item-1",
+        "state": "SUCCEEDED",
+        "executions": ["https://example.com/1"],
+        "outputs": ["s3://bucket/item-1.json"],
+    },
+    {
+        "payload_id": "col/workflow-wf/item-2",
+        "state": "FAILED",
+        "last_error": 'error, with "quotes"',
+    },
+]
+
+
+def test_flatten_value():
+    assert flatten_value(None) is None
+    assert flatten_value("a") == "a"
+    assert json.loads(flatten_value(["a", "b"])) == ["a", "b"]
+    assert flatten_value(1) == "1"
+
+
+def test_export_ndjson():
+    stream = io.BytesIO()
+    assert export_items(iter(ITEMS), stream) == 2
+    lines = stream.getvalue().splitlines()
+    assert [json.loads(line) for line in lines] == ITEMS
+
+
+def test_export_csv():
+    stream = io.BytesIO()
+    assert export_items(ITEMS, stream, "csv") == 2
+    # the stream must be left open for the caller to close
+    assert not stream.closed
+
+    rows = list(csv.DictReader(io.StringIO(stream.getvalue().decode())))
+    assert list(rows[0]) == list(ITEM_FIELDS)
+    assert rows[0]["executions"] == '["https://example.com/1"]'
+    assert rows[1]["last_error"] == 'error, with "quotes"'
+    assert rows[1]["outputs"] == ""
+
+
+def test_export_csv_fields():
+    stream = io.BytesIO()
+    export_items(ITEMS, stream, "csv", fields=["payload_id", "state"])
+    assert stream.getvalue().decode().splitlines() == [
+        "payload_id,state",
+        "col/workflow-wf/item-1,SUCCEEDED",
+        "col/workflow-wf/item-2,FAILED",
+    ]
+
+
+def test_export_parquet(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = tmp_path / "export.parquet"
+    with open_export_output(str(path)) as stream:
+        export_items(ITEMS, stream, "parquet", fields=["payload_id", "last_error"])
+
+    table = pq.read_table(path)
+    assert table.column_names == ["payload_id", "last_error"]
+    assert table.column("last_error").to_pylist() == [None, 'error, with "quotes"']
+
+
+def test_open_export_output_gzip(tmp_path):
+    path = tmp_path / "export.ndjson.gz"
+    with open_export_output(str(path)) as stream:
+        export_items(ITEMS, stream)
+
+    with gzip.open(path) as f:
+        assert [json.loads(line) for line in f] == ITEMS
+
+
+def test_yield_export_items_partitions(deployment, create_records):
+    items = list(
+        deployment.yield_export_items(
+            ["sar-test-panda_test", "sar-test-panda_other"],
+            state="FAILED",
+            fields=["payload_id", "state"],
+            page_size=1,
+        ),
+    )
+    assert sorted(item["payload_id"] for item in items) == create_records["failed"]
+    assert {item["state"] for item in items} == {"FAILED"}
+
+
+@pytest.mark.parametrize("segments", [1, 2])
+def test_yield_export_items_scan(deployment, create_records, segments):
+    items = list(
+        deployment.yield_export_items(
+            state="SUCCEEDED",
+            fields=["payload_id", "state"],
+            segments=segments,
+        ),
+    )
+    assert sorted(item["payload_id"] for item in items) == create_records["completed"]
+    assert all(list(item) == ["payload_id", "state"] for item in items)
+
+
+def test_cli_export(deployment, create_records, tmp_path):
+    path = tmp_path / "export.csv.gz"
+    result = deployment(
+        "export --collections-workflow sar-test-panda_test "
+        f"--format csv --fields payload_id,state --output {path}",
+    )
+    assert result.exit_code == 0, result.output
+    assert "Exported 4 records" in result.stderr
+
+    with gzip.open(path, "rt") as f:
+        rows = list(csv.DictReader(f))
+    assert sorted(row["payload_id"] for row in rows) == sorted(
+        create_records["completed"] + create_records["failed"],
+    )
+
+
+def test_cli_export_stdout(deployment, create_records):
+    result = deployment("export --state FAILED --fields payload_id")
+    assert result.exit_code == 0, result.output
+    records = [json.loads(line) for line in result.stdout.splitlines()]
+    assert sorted(r["payload_id"] for r in records) == create_records["failed"]
@@ -220,6 +220,27 @@ def test_get_input_payloads(
     assert_get_payloads(result, create_records, state, limit)
 
 
+def test_query_fields(deployment, create_records, statedb):
+    result = deployment(
+        "query --collections-workflow 'sar-test-panda_test' --state SUCCEEDED "
+        "--fields payload_id,state",
+    )
+    assert result.exit_code == 0
+    records = [json.loads(line) for line in result.stdout.splitlines()]
+    assert sorted(records, key=lambda r: r["payload_id"]) == [
+        {"payload_id": payload_id, "state": "SUCCEEDED"}
+        for payload_id in sorted(create_records["completed"])
+    ]
+
+
+def test_query_fields_invalid(deployment, create_records, statedb):
+    result = deployment(
+        "query --collections-workflow 'sar-test-panda_test' --fields payload_id,nope",
+    )
+    assert result.exit_code == 2
+    assert "unknown fields nope" in result.output
+
+
 def test_get_workflow_definition(deployment, workflow, put_parameters):
     state_machine_arn = workflow["stateMachineArn"]
     result = deployment("get-workflow-definition test-workflow1")